@@ -40,4 +40,7 @@ CREATE TABLE bots_webhooks (
   PRIMARY KEY (bot_id, webhook_id),
   FOREIGN KEY (bot_id) REFERENCES bots(id) ON DELETE CASCADE,
   FOREIGN KEY (webhook_id) REFERENCES webhooks(id) ON DELETE CASCADE
-);
\ No newline at end of file
+);
+
+-- Later schema changes (triggers, indexes) live in services/database-manager/migrations
+-- and are applied by database-manager at startup.
\ No newline at end of file
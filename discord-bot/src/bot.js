@@ -45,6 +45,8 @@ const {
   pruneWebhook,
   pruneWebhooksServer,
   deleteAllWebhooksForServer,
+  teardownServer,
+  appendChannelMessage,
   createBotWebhookLink,
   deleteBotWebhookLink,
   updateBotElevenVoiceId
@@ -961,6 +963,9 @@ client.on('messageCreate', async (message) => {
 
     if (botConfig.webhook_url) {
       await sendWebhookMessage(botConfig.webhook_url, response, botConfig.name, botConfig.profile_picture_url);
+      if (response) {
+        await appendChannelMessage(serverId, message.channel.id, { role: 'assistant', name: botConfig.name, content: response.slice(0, 100) });
+      }
     }
   } catch (error) {
     console.error('Error handling message:', error);
@@ -986,21 +991,19 @@ client.on('guildMemberRemove', async (member) => {
     }
     await pruneWebhooksServer(member.guild.id);
   } else {
-    const response = await deleteServerConfigs(member.guild.id);
-    for (const botConfig of response) {
+    const botConfigs = await teardownServer(member.guild.id);
+    for (const botConfig of botConfigs) {
       await deleteVoice(botConfig.eleven_voice_id);
     }
-    await deleteAllWebhooksForServer(member.guild.id);
   }
 });
 
 // Delete bot when server is deleted
 client.on('guildDelete', async (guild) => {
-  const response = await deleteServerConfigs(guild.id);
-  for (const botConfig of response) {
+  const botConfigs = await teardownServer(guild.id);
+  for (const botConfig of botConfigs) {
     await deleteVoice(botConfig.eleven_voice_id);
   }
-  await deleteAllWebhooksForServer(guild.id);
 });
 
 client.login(DISCORD_TOKEN);
\ No newline at end of file
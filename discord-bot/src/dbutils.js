@@ -77,7 +77,7 @@ async function deleteBotConfig(serverId, name) {
 
 async function deleteBotConfigsByOwnerSever(ownerId, serverId) {
   try {
-    const response = await axios.delete(`${DATABASE_MANAGER_URL}/bot-config/owner/server/${ownerId}/${serverId}`);
+    const response = await axios.delete(`${DATABASE_MANAGER_URL}/bot-config/owner/${ownerId}/server/${serverId}`);
     return response.data;
   } catch (error) {
     console.error('Error deleting bot configs by owner:', error.response.data);
@@ -214,6 +214,47 @@ async function deleteAllWebhooksForServer(serverId) {
   }
 }
 
+async function teardownServer(serverId) {
+  try {
+    // Removes every bot and webhook config for the server in one transaction
+    const response = await axios.delete(`${DATABASE_MANAGER_URL}/server/${serverId}/teardown`);
+
+    for (const webhook_id of response.data.webhook_ids) {
+      try {
+        const webhook = await client.fetchWebhook(webhook_id);
+        await webhook.delete();
+      } catch (webhookError) {
+        console.error(`Error deleting webhook ${webhook_id}:`, webhookError);
+      }
+    }
+
+    return response.data.bots;
+  } catch (error) {
+    console.error('Error tearing down server:', error.response.data);
+    return [];
+  }
+}
+
+async function appendChannelMessage(serverId, channelId, message) {
+  try {
+    const response = await axios.post(`${DATABASE_MANAGER_URL}/history/${serverId}/${channelId}`, message);
+    return response.data;
+  } catch (error) {
+    console.error('Error appending channel message:', error.response.data);
+    return null;
+  }
+}
+
+async function getChannelHistory(serverId, channelId, limit) {
+  try {
+    const response = await axios.get(`${DATABASE_MANAGER_URL}/history/${serverId}/${channelId}`, { params: { limit } });
+    return response.data;
+  } catch (error) {
+    console.error('Error fetching channel history:', error.response.data);
+    return null;
+  }
+}
+
 async function createBotWebhookLink(botId, webhookId) {
   try {
     const bot_webhook_data = {
@@ -267,6 +308,9 @@ module.exports = {
   pruneWebhook,
   pruneWebhooksServer,
   deleteAllWebhooksForServer,
+  teardownServer,
+  appendChannelMessage,
+  getChannelHistory,
   createBotWebhookLink,
   deleteBotWebhookLink,
   updateBotElevenVoiceId
@@ -1,5 +1,4 @@
 const axios = require('axios');
-const { Readable } = require('stream');
 const { AUDIO_PROCESSOR_URL } = require('./config');
 const FormData = require('form-data');
 
@@ -33,40 +32,31 @@ function cleanupTempStorage() {
 
 setInterval(cleanupTempStorage, 15 * 60 * 1000);
 
-async function convertTextToSpeech(text, botConfig) {
+// Returns a Readable that yields audio as audio-processor relays it, so playback can start before synthesis finishes
+async function convertTextToSpeech(text, botConfig, outputFormat = 'mp3_44100_128') {
   try {
     const response = await axios.post(AUDIO_PROCESSOR_URL + '/text-to-speech/', {
       text: text,
-      eleven_voice_id: botConfig.eleven_voice_id
+      eleven_voice_id: botConfig.eleven_voice_id,
+      output_format: outputFormat
     }, {
       headers: {
         'Content-Type': 'application/json',
       },
-      responseType: 'arraybuffer',
+      responseType: 'stream',
     });
 
     if (response.status === 200) {
-      // Create a Buffer from the response data
-      const audioBuffer = Buffer.from(response.data, 'base64');
-      
-      // Create a Readable stream from the audio buffer
-      const audioStream = new Readable({
-        read() {
-          this.push(audioBuffer);
-          this.push(null);
-        }
-      });
-
-      return audioStream;
+      return response.data;
     } else {
       console.error('Error from text-to-speech API:', response.statusText);
       return null;
     }
   } catch (error) {
     if (error.response) {
-      console.error('Error in convertTextToSpeech:', error.response.status, error.response.data);
+      console.error('Error in convertTextToSpeech:', error.response.status, error.response.statusText);
     } else {
-      console.error('Error in convertTextToSpeech:', error.response.data);
+      console.error('Error in convertTextToSpeech:', error.message);
     }
     return null;
   }
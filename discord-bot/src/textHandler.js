@@ -1,33 +1,45 @@
 const axios = require('axios');
 const config = require('./config');
+const { getChannelHistory, appendChannelMessage } = require('./dbutils');
 
-async function generateBotResponse(client, message, contextSize, botConfigs) {
+// Convert a Discord message to { role, name, content }
+function toHistoryMessage(client, msg) {
+  let content = msg.content.slice(0, 100);
+  if (content === '' && msg.attachments.size > 0) {
+    content = msg.attachments.first().url;
+  }
+
+  return {
+    role: (msg.webhookId || msg.author.id === client.user.id) ? 'assistant' : 'user',
+    name: msg.author.username,
+    content: content
+  };
+}
+
+async function fetchDiscordHistory(client, message, contextSize) {
   const messages = await message.channel.messages.fetch({ limit: contextSize });
+  return Array.from(messages.values())
+    .reverse()
+    .map(msg => toHistoryMessage(client, msg));
+}
+
+async function generateBotResponse(client, message, contextSize, botConfigs) {
+  // Channel context comes from database-manager, falling back to Discord until the channel has stored a full context.
+  // The message is recorded as soon as the history has been read, before the reply delays, so the store stays in order.
+  const historyMessage = toHistoryMessage(client, message);
+  let conversationHistory = await getChannelHistory(message.guild.id, message.channel.id, contextSize - 1);
+  await appendChannelMessage(message.guild.id, message.channel.id, historyMessage);
+  if (!conversationHistory || conversationHistory.length < contextSize - 1) {
+    conversationHistory = await fetchDiscordHistory(client, message, contextSize);
+  } else {
+    conversationHistory.push(historyMessage);
+  }
 
   // Add probability of response to each bot config
   botConfigs.forEach(botConfig => {
     botConfig.probability = 0;
   });
 
-  // Filter by messages and format
-  const recentMessages = Array.from(messages.values())
-    .reverse();
-
-  // Concatenate and replace image messages with text
-  recentMessages.forEach(msg => {
-    msg.content = msg.content.slice(0, 100);
-    if (msg.content === '' && msg.attachments.size > 0) {
-      msg.content = msg.attachments.first().url;
-    }
-  });
-
-  // Convert to { role, author, content}
-  let conversationHistory = recentMessages.map(msg => ({
-    role: (msg.webhookId || msg.author.id === client.user.id) ? 'assistant' : 'user',
-    name: msg.author.username,
-    content: msg.content
-  }))
-
   // Check if user is replying to webhook and get name
   const webhookName = message.reference?.resolved?.author?.username || null;
 
@@ -38,7 +50,7 @@ async function generateBotResponse(client, message, contextSize, botConfigs) {
       || webhookName === botConfig.name;
 
     // Get number of messages where the username is the same
-    const numOwnMessages = recentMessages.slice(0, 8).filter(msg => msg.webhookId && msg.author.username === botConfig.name).length;
+    const numOwnMessages = conversationHistory.slice(0, 8).filter(msg => msg.role === 'assistant' && msg.name === botConfig.name).length;
 
     // Get chance of response
     botConfig.probability = mentionsBot ? 100 : (15 * numOwnMessages + 2);
@@ -66,18 +78,22 @@ async function generateBotResponse(client, message, contextSize, botConfigs) {
   await new Promise(resolve => setTimeout(resolve, Math.floor(Math.random() * (time/2) * 1000) + (time/2) * 1000));
 
   // Send response
-  const response = await generateResponseFromMessages(conversationHistory, botconfig);
+  const response = await generateResponseFromMessages(conversationHistory, botconfig, message.channel.id);
   
   return [response, botconfig];
 }
 
-async function generateResponseFromMessages(messages, botconfig) {
+// channelId lets language-model keep a running summary of turns that no longer fit its token budget
+// priority 'voice' is scheduled ahead of text replies by language-model
+async function generateResponseFromMessages(messages, botconfig, channelId = null, priority = 'text') {
   try {
     const response = await axios.post(config.LANGUAGE_MODEL_URL + '/generate', {
       messages: messages,
       botName: botconfig.name,
       characterDescription: botconfig.character_description,
-      exampleSpeech: botconfig.example_speech
+      exampleSpeech: botconfig.example_speech,
+      channelId: channelId,
+      priority: priority
     });
     return response.data.reply;
   } catch (error) {
@@ -9,11 +9,9 @@ const {
 } = require('@discordjs/voice');
 const axios = require('axios');
 const FormData = require('form-data');
-const { convertTextToSpeech } = require('./elevenLabs');
+const { PassThrough } = require('stream');
 
-const { generateResponseFromMessages } = require('./textHandler');
 const { getClient, getUsername } = require('./utils');
-const { opus } = require('prism-media');
 const { AUDIO_PROCESSOR_URL } = require('./config');
 
 const client = getClient();
@@ -56,46 +54,36 @@ async function joinVC(voiceChannel, botConfig) {
     const username = await getUsername(userId);
 
     try {
-      // Get transcribed audio and add to messages
-      const transcribedAudio = await transcribeAudio(audioBuffer);
-      console.log("Transcribed audio:", transcribedAudio);
+      // Transcription, reply and speech happen in one call; playback starts with the reply's first sentence
+      const turn = await requestVoiceTurn(audioBuffer, messages, username, botConfig, voiceChannel.id);
 
-      if (!transcribedAudio || transcribedAudio.length <= 0) {
-        console.error("Error transcribing audio");
+      if (!turn) {
+        console.error("Error in voice turn");
         return null;
       }
 
-      messages.push({ role: 'user', name: username, content: transcribedAudio });
-      messages = messages.slice(-botConfig.context_size);
-
-      // Generate bot response
-      const textRespose = await generateResponseFromMessages(messages, botConfig);
-      console.log("Bot response:", textRespose);
-
-      if (!textRespose || textRespose.length <= 0) {
-        console.error("Error generating bot response");
-        return null;
-      }
+      console.log("Transcribed audio:", turn.transcript);
+      console.log("Voice turn timings:", turn.serverTiming);
 
-      // Add bot response to messages
-      messages.push({ role: 'assistant', name: botConfig.name, content: textRespose });
+      messages.push({ role: 'user', name: username, content: turn.transcript });
       messages = messages.slice(-botConfig.context_size);
 
-      // Convert text to speech
-      const responseAudioStream = await convertTextToSpeech(textRespose, botConfig);
+      // Play audio stream
+      const player = playAudioStream(connection, turn.audioStream);
 
-      if (!responseAudioStream) {
-        console.error("Error converting text to speech");
+      if (!player) {
+        console.error("Error playing voice turn audio");
         return null;
       }
 
-      // Play audio stream
-      const player = playAudioStream(connection, responseAudioStream);
+      // The full reply follows the audio in the same response
+      const textResponse = await turn.reply;
+      console.log("Bot response:", textResponse);
 
-      // Wait for the audio stream to finish playing
-      await player.on(AudioPlayerStatus.Idle, () => {
-        console.log("Audio playback finished");
-      });
+      if (textResponse) {
+        messages.push({ role: 'assistant', name: botConfig.name, content: textResponse });
+        messages = messages.slice(-botConfig.context_size);
+      }
     } catch (error) {
       console.error("Error in handleVoiceActivity:", error.response ? error.response.data : error.message);
     } finally {
@@ -104,36 +92,94 @@ async function joinVC(voiceChannel, botConfig) {
   });
 }
 
-async function transcribeAudio(audioBuffer) {
+// Sends the Opus frames and chat context to audio-processor, which transcribes, replies and speaks in one call
+async function requestVoiceTurn(audioBuffer, messages, username, botConfig, channelId) {
   try {
-    // Create a FormData instance
     const formData = new FormData();
-    
-    // Append the audio buffer as a file
+
     formData.append('file', audioBuffer, {
       filename: 'audio.opus',
-      contentType: 'audio/opus',
+      contentType: 'audio/opus; rate=48000; channels=2',
     });
-
-    // Send the request
-    const response = await axios.post(AUDIO_PROCESSOR_URL + '/transcribe-audio/', formData, {
+    formData.append('turn', JSON.stringify({
+      messages: messages,
+      username: username,
+      botName: botConfig.name,
+      characterDescription: botConfig.character_description,
+      exampleSpeech: botConfig.example_speech,
+      eleven_voice_id: botConfig.eleven_voice_id,
+      channelId: channelId
+    }));
+
+    const response = await axios.post(AUDIO_PROCESSOR_URL + '/voice-turn/', formData, {
       headers: {
         ...formData.getHeaders(),
       },
+      responseType: 'stream',
     });
 
-    if (response.data && response.data.transcription) {
-      return response.data.transcription;
-    } else {
-      console.error('Unexpected response format:', response.data);
+    // 204 means the clip had no speech
+    if (response.status !== 200) {
       return null;
     }
+
+    const { audioStream, reply } = readVoiceTurn(response.data);
+
+    return {
+      transcript: decodeURIComponent(response.headers['x-transcript'] || ''),
+      serverTiming: response.headers['server-timing'],
+      audioStream,
+      reply
+    };
   } catch (error) {
-    console.error('Error in transcribeAudio:', error.response ? error.response.data : error.message);
+    console.error('Error in requestVoiceTurn:', error.response ? error.response.status : error.message);
     return null;
   }
 }
 
+// Splits a voice turn body into its audio and the reply text that follows it.
+// Each frame is a kind byte ('a' audio, 'r' reply), its length as a big-endian uint32, then the payload.
+function readVoiceTurn(body) {
+  const audioStream = new PassThrough();
+
+  const reply = new Promise((resolve) => {
+    let buffered = Buffer.alloc(0);
+    let replyText = null;
+
+    body.on('data', (data) => {
+      buffered = Buffer.concat([buffered, data]);
+      while (buffered.length >= 5) {
+        const length = buffered.readUInt32BE(1);
+        if (buffered.length < 5 + length) break;
+
+        const kind = String.fromCharCode(buffered[0]);
+        const payload = buffered.subarray(5, 5 + length);
+        buffered = buffered.subarray(5 + length);
+
+        if (kind === 'a') {
+          audioStream.write(payload);
+        } else if (kind === 'r') {
+          replyText = JSON.parse(payload.toString('utf8')).reply;
+        }
+      }
+    });
+
+    body.on('end', () => {
+      audioStream.end();
+      resolve(replyText);
+    });
+
+    // Resolved rather than rejected so a dropped stream only loses the reply text
+    body.on('error', (error) => {
+      console.error('Error reading voice turn:', error.message);
+      audioStream.end();
+      resolve(null);
+    });
+  });
+
+  return { audioStream, reply };
+}
+
 function playFile(connection, filePath) {
   const player = createAudioPlayer();
   const resource = createAudioResource(filePath);
@@ -203,9 +249,8 @@ function handleVoiceActivity(voiceChannel, receiver, audioProcessor) {
       }
     });
 
-    // Decode the audio stream using discordjs OpusEncoder
-    const decoder = new opus.Decoder({ frameSize: 960, channels: 2, rate: 48000 });
-    const audioStream = rawStream.pipe(decoder);
+    // Keep the Opus packets as they arrive; the audio processor repackages them for recognition
+    const audioStream = rawStream;
 
     let audioBuffer = [];
     let startTime = Date.now();
@@ -214,7 +259,10 @@ function handleVoiceActivity(voiceChannel, receiver, audioProcessor) {
     audioStream.on('data', (chunk) => {
       if (finished) return;
 
-      audioBuffer.push(chunk);
+      // Each packet is prefixed with its length so the frames can be split apart again
+      const length = Buffer.alloc(2);
+      length.writeUInt16BE(chunk.length);
+      audioBuffer.push(length, chunk);
 
       if (Date.now() - startTime > 8000) {
         // Manually trigger the end event
@@ -1,23 +1,73 @@
-from fastapi import FastAPI, HTTPException, UploadFile, File, Response, Form
+from fastapi import FastAPI, HTTPException, UploadFile, File, Response, Form, WebSocket, WebSocketDisconnect
+from fastapi.concurrency import run_in_threadpool, iterate_in_threadpool
 from fastapi.responses import StreamingResponse
+from prometheus_client import generate_latest, CONTENT_TYPE_LATEST
 from pydantic import BaseModel
+from typing import Optional
 from elevenlabs import ElevenLabs
-from transcriber import transcribe_audio
-import io
+from transcriber import transcribe_audio, stream_transcripts
+from audio_formats import negotiate, sniff_container, UnsupportedAudio
+from tts_cache import tts_cache, normalize_text, iter_clip
+from upstreams import elevenlabs, speech, clone_jobs
+from uploads import UploadSizeLimit
+from voice_turn import TurnTimer, turn_headers, audio_frame, reply_frame
+import upstreams
+import language_model
+import metrics
+import asyncio
+import json
+import queue
 import os
 import base64
-from config import ELEVEN_LABS_API_KEY
+from config import (
+    ELEVEN_LABS_API_KEY, ELEVENLABS_TIMEOUT, TTS_MODEL_ID, TTS_OPTIMIZE_STREAMING_LATENCY, TTS_DEFAULT_OUTPUT_FORMAT,
+    TTS_CACHE_ENABLED, CLONE_MAX_UPLOAD_BYTES
+)
 
 app = FastAPI()
+app.add_middleware(UploadSizeLimit, paths=["/clone-voice/"], max_bytes=CLONE_MAX_UPLOAD_BYTES)
 
-# Crate client
+# Crate client; blocking calls on it go through the elevenlabs upstream pool
 client = ElevenLabs(
-    api_key=ELEVEN_LABS_API_KEY
+    api_key=ELEVEN_LABS_API_KEY,
+    timeout=ELEVENLABS_TIMEOUT
 )
 
+@app.on_event("startup")
+def startup():
+    metrics.register()
+    language_model.open_client()
+
+@app.on_event("shutdown")
+async def shutdown():
+    upstreams.shutdown()
+    await language_model.close_client()
+
+# Output formats ElevenLabs can stream, by codec prefix
+OUTPUT_MEDIA_TYPES = {
+    "mp3": "audio/mpeg",
+    "opus": "audio/ogg",
+    "pcm": "audio/L16",
+    "ulaw": "audio/basic",
+    "alaw": "audio/x-alaw-basic",
+}
+
 class TextToSpeechRequest(BaseModel):
     text: str
     eleven_voice_id: str
+    # e.g. mp3_44100_128, opus_48000_64, or pcm_48000 for raw 16-bit mono samples
+    output_format: str = TTS_DEFAULT_OUTPUT_FORMAT
+
+class VoiceTurnRequest(BaseModel):
+    # Recent history as { role, name, content }, without the turn being transcribed
+    messages: list = []
+    username: str
+    botName: str
+    characterDescription: str
+    exampleSpeech: str
+    eleven_voice_id: str
+    channelId: Optional[str] = None
+    output_format: str = TTS_DEFAULT_OUTPUT_FORMAT
 
 class VoicePreviewRequest(BaseModel):
     voice_description: str
@@ -30,37 +80,179 @@ class VoiceCreationRequest(BaseModel):
 
 @app.post("/transcribe-audio/")
 async def transcribe_audio_endpoint(file: UploadFile = File(...)):
+    """Transcribes one clip. The format comes from the upload's content type and leading bytes:
+    Ogg/Opus, raw Opus frames (audio/opus; each frame prefixed with a big-endian uint16 length),
+    WAV, or LINEAR16 (audio/L16; rate=48000; channels=2, the default)."""
     audio_data = await file.read()
-    return {"transcription": transcribe_audio(audio_data)}
+    try:
+        # Muxing raw Opus computes Ogg checksums in Python, so it stays off the event loop
+        audio_format, audio_data = await run_in_threadpool(negotiate, file.content_type, audio_data)
+    except UnsupportedAudio as e:
+        raise HTTPException(status_code=415, detail=str(e))
+    return {"transcription": await transcribe_audio(audio_data, audio_format)}
+
+@app.websocket("/transcribe-stream/")
+async def transcribe_stream_endpoint(websocket: WebSocket, sample_rate: int = 48000, channels: int = 2):
+    """Streams LINEAR16 audio in as binary messages while the user speaks.
+
+    Sends {"event": "interim" | "final", "transcript"} as results arrive. The client sends
+    {"event": "end"} (or closes) when the utterance is over and gets {"event": "done", "transcript"}.
+    """
+    await websocket.accept()
+
+    # Audio crosses to the gRPC request thread through a plain queue; None ends the stream
+    audio = queue.Queue()
+
+    def audio_chunks():
+        while True:
+            chunk = audio.get()
+            if chunk is None:
+                return
+            yield chunk
+
+    async def receive_audio():
+        try:
+            while True:
+                message = await websocket.receive()
+                if message["type"] == "websocket.disconnect":
+                    return
+                if message.get("bytes"):
+                    audio.put(message["bytes"])
+                elif message.get("text") and json.loads(message["text"]).get("event") == "end":
+                    return
+        finally:
+            audio.put(None)
+
+    receiver = asyncio.ensure_future(receive_audio())
+    results = speech.iterate(stream_transcripts(audio_chunks(), sample_rate, channels))
+    finals = []
+    try:
+        async for is_final, transcript in results:
+            if is_final:
+                finals.append(transcript.strip())
+            await websocket.send_json({"event": "final" if is_final else "interim", "transcript": transcript})
+        await websocket.send_json({"event": "done", "transcript": " ".join(finals)})
+    except (WebSocketDisconnect, RuntimeError):
+        # Client went away; nothing left to send
+        return
+    except HTTPException as e:
+        await websocket.send_json({"event": "error", "error": e.detail})
+    except Exception as e:
+        print(f"Error in streaming transcription: {e}")
+        await websocket.send_json({"event": "error", "error": "Failed to transcribe audio"})
+    finally:
+        receiver.cancel()
+        audio.put(None)
+        await results.aclose()
+    try:
+        await websocket.close()
+    except RuntimeError:
+        pass
 
 @app.post("/text-to-speech/")
 async def text_to_speech_endpoint(request: TextToSpeechRequest):
-    audio_content = text_to_speech(request.text, request.eleven_voice_id)
-    if audio_content:
-        return StreamingResponse(io.BytesIO(audio_content), media_type="audio/mpeg")
-    else:
+    media_type = output_media_type(request.output_format)
+    if media_type is None:
+        raise HTTPException(status_code=400, detail=f"Unsupported output format {request.output_format}")
+
+    chunks = await open_speech(normalize_text(request.text), request.eleven_voice_id, request.output_format)
+    if chunks is None:
         return Response(content="Failed to generate audio", status_code=500)
+    return StreamingResponse(chunks, media_type=media_type)
+
+@app.post("/voice-turn/")
+async def voice_turn_endpoint(file: UploadFile = File(...), turn: str = Form(...)):
+    """Transcribes a clip, generates the bot's reply and speaks it in one call.
+
+    `turn` is a JSON VoiceTurnRequest; the audio is negotiated like /transcribe-audio/. The reply
+    is streamed from language-model and each sentence is synthesized as soon as it completes,
+    so audio starts after the first sentence rather than the whole reply. Responds 204 if the
+    clip has no speech. The body is framed (see voice_turn.py): audio frames in X-Audio-Type,
+    then a reply frame with the full reply text. Server-Timing carries the stage timings up to
+    the first audio and X-Transcript the percent-encoded transcript.
+    """
+    timer = TurnTimer()
+    try:
+        request = VoiceTurnRequest(**json.loads(turn))
+    except (ValueError, TypeError) as e:
+        # TypeError covers JSON that is not an object
+        raise HTTPException(status_code=422, detail=f"Invalid turn: {e}")
+    media_type = output_media_type(request.output_format)
+    if media_type is None:
+        raise HTTPException(status_code=400, detail=f"Unsupported output format {request.output_format}")
+
+    audio_data = await file.read()
+    try:
+        audio_format, audio_data = await run_in_threadpool(negotiate, file.content_type, audio_data)
+    except UnsupportedAudio as e:
+        raise HTTPException(status_code=415, detail=str(e))
+
+    transcript = await transcribe_audio(audio_data, audio_format)
+    timer.mark("transcribed")
+    if not transcript:
+        return Response(status_code=204, headers=turn_headers(transcript, timer))
+
+    payload = {
+        "messages": request.messages + [{"role": "user", "name": request.username, "content": transcript}],
+        "botName": request.botName,
+        "characterDescription": request.characterDescription,
+        "exampleSpeech": request.exampleSpeech,
+        "channelId": request.channelId,
+        "priority": "voice",
+    }
+    sentences = asyncio.Queue()
+    record = {"reply": None}
+    generation = asyncio.ensure_future(generate_sentences(payload, sentences, record, timer))
+    streaming = False
+    try:
+        sentence = await sentences.get()
+        if isinstance(sentence, Exception):
+            raise sentence
+        if sentence is None:
+            raise HTTPException(status_code=502, detail="language-model returned no reply")
+        timer.mark("first_sentence")
+
+        chunks = await open_speech(normalize_text(sentence), request.eleven_voice_id, request.output_format)
+        if chunks is None:
+            return Response(content="Failed to generate audio", status_code=500)
+        timer.mark("first_audio")
+
+        streaming = True
+        return StreamingResponse(
+            turn_audio(chunks, sentences, generation, request, record, timer),
+            media_type="application/octet-stream",
+            headers={**turn_headers(transcript, timer), "X-Audio-Type": media_type}
+        )
+    finally:
+        if not streaming:
+            generation.cancel()
     
 @app.post("/generate-voice-previews/")
 async def generate_voice_previews(request: VoicePreviewRequest):
     try:
-        data = client.text_to_voice.create_previews(
+        data = await elevenlabs.run(
+            client.text_to_voice.create_previews,
             voice_description=request.voice_description,
             text=request.text
         )
         return {"previews": data.previews}
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to generate previews: {str(e)}")
 
 @app.post("/create-voice-from-preview/")
 async def create_voice_from_preview(request: VoiceCreationRequest):
     try:
-        voice = client.text_to_voice.create_voice_from_preview(
+        voice = await elevenlabs.run(
+            client.text_to_voice.create_voice_from_preview,
             voice_name=request.voice_name,
             voice_description=request.voice_description,
             generated_voice_id=request.generated_voice_id
         )
         return {"voice_id": voice.voice_id}
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to create voice: {str(e)}")
     
@@ -69,22 +261,28 @@ async def clone_voice(
     voice_name: str = Form(...),
     voice_file: UploadFile = File(...)
 ):
+    """Clones a voice from one sample. Uploads are capped at CLONE_MAX_UPLOAD_BYTES and at most
+    CLONE_MAX_CONCURRENCY clones run at once per worker."""
     try:
-        print(f"Received file: {voice_file.filename}, Content-Type: {voice_file.content_type}")
-        
-        # Read the file content
-        content = await voice_file.read()
-        print(f"File size: {len(content)} bytes")
-
-        file_stream = io.BytesIO(content)
-
-        # Clone the voice
-        voice = client.voices.add(
-            name=voice_name,
-            files=[file_stream],
-        )
+        print(f"Received file: {voice_file.filename}, Content-Type: {voice_file.content_type}, Size: {voice_file.size} bytes")
+
+        # Check the container from the first bytes only; the rest stays in the spooled upload
+        container = sniff_container(await voice_file.read(16))
+        if container is None:
+            raise HTTPException(status_code=415, detail="Voice sample must be MP3, WAV, Ogg, FLAC, M4A or WebM audio")
+        await voice_file.seek(0)
+
+        # Clone the voice, handing over the spooled file itself rather than a copy of it
+        async with clone_jobs.hold():
+            voice = await elevenlabs.run(
+                client.voices.ivc.create,
+                name=voice_name,
+                files=[(voice_file.filename, voice_file.file, voice_file.content_type)],
+            )
 
         return {"voice_id": voice.voice_id}
+    except HTTPException:
+        raise
     except Exception as e:
         print(f"Error in clone_voice: {str(e)}")
         raise HTTPException(status_code=500, detail=f"Failed to clone voice: {str(e)}")
@@ -92,32 +290,166 @@ async def clone_voice(
 @app.post("/delete-voice/{voice_id}")
 async def delete_voice(voice_id: str):
     # Delete voice and return success message
+    await run_in_threadpool(tts_cache.invalidate_voice, voice_id)
     try:
-        client.voices.delete(voice_id)
+        await elevenlabs.run(client.voices.delete, voice_id)
         return {"message": "Voice deleted successfully"}
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to delete voice: {str(e)}")
-    
-def text_to_speech(text, eleven_voice_id):
-    # Converts text to speech using Eleven Labs API.
+
+@app.get("/cache/stats")
+def get_cache_stats():
+    return tts_cache.stats()
+
+@app.get("/upstreams/stats")
+def get_upstream_stats():
+    return upstreams.stats()
+
+@app.get("/metrics")
+def get_metrics():
+    return Response(content=generate_latest(), media_type=CONTENT_TYPE_LATEST)
+
+def output_media_type(output_format):
+    codec, _, rate = output_format.partition("_")
+    media_type = OUTPUT_MEDIA_TYPES.get(codec)
+    if media_type is None or not rate:
+        return None
+    if codec == "pcm":
+        return f"{media_type};rate={rate};channels=1"
+    return media_type
+
+def text_to_speech(text, eleven_voice_id, output_format=TTS_DEFAULT_OUTPUT_FORMAT):
+    """Converts text to speech using Eleven Labs API, yielding audio chunks as they are synthesized."""
     if len(text) > 128:
         text = text[:128]  # Truncate long responses
 
+    yield from client.text_to_speech.stream(
+        voice_id=eleven_voice_id,
+        text=text,
+        model_id=TTS_MODEL_ID,
+        output_format=output_format,
+        optimize_streaming_latency=TTS_OPTIMIZE_STREAMING_LATENCY
+    )
+
+async def open_speech(text, eleven_voice_id, output_format):
+    """Starts speaking normalized text, from the clip cache when possible.
+
+    Returns an async iterator over the audio, or None if synthesis failed before the first chunk.
+    """
+    cache_path = tts_cache.path(eleven_voice_id, text, TTS_MODEL_ID, output_format)
+    if TTS_CACHE_ENABLED:
+        clip = await run_in_threadpool(tts_cache.get, cache_path)
+        if clip is not None:
+            return iterate_in_threadpool(iter_clip(clip))
+
+    # Wait for the first chunk so an upstream failure can still be reported before streaming
+    chunks = elevenlabs.iterate(text_to_speech(text, eleven_voice_id, output_format))
+    first_chunk = await next_chunk(chunks)
+    if first_chunk is None:
+        await chunks.aclose()
+        return None
+
+    # Remaining chunks are relayed as they arrive
+    writer = await run_in_threadpool(open_cache_writer, cache_path) if TTS_CACHE_ENABLED else None
+    return relay_chunks(first_chunk, chunks, writer)
+
+async def generate_sentences(payload, sentences, record, timer):
+    """Queues each reply sentence from language-model, then None; a failure is queued in place of None."""
     try:
-        audio_stream = client.text_to_speech.convert(
-            text=text,
-            voice_id=eleven_voice_id,
-            model_id="eleven_multilingual_v2"
-        )
+        async for kind, text in language_model.reply_events(payload):
+            if kind == "sentence":
+                await sentences.put(text)
+            else:
+                record["reply"] = text
+                timer.mark("reply_done")
+        await sentences.put(None)
+    except Exception as e:
+        await sentences.put(e)
 
-        # Read the generator into a BytesIO object
-        buffer = io.BytesIO()
-        for chunk in audio_stream:
-            buffer.write(chunk)
-        
-        # Get the bytes from the buffer
-        audio_bytes = buffer.getvalue()
-        return audio_bytes
+async def next_sentence_audio(sentences, request):
+    """Audio for the next queued sentence, or None once the reply is over."""
+    while True:
+        sentence = await sentences.get()
+        if sentence is None:
+            return None
+        if isinstance(sentence, Exception):
+            print(f"Error generating voice reply: {sentence}")
+            return None
+        chunks = await open_speech(normalize_text(sentence), request.eleven_voice_id, request.output_format)
+        # A sentence that fails to synthesize is skipped rather than ending the turn
+        if chunks is not None:
+            return chunks
+
+async def turn_audio(chunks, sentences, generation, request, record, timer):
+    """Streams the first sentence's audio, then synthesizes and streams each later sentence as it arrives.
+
+    Each chunk goes out as an audio frame; the reply frame follows the last one, even if the turn failed part way.
+    """
+    try:
+        while chunks is not None:
+            async for chunk in chunks:
+                yield audio_frame(chunk)
+            chunks = None
+            chunks = await next_sentence_audio(sentences, request)
+        timer.mark("audio_done")
+    except Exception as e:
+        print(f"Error in voice turn: {e}")
+    finally:
+        if chunks is not None:
+            await chunks.aclose()
+        generation.cancel()
+    yield reply_frame(record["reply"], timer)
+
+async def next_chunk(chunks):
+    """First chunk of a synthesis, or None if it failed; pool limits still surface as 503/504."""
+    try:
+        return await chunks.__anext__()
+    except StopAsyncIteration:
+        return None
+    except HTTPException:
+        await chunks.aclose()
+        raise
+    except Exception as e:
+        print(f"Error in text_to_speech: {e}")
+        return None
+
+def open_cache_writer(cache_path):
+    try:
+        return tts_cache.writer(cache_path)
+    except OSError as e:
+        print(f"Error opening TTS cache entry: {e}")
+        return None
+
+async def relay_chunks(first_chunk, chunks, writer=None):
+    """Yields the clip and, given a writer, caches it once every chunk has arrived.
+
+    Writer calls touch the disk, so they run in the threadpool rather than on the event loop.
+    """
+    completed = False
+    try:
+        async for chunk in prepend(first_chunk, chunks):
+            if writer is not None:
+                try:
+                    await run_in_threadpool(writer.write, chunk)
+                except OSError as e:
+                    # Caching is best effort; keep streaming to the client
+                    print(f"Error writing TTS cache entry: {e}")
+                    await run_in_threadpool(writer.abort)
+                    writer = None
+            yield chunk
+        completed = True
     except Exception as e:
         print(f"Error in text_to_speech: {e}")
-        return None
\ No newline at end of file
+    finally:
+        if writer is not None:
+            if completed:
+                await run_in_threadpool(writer.commit)
+            else:
+                await run_in_threadpool(writer.abort)
+
+async def prepend(first_chunk, chunks):
+    yield first_chunk
+    async for chunk in chunks:
+        yield chunk
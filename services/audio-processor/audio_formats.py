@@ -0,0 +1,243 @@
+import struct
+from dataclasses import dataclass
+from typing import Optional
+
+# Rates Google accepts for OGG_OPUS
+OPUS_RATES = (8000, 12000, 16000, 24000, 48000)
+
+# Ogg pages hold at most 255 lacing values
+MAX_PAGE_SEGMENTS = 255
+
+# Opus packets this short carry no speech: TOC-only DTX frames and Discord's F8 FF FE silence frame
+OPUS_SILENT_PACKET_BYTES = 3
+
+@dataclass
+class AudioFormat:
+    """What an upload holds, as needed to pick a RecognitionConfig."""
+    encoding: str  # "linear16" or "ogg_opus"
+    sample_rate: int
+    channels: int
+    # Milliseconds of non-silent Opus packets; None when the clip is PCM and is checked after decoding
+    voiced_ms: Optional[float] = None
+
+class UnsupportedAudio(ValueError):
+    pass
+
+def parse_content_type(content_type):
+    """Splits "audio/opus; rate=48000; channels=2" into ("audio/opus", {"rate": "48000", "channels": "2"})."""
+    media_type, *params = [part.strip() for part in (content_type or "").split(";")]
+    options = {}
+    for param in params:
+        key, _, value = param.partition("=")
+        options[key.strip().lower()] = value.strip().strip('"')
+    return media_type.lower(), options
+
+def positive_option(options, name, default):
+    """Reads a content-type parameter that must be a positive integer."""
+    value = options.get(name)
+    if value is None:
+        return default
+    try:
+        number = int(value)
+    except ValueError:
+        raise UnsupportedAudio(f"Invalid {name} {value!r}")
+    if number <= 0:
+        raise UnsupportedAudio(f"Invalid {name} {value!r}")
+    return number
+
+def negotiate(content_type, data):
+    """Works out the upload's format from its content type and leading bytes.
+
+    Returns (AudioFormat, audio bytes). Raw Opus frames are wrapped in an Ogg container so
+    they can be passed through; Ogg/Opus is passed through as is; WAV has its header stripped.
+    Anything else is taken as LINEAR16 with rate/channels parameters (48 kHz stereo by default).
+    """
+    media_type, options = parse_content_type(content_type)
+
+    if data[:4] == b"OggS" or media_type in ("audio/ogg", "application/ogg"):
+        audio_format = ogg_opus_format(data)
+        audio_format.voiced_ms = opus_voiced_ms(
+            packet for packet in ogg_packets(data) if packet[:8] not in (b"OpusHead", b"OpusTags")
+        )
+        return audio_format, data
+
+    if data[:4] == b"RIFF" and data[8:12] == b"WAVE" or media_type in ("audio/wav", "audio/x-wav", "audio/wave"):
+        return parse_wav(data)
+
+    if media_type == "audio/opus":
+        channels = positive_option(options, "channels", 2)
+        rate = positive_option(options, "rate", 48000)
+        if channels > 2:
+            raise UnsupportedAudio("Raw Opus must be mono or stereo")
+        packets = split_length_prefixed(data)
+        audio_format = AudioFormat("ogg_opus", opus_rate(rate), channels, opus_voiced_ms(packets))
+        return audio_format, mux_ogg_opus(packets, channels, rate)
+
+    if media_type in ("", "audio/l16", "audio/pcm", "application/octet-stream"):
+        rate = positive_option(options, "rate", 48000)
+        channels = positive_option(options, "channels", 2)
+        return AudioFormat("linear16", rate, channels), data
+
+    raise UnsupportedAudio(f"Unsupported audio type {media_type}")
+
+def sniff_container(head):
+    """Names the audio container from a file's first bytes, or None if it is not one ElevenLabs takes."""
+    if head[:3] == b"ID3" or head[:2] in (b"\xff\xfb", b"\xff\xf3", b"\xff\xf2"):
+        return "mp3"
+    if head[:4] == b"RIFF" and head[8:12] == b"WAVE":
+        return "wav"
+    if head[:4] == b"OggS":
+        return "ogg"
+    if head[:4] == b"fLaC":
+        return "flac"
+    if head[4:8] == b"ftyp":
+        return "m4a"
+    if head[:4] == b"\x1a\x45\xdf\xa3":
+        return "webm"
+    return None
+
+def opus_rate(rate):
+    return rate if rate in OPUS_RATES else 48000
+
+def ogg_opus_format(data):
+    """Reads channel count and input rate from the OpusHead packet on the first Ogg page."""
+    if data[:4] != b"OggS" or len(data) < 27:
+        raise UnsupportedAudio("Not an Ogg stream")
+    segments = data[26]
+    payload = data[27 + segments:27 + segments + 19]
+    if payload[:8] != b"OpusHead" or len(payload) < 19:
+        raise UnsupportedAudio("Ogg stream does not contain Opus")
+    channels = payload[9]
+    rate = struct.unpack_from("<I", payload, 12)[0]
+    if channels == 0:
+        raise UnsupportedAudio("Opus stream has no channels")
+    return AudioFormat("ogg_opus", opus_rate(rate), channels)
+
+def parse_wav(data):
+    """Finds the fmt and data chunks of a PCM WAV file."""
+    if data[:4] != b"RIFF" or data[8:12] != b"WAVE":
+        raise UnsupportedAudio("Not a WAV file")
+    offset = 12
+    audio_format = None
+    while offset + 8 <= len(data):
+        chunk_id, size = struct.unpack_from("<4sI", data, offset)
+        body = data[offset + 8:offset + 8 + size]
+        if chunk_id == b"fmt ":
+            if len(body) < 16:
+                raise UnsupportedAudio("WAV fmt chunk is truncated")
+            tag, channels, rate, _, _, bits = struct.unpack_from("<HHIIHH", body)
+            if tag != 1 or bits != 16:
+                raise UnsupportedAudio("Only 16-bit PCM WAV is supported")
+            if channels == 0 or rate == 0:
+                raise UnsupportedAudio("WAV fmt chunk has no channels or sample rate")
+            audio_format = AudioFormat("linear16", rate, channels)
+        elif chunk_id == b"data" and audio_format is not None:
+            return audio_format, body
+        offset += 8 + size + size % 2
+    raise UnsupportedAudio("WAV file has no audio data")
+
+def split_length_prefixed(data):
+    """Splits raw Opus frames, each preceded by its length as a big-endian uint16."""
+    packets = []
+    offset = 0
+    while offset < len(data):
+        if offset + 2 > len(data):
+            raise UnsupportedAudio("Truncated Opus frame header")
+        size = struct.unpack_from(">H", data, offset)[0]
+        offset += 2
+        if size == 0 or offset + size > len(data):
+            raise UnsupportedAudio("Malformed Opus frame")
+        packets.append(data[offset:offset + size])
+        offset += size
+    return packets
+
+def opus_packet_samples(packet):
+    """Samples at 48 kHz in one Opus packet, from its TOC byte (RFC 6716 section 3.1)."""
+    config = packet[0] >> 3
+    if config < 12:
+        frame = (480, 960, 1920, 2880)[config % 4]
+    elif config < 16:
+        frame = (480, 960)[config % 2]
+    else:
+        frame = (120, 240, 480, 960)[config % 4]
+    code = packet[0] & 0x03
+    if code == 0:
+        frames = 1
+    elif code in (1, 2):
+        frames = 2
+    else:
+        frames = packet[1] & 0x3F if len(packet) > 1 else 0
+    return frame * frames
+
+def opus_voiced_ms(packets):
+    """Duration of the packets that are not silence or DTX frames, in milliseconds."""
+    return sum(
+        opus_packet_samples(packet) for packet in packets if len(packet) > OPUS_SILENT_PACKET_BYTES
+    ) / 48
+
+def ogg_packets(data):
+    """Yields the packets of an Ogg stream in order, stopping at the first page that is cut short."""
+    offset = 0
+    packet = b""
+    while offset + 27 <= len(data) and data[offset:offset + 4] == b"OggS":
+        segments = data[offset + 26]
+        body = offset + 27 + segments
+        for size in data[offset + 27:body]:
+            packet += data[body:body + size]
+            body += size
+            if size < 255:
+                yield packet
+                packet = b""
+        offset = body
+
+def _crc_table():
+    table = []
+    for i in range(256):
+        crc = i << 24
+        for _ in range(8):
+            crc = ((crc << 1) ^ 0x04C11DB7) if crc & 0x80000000 else crc << 1
+        table.append(crc & 0xFFFFFFFF)
+    return table
+
+CRC_TABLE = _crc_table()
+
+def ogg_crc(data):
+    crc = 0
+    for byte in data:
+        crc = ((crc << 8) & 0xFFFFFFFF) ^ CRC_TABLE[(crc >> 24) ^ byte]
+    return crc
+
+def lacing(packet):
+    return [255] * (len(packet) // 255) + [len(packet) % 255]
+
+def ogg_page(packets, granule, sequence, header_type, serial=1):
+    segments = [value for packet in packets for value in lacing(packet)]
+    header = struct.pack(
+        "<4sBBqIIIB", b"OggS", 0, header_type, granule, serial, sequence, 0, len(segments)
+    ) + bytes(segments)
+    page = bytearray(header + b"".join(packets))
+    struct.pack_into("<I", page, 22, ogg_crc(page))
+    return bytes(page)
+
+def mux_ogg_opus(packets, channels, rate):
+    """Wraps raw Opus packets in a minimal Ogg/Opus stream (RFC 7845)."""
+    if not packets:
+        raise UnsupportedAudio("No Opus frames")
+    head = struct.pack("<8sBBHIhB", b"OpusHead", 1, channels, 0, rate, 0, 0)
+    vendor = b"audio-processor"
+    tags = struct.pack("<8sI", b"OpusTags", len(vendor)) + vendor + struct.pack("<I", 0)
+    pages = [ogg_page([head], 0, 0, 0x02), ogg_page([tags], 0, 1, 0x00)]
+
+    granule = 0
+    page_packets = []
+    page_segments = 0
+    for packet in packets:
+        segments = len(lacing(packet))
+        if page_packets and page_segments + segments > MAX_PAGE_SEGMENTS:
+            pages.append(ogg_page(page_packets, granule, len(pages), 0x00))
+            page_packets, page_segments = [], 0
+        page_packets.append(packet)
+        page_segments += segments
+        granule += opus_packet_samples(packet)
+    pages.append(ogg_page(page_packets, granule, len(pages), 0x04))
+    return b"".join(pages)
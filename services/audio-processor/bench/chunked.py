@@ -0,0 +1,55 @@
+"""Times transcribe_audio() on long synthetic clips with a fake recognizer whose latency grows with chunk length.
+
+Run from services/audio-processor:
+    python -m bench.chunked --lengths 10 30 60 --realtime-factor 0.1 --concurrency 1 4
+--concurrency 1 recognizes the chunks one after another, which is what a single long request
+costs; higher values show how close the wall time gets to the slowest chunk.
+"""
+import argparse
+import asyncio
+import json
+import time
+import numpy as np
+import transcriber
+from bench.preprocess import synthetic_clip
+
+def fake_recognize(realtime_factor, calls):
+    def recognize(content, config):
+        seconds = len(content) / 2 / config.sample_rate_hertz
+        calls.append(seconds)
+        time.sleep(seconds * realtime_factor)
+        return f"chunk {len(calls)}"
+    return recognize
+
+def main(args):
+    calls = []
+    transcriber.recognize = fake_recognize(args.realtime_factor, calls)
+    rng = np.random.default_rng(0)
+    report = []
+    for seconds in args.lengths:
+        clip = synthetic_clip(seconds, rng)
+        for concurrency in args.concurrency:
+            transcriber.TRANSCRIBE_CHUNK_CONCURRENCY = concurrency
+            calls.clear()
+            start = time.perf_counter()
+            asyncio.run(transcriber.transcribe_audio(clip))
+            report.append({
+                "clip_seconds": seconds,
+                "concurrency": concurrency,
+                "chunks": len(calls),
+                "slowest_chunk_ms": round(max(calls) * args.realtime_factor * 1000, 1),
+                "wall_ms": round((time.perf_counter() - start) * 1000, 1),
+            })
+            print(json.dumps(report[-1]))
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--lengths", type=float, nargs="+", default=[10, 30, 60])
+    parser.add_argument("--realtime-factor", type=float, default=0.1)
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 4])
+    parser.add_argument("--output")
+    main(parser.parse_args())
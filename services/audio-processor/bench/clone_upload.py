@@ -0,0 +1,95 @@
+"""Measures peak Python memory while several /clone-voice/ uploads are in flight at once.
+
+Run from services/audio-processor:
+    python -m bench.clone_upload --size-mb 8 --clones 6
+The fake ElevenLabs call reads the file it is handed in 64 KB chunks and sleeps, like an upload
+over a slow link. Samples are sent from a temp file so the client side does not hold them either.
+"""
+import argparse
+import asyncio
+import json
+import os
+import tempfile
+import threading
+import time
+import tracemalloc
+import types
+
+os.environ.setdefault("TTS_CACHE_ENABLED", "false")
+os.environ.setdefault("TTS_CACHE_DIR", tempfile.mkdtemp(prefix="tts-bench-"))
+
+import httpx
+import uvicorn
+import app as service
+
+def fake_ivc_create(latency):
+    def create(name, files):
+        for _, file, _ in files:
+            while file.read(64 * 1024):
+                time.sleep(latency / 100)
+        return types.SimpleNamespace(voice_id=f"voice-{name}")
+    return create
+
+def sample_file(size):
+    """A WAV header followed by size bytes of silence, written to disk."""
+    f = tempfile.NamedTemporaryFile(suffix=".wav", delete=False)
+    f.write(b"RIFF" + (size + 36).to_bytes(4, "little") + b"WAVE")
+    f.write(b"\0" * size)
+    f.close()
+    return f.name
+
+async def drive(args, url, path):
+    async with httpx.AsyncClient(base_url=url, timeout=120) as client:
+        async def clone(i):
+            with open(path, "rb") as f:
+                response = await client.post(
+                    "/clone-voice/", data={"voice_name": f"bench-{i}"}, files={"voice_file": ("sample.wav", f, "audio/wav")}
+                )
+            return response.status_code
+
+        start = time.perf_counter()
+        statuses = await asyncio.gather(*(clone(i) for i in range(args.clones)))
+        return statuses, time.perf_counter() - start
+
+def main(args):
+    service.client = types.SimpleNamespace(
+        voices=types.SimpleNamespace(ivc=types.SimpleNamespace(create=fake_ivc_create(args.latency_ms / 1000)))
+    )
+    path = sample_file(int(args.size_mb * 1024 * 1024))
+
+    config = uvicorn.Config(service.app, port=args.port, log_level="warning")
+    server = uvicorn.Server(config)
+    thread = threading.Thread(target=server.run, daemon=True)
+    thread.start()
+    while not server.started:
+        time.sleep(0.05)
+    tracemalloc.start()
+    try:
+        statuses, elapsed = asyncio.run(drive(args, f"http://127.0.0.1:{args.port}", path))
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+        server.should_exit = True
+        thread.join()
+        os.remove(path)
+
+    report = {
+        "clones": args.clones,
+        "size_mb": args.size_mb,
+        "statuses": {str(status): statuses.count(status) for status in set(statuses)},
+        "wall_ms": round(elapsed * 1000, 1),
+        "peak_traced_mb": round(peak / 1024 / 1024, 1),
+    }
+    print(json.dumps(report, indent=2))
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--size-mb", type=float, default=8)
+    parser.add_argument("--clones", type=int, default=6)
+    parser.add_argument("--latency-ms", type=float, default=500)
+    parser.add_argument("--port", type=int, default=5064)
+    parser.add_argument("--output")
+    main(parser.parse_args())
@@ -0,0 +1,110 @@
+"""Fires concurrent /transcribe-audio/ and /text-to-speech/ requests at an in-process server with fake blocking upstreams.
+
+Run from services/audio-processor:
+    python -m bench.concurrency --requests 16 --latency-ms 500
+The fakes sleep in their calling thread like the real SDKs do. --mode inline runs them on the event
+loop the way the endpoints used to, so the two modes show whether requests serialize.
+"""
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import tempfile
+import threading
+import time
+import types
+
+os.environ.setdefault("TTS_CACHE_ENABLED", "false")
+os.environ.setdefault("TTS_CACHE_DIR", tempfile.mkdtemp(prefix="tts-bench-"))
+
+import httpx
+import numpy as np
+import uvicorn
+import app as service
+import transcriber
+import upstreams
+from bench.preprocess import synthetic_clip
+
+def fake_recognize(latency):
+    def recognize(content, config):
+        time.sleep(latency)
+        return "fake transcription"
+    return recognize
+
+def fake_tts_stream(latency, chunks):
+    def stream(**kwargs):
+        for _ in range(chunks):
+            time.sleep(latency / chunks)
+            yield b"\0" * 4096
+    return stream
+
+def run_inline(self, lease, fn, *args, **kwargs):
+    # What the endpoints did before: call the blocking SDK on the event loop
+    async def call():
+        return fn(*args, **kwargs)
+    return call()
+
+async def drive(args, url):
+    clip = synthetic_clip(1, np.random.default_rng(0))
+    async with httpx.AsyncClient(base_url=url, timeout=120) as client:
+        async def transcribe():
+            start = time.perf_counter()
+            response = await client.post("/transcribe-audio/", files={"file": ("audio.pcm", clip)})
+            return "transcribe", response.status_code, time.perf_counter() - start
+
+        async def tts(i):
+            start = time.perf_counter()
+            response = await client.post("/text-to-speech/", json={"text": f"line {i}", "eleven_voice_id": "bench"})
+            return "tts", response.status_code, time.perf_counter() - start
+
+        calls = [transcribe() if i % 2 else tts(i) for i in range(args.requests)]
+        start = time.perf_counter()
+        results = await asyncio.gather(*calls)
+        elapsed = time.perf_counter() - start
+
+    report = {"mode": args.mode, "requests": args.requests, "upstream_latency_ms": args.latency_ms,
+              "wall_ms": round(elapsed * 1000, 1),
+              "serial_ms": round(args.requests * args.latency_ms, 1)}
+    for kind in ("transcribe", "tts"):
+        latencies = sorted(latency for name, status, latency in results if name == kind and status == 200)
+        report[kind] = {
+            "ok": len(latencies),
+            "errors": sum(1 for name, status, _ in results if name == kind and status != 200),
+            "mean_ms": round(statistics.mean(latencies) * 1000, 1) if latencies else None,
+            "max_ms": round(latencies[-1] * 1000, 1) if latencies else None,
+        }
+    return report
+
+def main(args):
+    latency = args.latency_ms / 1000
+    transcriber.recognize = fake_recognize(latency)
+    service.client = types.SimpleNamespace(text_to_speech=types.SimpleNamespace(stream=fake_tts_stream(latency, 8)))
+    if args.mode == "inline":
+        upstreams.Upstream._call = run_inline
+
+    config = uvicorn.Config(service.app, port=args.port, log_level="warning")
+    server = uvicorn.Server(config)
+    thread = threading.Thread(target=server.run, daemon=True)
+    thread.start()
+    while not server.started:
+        time.sleep(0.05)
+    try:
+        report = asyncio.run(drive(args, f"http://127.0.0.1:{args.port}"))
+    finally:
+        server.should_exit = True
+        thread.join()
+
+    print(json.dumps(report, indent=2))
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--mode", choices=["pooled", "inline"], default="pooled")
+    parser.add_argument("--requests", type=int, default=16)
+    parser.add_argument("--latency-ms", type=float, default=500)
+    parser.add_argument("--port", type=int, default=5061)
+    parser.add_argument("--output")
+    main(parser.parse_args())
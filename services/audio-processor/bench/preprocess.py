@@ -0,0 +1,62 @@
+"""Times preprocess() (downmix, 48 kHz -> 16 kHz, silence trim) on synthetic clips of typical lengths.
+
+Run from services/audio-processor:
+    python -m bench.preprocess --lengths 1 3 8 30 --repeats 20
+Each clip is 48 kHz stereo LINEAR16 like the bot sends: half a second of low noise on each side
+of a voiced section built from modulated harmonics.
+"""
+import argparse
+import json
+import time
+import numpy as np
+from preprocess import preprocess
+
+SAMPLE_RATE = 48000
+SILENCE_SECONDS = 0.5
+
+def synthetic_clip(seconds, rng):
+    t = np.arange(int(seconds * SAMPLE_RATE)) / SAMPLE_RATE
+    # Syllable-rate envelope over a few harmonics of a wandering pitch
+    pitch = 140 + 30 * np.sin(2 * np.pi * 0.7 * t)
+    phase = 2 * np.pi * np.cumsum(pitch) / SAMPLE_RATE
+    voice = sum(np.sin(k * phase) / k for k in range(1, 6))
+    envelope = 0.5 + 0.5 * np.sin(2 * np.pi * 4 * t) ** 2
+    voice = 6000 * voice * envelope
+    silence = np.zeros(int(SILENCE_SECONDS * SAMPLE_RATE))
+    mono = np.concatenate([silence, voice, silence]) + rng.normal(0, 20, len(voice) + 2 * len(silence))
+    stereo = np.stack([mono, mono * 0.9], axis=1)
+    return np.clip(stereo, -32768, 32767).astype("<i2").tobytes()
+
+def main(args):
+    rng = np.random.default_rng(0)
+    report = []
+    for seconds in args.lengths:
+        clip = synthetic_clip(seconds, rng)
+        preprocess(clip)  # warm up
+        timings = []
+        for _ in range(args.repeats):
+            start = time.perf_counter()
+            pcm, rate = preprocess(clip)
+            timings.append(time.perf_counter() - start)
+        timings.sort()
+        clip_seconds = seconds + 2 * SILENCE_SECONDS
+        report.append({
+            "clip_seconds": clip_seconds,
+            "input_bytes": len(clip),
+            "output_bytes": len(pcm),
+            "reduction": round(len(clip) / len(pcm), 1),
+            "median_ms": round(timings[len(timings) // 2] * 1000, 3),
+            "max_ms": round(timings[-1] * 1000, 3),
+            "realtime_factor": round(clip_seconds / timings[len(timings) // 2]),
+        })
+        print(json.dumps(report[-1]))
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--lengths", type=float, nargs="+", default=[1, 3, 8, 30])
+    parser.add_argument("--repeats", type=int, default=20)
+    parser.add_argument("--output")
+    main(parser.parse_args())
@@ -0,0 +1,126 @@
+"""Compares time to first reply audio for the bot's three sequential calls against one /voice-turn/ call.
+
+Run from services/audio-processor with language-model up (see services/language-model/bench/stub_server.py):
+    python -m bench.voice_turn --language-model-url http://127.0.0.1:8766 --turns 10
+Recognition and synthesis are fakes that sleep like the real SDKs: --stt-ms per clip, --tts-ms before
+the first audio chunk of each synthesis. Every turn carries a unique message so language-model's
+response cache never answers it.
+"""
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import tempfile
+import threading
+import time
+import types
+import uuid
+
+os.environ.setdefault("TTS_CACHE_ENABLED", "false")
+os.environ.setdefault("TTS_CACHE_DIR", tempfile.mkdtemp(prefix="tts-bench-"))
+
+import httpx
+import numpy as np
+import uvicorn
+import app as service
+import language_model
+import transcriber
+from bench.preprocess import synthetic_clip
+
+BOT = {"botName": "Pepper", "characterDescription": "A cheerful bench bot.", "exampleSpeech": "Hello!"}
+
+def fake_recognize(latency):
+    def recognize(content, config):
+        time.sleep(latency)
+        return f"tell me something {uuid.uuid4().hex[:8]}"
+    return recognize
+
+def fake_tts_stream(first_chunk_latency, chunks):
+    def stream(**kwargs):
+        time.sleep(first_chunk_latency)
+        for _ in range(chunks):
+            yield b"\0" * 4096
+            time.sleep(0.01)
+    return stream
+
+async def read_audio(response, start):
+    """(ms to first audio byte, ms to last) for a streamed audio response."""
+    first = None
+    async for chunk in response.aiter_bytes():
+        if chunk and first is None:
+            first = time.perf_counter() - start
+    return round(first * 1000, 1), round((time.perf_counter() - start) * 1000, 1)
+
+async def sequential_turn(client, language_model_url, clip):
+    start = time.perf_counter()
+    response = await client.post("/transcribe-audio/", files={"file": ("audio.pcm", clip)})
+    transcript = response.json()["transcription"]
+    response = await client.post(f"{language_model_url}/generate/", json={
+        **BOT, "messages": [{"role": "user", "name": "bench", "content": transcript}], "priority": "voice"
+    })
+    reply = response.json()["reply"]
+    async with client.stream("POST", "/text-to-speech/", json={"text": reply, "eleven_voice_id": "bench"}) as response:
+        return await read_audio(response, start), None
+
+async def pipelined_turn(client, clip):
+    start = time.perf_counter()
+    turn = {**BOT, "username": "bench", "eleven_voice_id": "bench", "messages": []}
+    async with client.stream(
+        "POST", "/voice-turn/", files={"file": ("audio.pcm", clip)}, data={"turn": json.dumps(turn)}
+    ) as response:
+        return await read_audio(response, start), response.headers.get("Server-Timing")
+
+async def drive(args, url):
+    clip = synthetic_clip(2, np.random.default_rng(0))
+    report = {"turns": args.turns, "stt_ms": args.stt_ms, "tts_ms": args.tts_ms}
+    async with httpx.AsyncClient(base_url=url, timeout=120) as client:
+        for mode in ("sequential", "pipelined"):
+            results = []
+            for _ in range(args.turns):
+                if mode == "sequential":
+                    results.append(await sequential_turn(client, args.language_model_url, clip))
+                else:
+                    results.append(await pipelined_turn(client, clip))
+            first = [timing[0] for timing, _ in results]
+            last = [timing[1] for timing, _ in results]
+            report[mode] = {
+                "first_audio_ms": round(statistics.median(first), 1),
+                "last_audio_ms": round(statistics.median(last), 1),
+                "server_timing": results[-1][1],
+            }
+    return report
+
+def main(args):
+    transcriber.recognize = fake_recognize(args.stt_ms / 1000)
+    service.client = types.SimpleNamespace(
+        text_to_speech=types.SimpleNamespace(stream=fake_tts_stream(args.tts_ms / 1000, 8))
+    )
+    language_model.LANGUAGE_MODEL_URL = args.language_model_url
+
+    config = uvicorn.Config(service.app, port=args.port, log_level="warning")
+    server = uvicorn.Server(config)
+    thread = threading.Thread(target=server.run, daemon=True)
+    thread.start()
+    while not server.started:
+        time.sleep(0.05)
+    try:
+        report = asyncio.run(drive(args, f"http://127.0.0.1:{args.port}"))
+    finally:
+        server.should_exit = True
+        thread.join()
+
+    print(json.dumps(report, indent=2))
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--language-model-url", default="http://127.0.0.1:8766")
+    parser.add_argument("--turns", type=int, default=10)
+    parser.add_argument("--stt-ms", type=float, default=300)
+    parser.add_argument("--tts-ms", type=float, default=250)
+    parser.add_argument("--port", type=int, default=5062)
+    parser.add_argument("--output")
+    main(parser.parse_args())
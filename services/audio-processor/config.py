@@ -4,4 +4,45 @@ from dotenv import load_dotenv
 load_dotenv()
 
 ELEVEN_LABS_API_KEY = os.getenv("ELEVEN_LABS_API_KEY")
-LANGUAGE_MODEL_URL = os.getenv("LANGUAGE_MODEL_URL")
\ No newline at end of file
+LANGUAGE_MODEL_URL = os.getenv("LANGUAGE_MODEL_URL")
+
+# Pooled client for language-model, used by /voice-turn/
+LANGUAGE_MODEL_TIMEOUT = float(os.getenv("LANGUAGE_MODEL_TIMEOUT", "30"))
+LANGUAGE_MODEL_CONNECT_TIMEOUT = float(os.getenv("LANGUAGE_MODEL_CONNECT_TIMEOUT", "5"))
+LANGUAGE_MODEL_MAX_CONNECTIONS = int(os.getenv("LANGUAGE_MODEL_MAX_CONNECTIONS", "32"))
+LANGUAGE_MODEL_MAX_KEEPALIVE_CONNECTIONS = int(os.getenv("LANGUAGE_MODEL_MAX_KEEPALIVE_CONNECTIONS", "8"))
+LANGUAGE_MODEL_KEEPALIVE_EXPIRY = float(os.getenv("LANGUAGE_MODEL_KEEPALIVE_EXPIRY", "60"))
+
+# Text to speech; TTS_OPTIMIZE_STREAMING_LATENCY trades quality for time to first audio (0-4)
+TTS_MODEL_ID = os.getenv("TTS_MODEL_ID", "eleven_multilingual_v2")
+TTS_OPTIMIZE_STREAMING_LATENCY = int(os.getenv("TTS_OPTIMIZE_STREAMING_LATENCY", "3"))
+TTS_DEFAULT_OUTPUT_FORMAT = os.getenv("TTS_DEFAULT_OUTPUT_FORMAT", "mp3_44100_128")
+
+# Synthesized clip cache; the disk store is evicted by total size, the most recent clips stay memory-mapped
+TTS_CACHE_ENABLED = os.getenv("TTS_CACHE_ENABLED", "true").lower() == "true"
+TTS_CACHE_DIR = os.getenv("TTS_CACHE_DIR", "/tmp/tts-cache")
+TTS_CACHE_MEMORY_MAX_BYTES = int(os.getenv("TTS_CACHE_MEMORY_MAX_BYTES", str(64 * 1024 * 1024)))
+TTS_CACHE_DISK_MAX_BYTES = int(os.getenv("TTS_CACHE_DISK_MAX_BYTES", str(1024 * 1024 * 1024)))
+
+# Blocking SDK calls run on one bounded pool per upstream; waits past UPSTREAM_QUEUE_TIMEOUT get a 503
+ELEVENLABS_MAX_CONCURRENCY = int(os.getenv("ELEVENLABS_MAX_CONCURRENCY", "8"))
+ELEVENLABS_TIMEOUT = float(os.getenv("ELEVENLABS_TIMEOUT", "30"))
+SPEECH_MAX_CONCURRENCY = int(os.getenv("SPEECH_MAX_CONCURRENCY", "8"))
+SPEECH_TIMEOUT = float(os.getenv("SPEECH_TIMEOUT", "30"))
+UPSTREAM_QUEUE_TIMEOUT = float(os.getenv("UPSTREAM_QUEUE_TIMEOUT", "5"))
+
+# Voice clone uploads; bodies over CLONE_MAX_UPLOAD_BYTES are cut off as they stream in
+CLONE_MAX_UPLOAD_BYTES = int(os.getenv("CLONE_MAX_UPLOAD_BYTES", str(10 * 1024 * 1024)))
+CLONE_MAX_CONCURRENCY = int(os.getenv("CLONE_MAX_CONCURRENCY", "2"))
+
+# Audio sent for recognition is downmixed, resampled and trimmed to its voiced span
+PREPROCESS_TARGET_RATE = int(os.getenv("PREPROCESS_TARGET_RATE", "16000"))
+VAD_THRESHOLD_DBFS = float(os.getenv("VAD_THRESHOLD_DBFS", "-45"))
+VAD_FRAME_MS = int(os.getenv("VAD_FRAME_MS", "20"))
+VAD_PADDING_MS = int(os.getenv("VAD_PADDING_MS", "200"))
+VAD_MIN_SPEECH_MS = int(os.getenv("VAD_MIN_SPEECH_MS", "100"))
+
+# Long clips are split at silence into overlapping chunks that are recognized concurrently
+TRANSCRIBE_CHUNK_SECONDS = float(os.getenv("TRANSCRIBE_CHUNK_SECONDS", "15"))
+TRANSCRIBE_CHUNK_OVERLAP_MS = int(os.getenv("TRANSCRIBE_CHUNK_OVERLAP_MS", "300"))
+TRANSCRIBE_CHUNK_CONCURRENCY = int(os.getenv("TRANSCRIBE_CHUNK_CONCURRENCY", "4"))
@@ -0,0 +1,51 @@
+import json
+import httpx
+from fastapi import HTTPException
+from config import (
+    LANGUAGE_MODEL_URL, LANGUAGE_MODEL_TIMEOUT, LANGUAGE_MODEL_CONNECT_TIMEOUT, LANGUAGE_MODEL_MAX_CONNECTIONS,
+    LANGUAGE_MODEL_MAX_KEEPALIVE_CONNECTIONS, LANGUAGE_MODEL_KEEPALIVE_EXPIRY
+)
+
+# One pooled client per process, opened on startup
+client = None
+
+def open_client():
+    global client
+    client = httpx.AsyncClient(
+        base_url=LANGUAGE_MODEL_URL or "",
+        timeout=httpx.Timeout(LANGUAGE_MODEL_TIMEOUT, connect=LANGUAGE_MODEL_CONNECT_TIMEOUT),
+        limits=httpx.Limits(
+            max_connections=LANGUAGE_MODEL_MAX_CONNECTIONS,
+            max_keepalive_connections=LANGUAGE_MODEL_MAX_KEEPALIVE_CONNECTIONS,
+            keepalive_expiry=LANGUAGE_MODEL_KEEPALIVE_EXPIRY
+        )
+    )
+
+async def close_client():
+    if client is not None:
+        await client.aclose()
+
+async def reply_events(payload):
+    """Yields the (event, text) pairs of a streamed reply from /generate/stream: each "sentence", then "done" with the full reply.
+
+    A refusal before the stream starts is raised with language-model's status; an error event mid-stream as a 502.
+    """
+    try:
+        async with client.stream("POST", "/generate/stream", json=payload) as response:
+            if response.status_code != 200:
+                body = await response.aread()
+                headers = {"Retry-After": response.headers["Retry-After"]} if "Retry-After" in response.headers else None
+                raise HTTPException(status_code=response.status_code, detail=body.decode(errors="replace"), headers=headers)
+            async for line in response.aiter_lines():
+                if not line:
+                    continue
+                message = json.loads(line)
+                if message["event"] == "sentence":
+                    yield "sentence", message["text"]
+                elif message["event"] == "done":
+                    yield "done", message["reply"]
+                elif message["event"] == "error":
+                    raise HTTPException(status_code=502, detail=message["error"])
+    except httpx.HTTPError as e:
+        print(f"Error calling language-model: {e}")
+        raise HTTPException(status_code=502, detail="Failed to reach language-model")
@@ -0,0 +1,23 @@
+from prometheus_client import REGISTRY
+from prometheus_client.core import CounterMetricFamily, GaugeMetricFamily
+from tts_cache import tts_cache
+
+class TTSCacheCollector:
+    """Exports the counters kept by tts_cache."""
+
+    def collect(self):
+        stats = tts_cache.stats()
+        hits = CounterMetricFamily("tts_cache_hits", "Text-to-speech cache hits", labels=["tier"])
+        hits.add_metric(["memory"], stats["memory_hits"])
+        hits.add_metric(["disk"], stats["disk_hits"])
+        yield hits
+        yield CounterMetricFamily("tts_cache_misses", "Text-to-speech cache misses", value=stats["misses"])
+        yield CounterMetricFamily("tts_cache_evictions", "Clips evicted from disk to stay under the size limit", value=stats["evictions"])
+        size = GaugeMetricFamily("tts_cache_bytes", "Bytes held by the text-to-speech cache", labels=["tier"])
+        size.add_metric(["memory"], stats["memory_bytes"])
+        size.add_metric(["disk"], stats["disk_bytes"])
+        yield size
+
+def register():
+    """Adds the cache collector to the default registry served by /metrics."""
+    REGISTRY.register(TTSCacheCollector())
@@ -0,0 +1,135 @@
+import numpy as np
+from config import (
+    PREPROCESS_TARGET_RATE, VAD_THRESHOLD_DBFS, VAD_FRAME_MS, VAD_PADDING_MS, VAD_MIN_SPEECH_MS,
+    TRANSCRIBE_CHUNK_SECONDS, TRANSCRIBE_CHUNK_OVERLAP_MS
+)
+
+# Low-pass FIR length for decimation; odd so the filter is centred on each output sample
+FILTER_TAPS = 63
+
+def lowpass_kernel(factor, taps=FILTER_TAPS):
+    """Windowed-sinc low-pass with its cutoff just under the decimated Nyquist frequency."""
+    cutoff = 0.9 / factor
+    n = np.arange(taps) - (taps - 1) / 2
+    kernel = cutoff * np.sinc(cutoff * n) * np.hamming(taps)
+    return (kernel / kernel.sum()).astype(np.float32)
+
+class Downsampler:
+    """Downmixes interleaved LINEAR16 to mono and decimates it to PREPROCESS_TARGET_RATE.
+
+    Keeps filter history and partial frames between feed() calls, so it works on a stream of
+    arbitrary byte chunks as well as on a whole clip. Rates that are not a whole multiple of
+    the target are only downmixed.
+    """
+
+    def __init__(self, sample_rate, channels, target_rate=PREPROCESS_TARGET_RATE):
+        self.channels = channels
+        self.factor = sample_rate // target_rate if sample_rate % target_rate == 0 else 1
+        self.output_rate = sample_rate // self.factor
+        self.kernel = lowpass_kernel(self.factor) if self.factor > 1 else None
+        self._frame_bytes = 2 * channels
+        self._remainder = b""
+        # Zero history pads the start so the first output is centred on the first input sample
+        self._history = np.zeros(FILTER_TAPS // 2 if self.kernel is not None else 0, dtype=np.float32)
+
+    def _mono(self, data):
+        data = self._remainder + data
+        usable = len(data) - len(data) % self._frame_bytes
+        self._remainder = data[usable:]
+        samples = np.frombuffer(data[:usable], dtype="<i2").astype(np.float32)
+        return samples.reshape(-1, self.channels).mean(axis=1)
+
+    def _decimate(self, samples):
+        if self.kernel is None:
+            return samples
+        buffer = np.concatenate([self._history, samples])
+        count = (len(buffer) - FILTER_TAPS) // self.factor + 1
+        if count <= 0:
+            self._history = buffer
+            return np.zeros(0, dtype=np.float32)
+        windows = np.lib.stride_tricks.sliding_window_view(buffer, FILTER_TAPS)[::self.factor][:count]
+        self._history = buffer[count * self.factor:]
+        return windows @ self.kernel
+
+    def feed(self, data):
+        """Returns the mono samples (float32, int16 scale) produced by this chunk."""
+        return self._decimate(self._mono(data))
+
+    def flush(self):
+        """Returns the samples still held back by the filter at the end of a stream."""
+        if self.kernel is None:
+            return np.zeros(0, dtype=np.float32)
+        return self._decimate(np.zeros(FILTER_TAPS // 2, dtype=np.float32))
+
+def to_pcm(samples):
+    return np.clip(np.rint(samples), -32768, 32767).astype("<i2").tobytes()
+
+def frame_dbfs(samples, sample_rate):
+    """(frame length, per-frame level in dBFS) over VAD_FRAME_MS frames; a trailing partial frame is ignored."""
+    frame = max(1, sample_rate * VAD_FRAME_MS // 1000)
+    frames = len(samples) // frame
+    energy = np.square(samples[:frames * frame].reshape(frames, frame), dtype=np.float64).mean(axis=1)
+    return frame, 10 * np.log10(energy / 32768 ** 2 + 1e-12)
+
+def voiced_range(samples, sample_rate):
+    """(start, end) sample indices spanning the voiced frames plus padding, or None if the clip is silent."""
+    frame, dbfs = frame_dbfs(samples, sample_rate)
+    if len(dbfs) == 0:
+        return None
+    voiced = np.flatnonzero(dbfs > VAD_THRESHOLD_DBFS)
+    if len(voiced) * VAD_FRAME_MS < VAD_MIN_SPEECH_MS:
+        return None
+    padding = sample_rate * VAD_PADDING_MS // 1000
+    start = max(0, voiced[0] * frame - padding)
+    end = min(len(samples), (voiced[-1] + 1) * frame + padding)
+    return start, end
+
+def split_at_silence(samples, sample_rate, max_seconds=TRANSCRIBE_CHUNK_SECONDS, overlap_ms=TRANSCRIBE_CHUNK_OVERLAP_MS):
+    """Splits samples into chunks of about max_seconds, each cut at the quietest frame in the back half of its window.
+
+    Neighbouring chunks share overlap_ms of audio around each cut, so a word the cut lands in
+    still arrives whole in one of them.
+    """
+    max_length = int(sample_rate * max_seconds)
+    if len(samples) <= max_length:
+        return [samples]
+    frame, dbfs = frame_dbfs(samples, sample_rate)
+    overlap = sample_rate * overlap_ms // 1000
+    chunks = []
+    start = 0
+    while len(samples) - start > max_length:
+        low = (start + max_length // 2) // frame
+        high = max(low + 1, (start + max_length - 2 * overlap) // frame)
+        cut = (low + int(np.argmin(dbfs[low:high]))) * frame
+        chunks.append(samples[max(0, start - overlap):cut + overlap])
+        start = cut
+    chunks.append(samples[max(0, start - overlap):])
+    return chunks
+
+def _voiced_samples(audio_data, sample_rate, channels):
+    downsampler = Downsampler(sample_rate, channels)
+    samples = np.concatenate([downsampler.feed(audio_data), downsampler.flush()])
+    span = voiced_range(samples, downsampler.output_rate)
+    if span is None:
+        return None
+    start, end = span
+    return samples[start:end], downsampler.output_rate
+
+def preprocess(audio_data, sample_rate=48000, channels=2):
+    """Downmixes, resamples and trims silence from a LINEAR16 clip.
+
+    Returns (pcm bytes, sample rate) ready for recognition, or None if the clip holds no speech.
+    """
+    voiced = _voiced_samples(audio_data, sample_rate, channels)
+    if voiced is None:
+        return None
+    samples, rate = voiced
+    return to_pcm(samples), rate
+
+def preprocess_chunks(audio_data, sample_rate=48000, channels=2):
+    """Like preprocess(), but splits long clips at silence. Returns ([pcm bytes, ...], sample rate) or None."""
+    voiced = _voiced_samples(audio_data, sample_rate, channels)
+    if voiced is None:
+        return None
+    samples, rate = voiced
+    return [to_pcm(chunk) for chunk in split_at_silence(samples, rate)], rate
@@ -1,23 +1,126 @@
-import os
+import asyncio
+import string
+import threading
+from fastapi.concurrency import run_in_threadpool
 from google.cloud import speech
+from config import SPEECH_TIMEOUT, TRANSCRIBE_CHUNK_CONCURRENCY, VAD_MIN_SPEECH_MS
+from preprocess import preprocess_chunks, Downsampler, to_pcm
+import upstreams
+from audio_formats import AudioFormat
 
-def transcribe_audio(audio_data):
-    """Converts speech to text using Google Speech-to-Text API."""
-    client = speech.SpeechClient()
-    
-    audio = speech.RecognitionAudio(content=audio_data)
-    config = speech.RecognitionConfig(
-        encoding=speech.RecognitionConfig.AudioEncoding.LINEAR16,
-        sample_rate_hertz=48000,
+# One client per process; its gRPC channel is shared by every request
+client = None
+_client_lock = threading.Lock()
+
+def get_client():
+    global client
+    if client is None:
+        with _client_lock:
+            if client is None:
+                client = speech.SpeechClient()
+    return client
+
+ENCODINGS = {
+    "linear16": speech.RecognitionConfig.AudioEncoding.LINEAR16,
+    "ogg_opus": speech.RecognitionConfig.AudioEncoding.OGG_OPUS,
+}
+
+def recognition_config(sample_rate_hertz=48000, audio_channel_count=2, encoding="linear16"):
+    return speech.RecognitionConfig(
+        encoding=ENCODINGS[encoding],
+        sample_rate_hertz=sample_rate_hertz,
         language_code="en-US",
-        audio_channel_count=2,
+        audio_channel_count=audio_channel_count,
     )
 
+def prepare_audio(audio_data, audio_format):
+    """Returns (chunks, config) to recognize, or None if the clip holds no speech."""
+    if audio_format.encoding == "linear16":
+        # PCM in, 16 kHz mono voiced span out, split at silence when long; silent clips never reach the API
+        prepared = preprocess_chunks(audio_data, audio_format.sample_rate, audio_format.channels)
+        if prepared is None:
+            return None
+        chunks, sample_rate = prepared
+        return chunks, recognition_config(sample_rate, 1)
+    # Compressed audio goes through whole; the API decodes it. Opus is not decoded here, so a clip
+    # of only silence or DTX frames is judged silent from its packets instead
+    if audio_format.voiced_ms is not None and audio_format.voiced_ms < VAD_MIN_SPEECH_MS:
+        return None
+    return [audio_data], recognition_config(audio_format.sample_rate, audio_format.channels, audio_format.encoding)
+
+def recognize(content, config):
+    """Transcribes one chunk, joining every result rather than just the first."""
     try:
-        response = client.recognize(config=config, audio=audio)
-        if response.results:
-            return response.results[0].alternatives[0].transcript
+        response = get_client().recognize(
+            config=config, audio=speech.RecognitionAudio(content=content), timeout=SPEECH_TIMEOUT
+        )
+        return " ".join(
+            result.alternatives[0].transcript.strip() for result in response.results if result.alternatives
+        )
     except Exception as e:
         print(f"Error in transcribing audio: {e}")
-    
-    return None
+        return None
+
+def _word(word):
+    return word.strip(string.punctuation).lower()
+
+def stitch(transcripts, max_overlap_words=8):
+    """Joins chunk transcripts in order, dropping words repeated where neighbouring chunks overlap."""
+    words = []
+    for transcript in transcripts:
+        if not transcript:
+            continue
+        new_words = transcript.split()
+        longest = min(max_overlap_words, len(words), len(new_words))
+        overlap = next(
+            (n for n in range(longest, 0, -1)
+             if [_word(w) for w in words[-n:]] == [_word(w) for w in new_words[:n]]),
+            0
+        )
+        words.extend(new_words[overlap:])
+    return " ".join(words)
+
+async def transcribe_audio(audio_data, audio_format=None):
+    """Converts speech to text using Google Speech-to-Text API.
+
+    Chunks of a long clip are recognized concurrently, at most TRANSCRIBE_CHUNK_CONCURRENCY at a
+    time on the speech upstream pool, so latency follows the slowest chunk rather than their sum.
+    """
+    audio_format = audio_format or AudioFormat("linear16", 48000, 2)
+    prepared = await run_in_threadpool(prepare_audio, audio_data, audio_format)
+    if prepared is None:
+        print("Skipping transcription, clip has no speech")
+        return None
+    chunks, config = prepared
+
+    slots = asyncio.Semaphore(TRANSCRIBE_CHUNK_CONCURRENCY)
+
+    async def transcribe_chunk(chunk):
+        async with slots:
+            return await upstreams.speech.run(recognize, chunk, config)
+
+    transcripts = await asyncio.gather(*(transcribe_chunk(chunk) for chunk in chunks))
+    return stitch(transcripts) or None
+
+def stream_transcripts(audio_chunks, sample_rate_hertz=48000, audio_channel_count=2):
+    """Transcribes LINEAR16 chunks as they arrive, yielding (is_final, transcript) for interim and final results."""
+    downsampler = Downsampler(sample_rate_hertz, audio_channel_count)
+    streaming_config = speech.StreamingRecognitionConfig(
+        config=recognition_config(downsampler.output_rate, 1),
+        interim_results=True,
+    )
+
+    def requests():
+        for chunk in audio_chunks:
+            pcm = to_pcm(downsampler.feed(chunk))
+            if pcm:
+                yield speech.StreamingRecognizeRequest(audio_content=pcm)
+        pcm = to_pcm(downsampler.flush())
+        if pcm:
+            yield speech.StreamingRecognizeRequest(audio_content=pcm)
+
+    responses = get_client().streaming_recognize(config=streaming_config, requests=requests())
+    for response in responses:
+        for result in response.results:
+            if result.alternatives:
+                yield result.is_final, result.alternatives[0].transcript
@@ -0,0 +1,201 @@
+import hashlib
+import json
+import mmap
+import os
+import re
+import shutil
+import threading
+import unicodedata
+import uuid
+from collections import OrderedDict
+from config import TTS_CACHE_DIR, TTS_CACHE_MEMORY_MAX_BYTES, TTS_CACHE_DISK_MAX_BYTES
+
+CHUNK_SIZE = 16 * 1024
+TEMP_PREFIX = ".tmp-"
+
+def normalize_text(text, max_length=128):
+    """Text as it is sent for synthesis: NFC, collapsed whitespace, truncated like text_to_speech does."""
+    text = " ".join(unicodedata.normalize("NFC", text).split())
+    return text[:max_length]
+
+class TTSCache:
+    """Synthesized clips on disk, evicted by total size, with the most recent ones kept memory-mapped.
+
+    Entries live at <directory>/<voice>/<digest>, so a voice's clips can be dropped together.
+    Safe to use from the threadpool.
+    """
+
+    def __init__(self, directory, memory_max_bytes, disk_max_bytes):
+        self.directory = directory
+        self.memory_max_bytes = memory_max_bytes
+        self.disk_max_bytes = disk_max_bytes
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._memory = OrderedDict()  # path -> mmap
+        self._memory_bytes = 0
+        self._disk = OrderedDict()  # path -> size
+        self._disk_bytes = 0
+        self._generations = {}  # voice dir -> bumped on invalidation, so in-flight writes are discarded
+        self._lock = threading.Lock()
+        self._load()
+
+    def _load(self):
+        """Indexes clips left by a previous run, oldest first."""
+        os.makedirs(self.directory, exist_ok=True)
+        entries = []
+        for voice in os.listdir(self.directory):
+            voice_dir = os.path.join(self.directory, voice)
+            if not os.path.isdir(voice_dir):
+                continue
+            for name in os.listdir(voice_dir):
+                path = os.path.join(voice_dir, name)
+                if name.startswith(TEMP_PREFIX):
+                    os.remove(path)
+                    continue
+                stat = os.stat(path)
+                entries.append((stat.st_mtime, path, stat.st_size))
+        for _, path, size in sorted(entries):
+            self._disk[path] = size
+            self._disk_bytes += size
+        with self._lock:
+            self._evict_disk()
+
+    def voice_dir(self, voice_id):
+        return os.path.join(self.directory, re.sub(r"[^A-Za-z0-9_-]", "_", voice_id))
+
+    def path(self, voice_id, text, model_id, output_format):
+        digest = hashlib.sha256(json.dumps([text, model_id, output_format]).encode()).hexdigest()
+        return os.path.join(self.voice_dir(voice_id), digest)
+
+    def get(self, path):
+        """Returns the clip at path as a memory map, or None."""
+        with self._lock:
+            mapped = self._memory.get(path)
+            if mapped is not None:
+                self._memory.move_to_end(path)
+                self._disk.move_to_end(path)
+                self.memory_hits += 1
+                return mapped
+            if path not in self._disk:
+                self.misses += 1
+                return None
+            try:
+                with open(path, "rb") as f:
+                    mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+                os.utime(path)
+            except (OSError, ValueError) as e:
+                print(f"Error reading cached clip {path}: {e}")
+                self._drop(path)
+                self.misses += 1
+                return None
+            self.disk_hits += 1
+            self._disk.move_to_end(path)
+            self._memory[path] = mapped
+            self._memory_bytes += len(mapped)
+            self._evict_memory()
+            return mapped
+
+    def writer(self, path):
+        return ClipWriter(self, path)
+
+    def _commit(self, temp_path, path, generation):
+        with self._lock:
+            voice_dir = os.path.dirname(path)
+            try:
+                size = os.path.getsize(temp_path)
+                if generation != self._generations.get(voice_dir, 0) or size == 0:
+                    os.remove(temp_path)
+                    return
+                if path in self._disk:
+                    self._drop(path)
+                os.replace(temp_path, path)
+            except FileNotFoundError:
+                # The voice was invalidated and its directory removed mid-write
+                return
+            self._disk[path] = size
+            self._disk_bytes += size
+            self._evict_disk()
+
+    def generation(self, path):
+        with self._lock:
+            return self._generations.get(os.path.dirname(path), 0)
+
+    def invalidate_voice(self, voice_id):
+        """Drops every clip for voice_id, including ones still being written."""
+        voice_dir = self.voice_dir(voice_id)
+        with self._lock:
+            self._generations[voice_dir] = self._generations.get(voice_dir, 0) + 1
+            for path in [path for path in self._disk if os.path.dirname(path) == voice_dir]:
+                self._drop(path)
+            shutil.rmtree(voice_dir, ignore_errors=True)
+
+    def _drop(self, path):
+        """Removes path from both tiers. Open readers keep their map until they finish."""
+        mapped = self._memory.pop(path, None)
+        if mapped is not None:
+            self._memory_bytes -= len(mapped)
+        size = self._disk.pop(path, None)
+        if size is not None:
+            self._disk_bytes -= size
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+
+    def _evict_memory(self):
+        while self._memory_bytes > self.memory_max_bytes and self._memory:
+            _, mapped = self._memory.popitem(last=False)
+            self._memory_bytes -= len(mapped)
+
+    def _evict_disk(self):
+        while self._disk_bytes > self.disk_max_bytes and self._disk:
+            self._drop(next(iter(self._disk)))
+            self.evictions += 1
+
+    def stats(self):
+        with self._lock:
+            lookups = self.memory_hits + self.disk_hits + self.misses
+            return {
+                "memory_hits": self.memory_hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+                "hit_rate": (self.memory_hits + self.disk_hits) / lookups if lookups else 0.0,
+                "evictions": self.evictions,
+                "memory_bytes": self._memory_bytes,
+                "disk_bytes": self._disk_bytes,
+                "entries": len(self._disk),
+            }
+
+class ClipWriter:
+    """Collects a clip into a temp file next to its final path; commit() publishes it."""
+
+    def __init__(self, cache, path):
+        self.cache = cache
+        self.path = path
+        self.generation = cache.generation(path)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        self.temp_path = os.path.join(os.path.dirname(path), f"{TEMP_PREFIX}{uuid.uuid4().hex}")
+        self.file = open(self.temp_path, "wb")
+
+    def write(self, chunk):
+        self.file.write(chunk)
+
+    def commit(self):
+        self.file.close()
+        self.cache._commit(self.temp_path, self.path, self.generation)
+
+    def abort(self):
+        self.file.close()
+        try:
+            os.remove(self.temp_path)
+        except FileNotFoundError:
+            pass
+
+def iter_clip(mapped):
+    """Yields a cached clip in chunks straight from its memory map."""
+    for start in range(0, len(mapped), CHUNK_SIZE):
+        yield mapped[start:start + CHUNK_SIZE]
+
+tts_cache = TTSCache(TTS_CACHE_DIR, TTS_CACHE_MEMORY_MAX_BYTES, TTS_CACHE_DISK_MAX_BYTES)
@@ -0,0 +1,39 @@
+from fastapi import HTTPException
+from fastapi.responses import JSONResponse
+
+class UploadSizeLimit:
+    """ASGI middleware capping request bodies on some paths.
+
+    A declared Content-Length over the limit is refused before any of the body is read; otherwise
+    bytes are counted as they stream in and the request fails with a 413 as soon as it crosses
+    the limit, so an oversized upload is never spooled in full.
+    """
+
+    def __init__(self, app, paths, max_bytes):
+        self.app = app
+        self.paths = set(paths)
+        self.max_bytes = max_bytes
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["path"] not in self.paths:
+            await self.app(scope, receive, send)
+            return
+
+        detail = f"Upload is larger than {self.max_bytes} bytes"
+        content_length = dict(scope["headers"]).get(b"content-length")
+        if content_length is not None and content_length.isdigit() and int(content_length) > self.max_bytes:
+            await JSONResponse({"detail": detail}, status_code=413)(scope, receive, send)
+            return
+
+        received = 0
+
+        async def limited_receive():
+            nonlocal received
+            message = await receive()
+            if message["type"] == "http.request":
+                received += len(message.get("body", b""))
+                if received > self.max_bytes:
+                    raise HTTPException(status_code=413, detail=detail)
+            return message
+
+        await self.app(scope, limited_receive, send)
@@ -0,0 +1,135 @@
+import asyncio
+import functools
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import asynccontextmanager
+from fastapi import HTTPException
+from config import (
+    ELEVENLABS_MAX_CONCURRENCY, ELEVENLABS_TIMEOUT, SPEECH_MAX_CONCURRENCY, SPEECH_TIMEOUT, UPSTREAM_QUEUE_TIMEOUT,
+    CLONE_MAX_CONCURRENCY
+)
+
+_DONE = object()
+
+class Lease:
+    """One slot taken from Slots; a call still running when its caller gives up keeps the slot with keep_until()."""
+
+    def __init__(self):
+        self.future = None
+
+    def keep_until(self, future):
+        self.future = future
+
+class Slots:
+    """Lets at most limit callers in at once; waiting longer than queue_timeout for a slot is a 503."""
+
+    def __init__(self, name, limit, queue_timeout):
+        self.name = name
+        self.limit = limit
+        self.queue_timeout = queue_timeout
+        self.active = 0
+        self.rejected = 0
+        self._semaphore = None
+
+    @asynccontextmanager
+    async def hold(self):
+        # Created on first use so it binds to the server's event loop
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.limit)
+        try:
+            await asyncio.wait_for(self._semaphore.acquire(), self.queue_timeout)
+        except asyncio.TimeoutError:
+            self.rejected += 1
+            raise HTTPException(status_code=503, detail=f"{self.name} is busy, try again shortly")
+        self.active += 1
+        lease = Lease()
+        try:
+            yield lease
+        finally:
+            if lease.future is None:
+                self._release()
+            else:
+                lease.future.add_done_callback(self._release_after)
+
+    def _release(self):
+        self.active -= 1
+        self._semaphore.release()
+
+    def _release_after(self, future):
+        # Retrieve a late failure so it is not logged as never retrieved; nobody is waiting on it
+        if not future.cancelled():
+            future.exception()
+        self._release()
+
+    def stats(self):
+        return {"active": self.active, "max_concurrency": self.limit, "rejected": self.rejected}
+
+class Upstream:
+    """Runs one blocking SDK's calls on its own bounded thread pool.
+
+    At most max_concurrency calls (or open streams) run at once; callers wait up to
+    queue_timeout for a slot (503) and each call gets timeout seconds (504). A call that
+    times out keeps its slot until its thread returns, so the slots never outnumber the
+    threads. A slow upstream therefore only queues its own requests, not the event loop
+    or other upstreams.
+    """
+
+    def __init__(self, name, max_concurrency, timeout, queue_timeout):
+        self.name = name
+        self.max_concurrency = max_concurrency
+        self.timeout = timeout
+        self.executor = ThreadPoolExecutor(max_concurrency, thread_name_prefix=name)
+        self.slots = Slots(name, max_concurrency, queue_timeout)
+        self.timed_out = 0
+
+    def slot(self):
+        return self.slots.hold()
+
+    async def _call(self, lease, fn, *args, **kwargs):
+        loop = asyncio.get_running_loop()
+        # Shielded so giving up on the call does not mark it done while its thread is still busy
+        future = loop.run_in_executor(self.executor, functools.partial(fn, *args, **kwargs))
+        try:
+            return await asyncio.wait_for(asyncio.shield(future), self.timeout)
+        except asyncio.TimeoutError:
+            self.timed_out += 1
+            lease.keep_until(future)
+            raise HTTPException(status_code=504, detail=f"{self.name} timed out")
+        except asyncio.CancelledError:
+            lease.keep_until(future)
+            raise
+
+    async def run(self, fn, *args, **kwargs):
+        """Calls fn(*args, **kwargs) on this upstream's pool."""
+        async with self.slot() as lease:
+            return await self._call(lease, fn, *args, **kwargs)
+
+    async def iterate(self, iterator):
+        """Drains a blocking iterator on this upstream's pool, holding one slot for the whole stream."""
+        async with self.slot() as lease:
+            while True:
+                item = await self._call(lease, next, iterator, _DONE)
+                if item is _DONE:
+                    return
+                yield item
+
+    def stats(self):
+        return {**self.slots.stats(), "timed_out": self.timed_out}
+
+    def shutdown(self):
+        self.executor.shutdown(wait=False)
+
+elevenlabs = Upstream("elevenlabs", ELEVENLABS_MAX_CONCURRENCY, ELEVENLABS_TIMEOUT, UPSTREAM_QUEUE_TIMEOUT)
+speech = Upstream("speech", SPEECH_MAX_CONCURRENCY, SPEECH_TIMEOUT, UPSTREAM_QUEUE_TIMEOUT)
+
+# Voice clones hold an upload open for the whole call, so they get a tighter cap of their own
+clone_jobs = Slots("voice cloning", CLONE_MAX_CONCURRENCY, UPSTREAM_QUEUE_TIMEOUT)
+
+def stats():
+    return {
+        **{upstream.name: upstream.stats() for upstream in (elevenlabs, speech)},
+        "clone_jobs": clone_jobs.stats(),
+    }
+
+def shutdown():
+    elevenlabs.shutdown()
+    speech.shutdown()
@@ -0,0 +1,55 @@
+import json
+import struct
+import time
+from urllib.parse import quote
+
+# Stages before the first audio byte, reported in Server-Timing: (name, mark that ends it, description)
+CRITICAL_PATH = [
+    ("transcribe", "transcribed", "Speech to text"),
+    ("generate", "first_sentence", "Until the first reply sentence"),
+    ("tts", "first_audio", "Until the first audio chunk"),
+]
+
+# A voice turn body is a run of frames: audio frames as the reply is spoken, then one reply frame
+# holding the full reply text as JSON, so the caller gets it from the same response
+AUDIO_FRAME = b"a"
+REPLY_FRAME = b"r"
+
+class TurnTimer:
+    """Milliseconds from the start of a voice turn to each point it reaches."""
+
+    def __init__(self):
+        self.start = time.perf_counter()
+        self.marks = {}
+
+    def mark(self, name):
+        self.marks[name] = round((time.perf_counter() - self.start) * 1000, 1)
+
+    def server_timing(self):
+        """Server-Timing header value for the stages reached so far on the way to the first audio."""
+        parts = []
+        previous = 0.0
+        for name, mark, description in CRITICAL_PATH:
+            if mark not in self.marks:
+                break
+            parts.append(f'{name};dur={self.marks[mark] - previous:.1f};desc="{description}"')
+            previous = self.marks[mark]
+        parts.append(f"total;dur={previous:.1f}")
+        return ", ".join(parts)
+
+def frame(kind, payload):
+    """One frame of a voice turn body: the kind byte, the payload length as a big-endian uint32, then the payload."""
+    return kind + struct.pack(">I", len(payload)) + payload
+
+def audio_frame(chunk):
+    return frame(AUDIO_FRAME, chunk)
+
+def reply_frame(reply, timer):
+    return frame(REPLY_FRAME, json.dumps({"reply": reply, "timings_ms": timer.marks}).encode())
+
+def turn_headers(transcript, timer):
+    return {
+        # Headers are latin-1, transcripts may not be
+        "X-Transcript": quote(transcript or ""),
+        "Server-Timing": timer.server_timing(),
+    }
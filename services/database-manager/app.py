@@ -1,11 +1,32 @@
-from fastapi import FastAPI, HTTPException
+import json
+from fastapi import FastAPI, HTTPException, Response
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import StreamingResponse
+from prometheus_client import generate_latest, CONTENT_TYPE_LATEST
+from typing import Optional
 from pydantic import BaseModel
 import psycopg2
-from psycopg2.extras import RealDictCursor
-from config import DB_CONFIG
+import psycopg2.errors
+from db import open_pool, close_pool, get_cursor, execute, stream_rows, delete_in_batches
+from migrate import run_migrations
+import queries
+import cache
+from cache import bot_cache, channel_cache, MISSING
+from config import HISTORY_MAX_MESSAGES, HISTORY_MAX_CONTENT_LENGTH
 
 app = FastAPI()
 
+@app.on_event("startup")
+def startup():
+    run_migrations()
+    open_pool()
+    cache.start_listener()
+
+@app.on_event("shutdown")
+def shutdown():
+    cache.stop_listener()
+    close_pool()
+
 class BotConfig(BaseModel):
     owner_id: str
     server_id: str
@@ -40,453 +61,352 @@ class BotWebhook(BaseModel):
 class User(BaseModel):
     user_id: str
 
-@app.post("/bot-config")
-async def create_bot(bot: BotConfig):
-    conn = psycopg2.connect(**DB_CONFIG)
-    cur = conn.cursor(cursor_factory=RealDictCursor)
-    try:
-        # Check if already exists
-        cur.execute("SELECT * FROM bots WHERE server_id = %s AND name = %s", (bot.server_id, bot.name))
-        existing_bot = cur.fetchone()
-        if existing_bot is not None:
-            raise HTTPException(status_code=400, detail="Bot already exists")
-
-        # Create user if not exists and get user_id
-        cur.execute("SELECT * FROM users WHERE user_id = %s", (bot.owner_id,))
-        user = cur.fetchone()
-        if user is None:
-            cur.execute("INSERT INTO users (user_id) VALUES (%s)", (bot.owner_id,))
-            conn.commit()
-            cur.execute("SELECT * FROM users WHERE user_id = %s", (bot.owner_id,))
-            user = cur.fetchone()
+class HistoryMessage(BaseModel):
+    role: str
+    name: str
+    content: str
 
-        user_id = user["id"]
+def ndjson_response(rows, on_row=None):
+    """Streams rows as newline-delimited JSON, one object per line."""
+    def lines():
+        for row in rows:
+            if on_row is not None:
+                on_row(row)
+            yield json.dumps(jsonable_encoder(row)) + "\n"
+    return StreamingResponse(lines(), media_type="application/x-ndjson")
 
-        # Create voice if not exists and get eleven_voice_id
-        # cur.execute("SELECT * FROM voices WHERE eleven_voice_id = %s", (bot.eleven_voice_id,))
-        # voice = cur.fetchone()
-        # if voice is None:
-        #     cur.execute("INSERT INTO voices (custom_voice, eleven_voice_id) VALUES (%s)", (False, bot.eleven_voice_id))
-        #     conn.commit()
-        #     cur.execute("SELECT * FROM voices WHERE eleven_voice_id = %s", (bot.eleven_voice_id,))
-        #     voice = cur.fetchone()
+@app.post("/bot-config")
+def create_bot(bot: BotConfig):
+    with get_cursor() as (conn, cur):
+        try:
+            # Create the owner if needed and the bot in one statement. The owner upsert only
+            # runs for a new bot whose user row is missing; its no-op DO UPDATE covers a
+            # concurrent insert of the same user.
+            execute(cur, queries.CREATE_BOT, (bot.owner_id, bot.server_id, bot.name, bot.character_description, bot.example_speech, False, bot.eleven_voice_id, bot.profile_picture_url))
+            new_bot = cur.fetchone()
+            conn.commit()
+        except psycopg2.Error as e:
+            conn.rollback()
+            raise HTTPException(status_code=400, detail=str(e))
+        except Exception as e:
+            conn.rollback()
+            print(f"Error creating bot: {e}")
+            raise HTTPException(status_code=500, detail=str(e))
 
-        # voice_id = voice["id"]
+    if new_bot is None:
+        raise HTTPException(status_code=400, detail="Bot already exists")
 
-        # Create new bot
-        cur.execute("""
-            INSERT INTO bots (owner_id, server_id, name, character_description, example_speech, custom_voice, eleven_voice_id, profile_picture_url)
-            VALUES (%s, %s, %s, %s, %s, %s, %s, %s)
-            RETURNING *
-        """, (user_id, bot.server_id, bot.name, bot.character_description, bot.example_speech, False, bot.eleven_voice_id, bot.profile_picture_url))
-        new_bot = cur.fetchone()
-        conn.commit()
-        return new_bot
-    except psycopg2.Error as e:
-        conn.rollback()
-        raise HTTPException(status_code=400, detail=str(e))
-    except Exception as e:
-        conn.rollback()
-        print(f"Error creating bot: {e}")
-        raise HTTPException(status_code=500, detail=str(e))
-    finally:
-        cur.close()
-        conn.close()
+    cache.invalidate_bot(bot.server_id, bot.name)
+    return new_bot
 
 @app.get("/bot-config/{server_id}/{name}")
-async def get_bot(server_id: str, name: str):
+def get_bot(server_id: str, name: str):
+    bot = bot_cache.get((server_id, name))
+    if bot is not MISSING:
+        return bot
+    version = bot_cache.version()
+
     # Get bot config join with voice
-    conn = psycopg2.connect(**DB_CONFIG)
-    cur = conn.cursor(cursor_factory=RealDictCursor)
-    try:
-        cur.execute("""
-            SELECT b.*, u.user_id
-            FROM bots b
-            JOIN users u ON b.owner_id = u.id
-            WHERE b.server_id = %s AND b.name = %s
-        """, (server_id, name))
+    with get_cursor() as (conn, cur):
+        execute(cur, queries.GET_BOT, (server_id, name))
         bot = cur.fetchone()
         if bot is None:
             raise HTTPException(status_code=404, detail="Bot config not found")
+        bot_cache.set((server_id, name), bot, version)
         return bot
-    finally:
-        cur.close()
-        conn.close()
 
 @app.get("/bot-config/list/{owner_id}/{server_id}")
-async def get_bots(owner_id: str, server_id: str):
-    conn = psycopg2.connect(**DB_CONFIG)
-    cur = conn.cursor(cursor_factory=RealDictCursor)
-    try:
-        cur.execute("""
-            SELECT b.*
-            FROM bots b
-            WHERE b.owner_id = (SELECT id FROM users WHERE user_id = %s) AND b.server_id = %s
-        """, (owner_id, server_id))
+def get_bots(owner_id: str, server_id: str, after_id: int = 0, limit: Optional[int] = None, stream: bool = False):
+    # Keyset pagination: pass the last id of a page as after_id to get the next one
+    params = (owner_id, server_id, after_id, limit)
+    if stream:
+        return ndjson_response(stream_rows(queries.GET_BOTS, params))
+
+    with get_cursor() as (conn, cur):
+        execute(cur, queries.GET_BOTS, params)
         bots = cur.fetchall()
         return bots
-    finally:
-        cur.close()
-        conn.close()
 
 @app.get("/bot-config/channel/{server_id}/{channel_id}")
-async def get_bots_by_channel(server_id: str, channel_id: str):
+def get_bots_by_channel(server_id: str, channel_id: str):
     # Get bots that use webhook with server id and channel id and join
     # Must use bots_webhooks table to join
-    conn = psycopg2.connect(**DB_CONFIG)
-    cur = conn.cursor(cursor_factory=RealDictCursor)
-    try:
-        cur.execute("""
-            SELECT b.*, u.user_id, wc.webhook_id, wc.webhook_url
-            FROM bots b
-            JOIN bots_webhooks bw ON b.id = bw.bot_id
-            JOIN webhooks wc ON bw.webhook_id = wc.id
-            JOIN users u ON b.owner_id = u.id
-            WHERE wc.server_id = %s AND wc.channel_id = %s
-        """, (server_id, channel_id))
-        bots = cur.fetchall()
+    bots = channel_cache.get((server_id, channel_id))
+    if bots is not MISSING:
         return bots
-    except psycopg2.Error as e:
-        conn.rollback()
-        raise HTTPException(status_code=400, detail=str(e))
-    finally:
-        cur.close()
-        conn.close()
+    version = channel_cache.version()
+
+    with get_cursor() as (conn, cur):
+        try:
+            execute(cur, queries.GET_BOTS_BY_CHANNEL, (server_id, channel_id))
+            bots = cur.fetchall()
+            channel_cache.set((server_id, channel_id), bots, version)
+            return bots
+        except psycopg2.Error as e:
+            conn.rollback()
+            raise HTTPException(status_code=400, detail=str(e))
 
 @app.put("/bot-config/{server_id}/{name}")
-async def update_bot(server_id: str, name: str, bot: BotUpdate):
-    conn = psycopg2.connect(**DB_CONFIG)
-    cur = conn.cursor(cursor_factory=RealDictCursor)
-    try:
-        # Check if bot with name already exists
-        cur.execute("SELECT * FROM bots WHERE server_id = %s AND name = %s", (server_id, bot.name))
-        existing_bot = cur.fetchone()
-        if existing_bot is not None and existing_bot["name"] != name:
+def update_bot(server_id: str, name: str, bot: BotUpdate):
+    with get_cursor() as (conn, cur):
+        try:
+            # Renaming onto another bot's name is rejected by UNIQUE (server_id, name)
+            execute(cur, queries.UPDATE_BOT, (bot.name, bot.character_description, bot.example_speech, bot.profile_picture_url, server_id, name))
+            updated_bot = cur.fetchone()
+            if updated_bot is None:
+                raise HTTPException(status_code=404, detail="Bot config not found")
+            conn.commit()
+            cache.invalidate_bot(server_id, name)
+            cache.invalidate_bot(server_id, bot.name)
+            return updated_bot
+        except psycopg2.errors.UniqueViolation:
+            conn.rollback()
             raise HTTPException(status_code=400, detail="Bot already exists")
+        except psycopg2.Error as e:
+            conn.rollback()
+            raise HTTPException(status_code=400, detail=str(e))
 
-        cur.execute("""
-            UPDATE bots
-            SET name = %s, character_description = %s, example_speech = %s, profile_picture_url = %s
-            WHERE server_id = %s AND name = %s
-            RETURNING *
-        """, (bot.name, bot.character_description, bot.example_speech, bot.profile_picture_url, server_id, name))
-        updated_bot = cur.fetchone()
-        if updated_bot is None:
-            raise HTTPException(status_code=404, detail="Bot config not found")
-        conn.commit()
-        return updated_bot
-    except psycopg2.Error as e:
-        conn.rollback()
-        raise HTTPException(status_code=400, detail=str(e))
-    finally:
-        cur.close()
-        conn.close()
-
-@app.delete("/bot-config/{server_id}/{name}")
-async def delete_bot(server_id: str, name: str):
-    conn = psycopg2.connect(**DB_CONFIG)
-    cur = conn.cursor(cursor_factory=RealDictCursor)
-    try:
-        cur.execute("DELETE FROM bots WHERE server_id = %s AND name = %s", (server_id, name))
-        conn.commit()
-        return {"message": "Bot config deleted successfully"}
-    except psycopg2.Error as e:
-        conn.rollback()
-        raise HTTPException(status_code=400, detail=str(e))
-    finally:
-        cur.close()
-        conn.close()
+# The bulk deletes below remove at most `limit` rows per call; call again until a short page comes back.
+# With stream=true every matching row is deleted in committed batches and streamed back as NDJSON.
 
 @app.delete("/bot-config/owner/{owner_id}/server/{server_id}")
-async def delete_owner_bots(owner_id: str, server_id: str):
-    conn = psycopg2.connect(**DB_CONFIG)
-    cur = conn.cursor(cursor_factory=RealDictCursor)
-    try:
-        # Get list of bot configs to return
-        cur.execute("SELECT * FROM bots WHERE owner_id = %s AND server_id = %s", (owner_id, server_id))
-        bot_configs = cur.fetchall()
-        cur.execute("DELETE FROM bots WHERE owner_id = %s AND server_id = %s", (owner_id, server_id))
-        conn.commit()
-        return bot_configs
-    except psycopg2.Error as e:
-        conn.rollback()
-        raise HTTPException(status_code=400, detail=str(e))
-    finally:
-        cur.close()
-        conn.close()
+def delete_owner_bots(owner_id: str, server_id: str, limit: Optional[int] = None, stream: bool = False):
+    if stream:
+        return ndjson_response(
+            delete_in_batches(queries.DELETE_OWNER_SERVER_BOTS, (owner_id, server_id)),
+            lambda bot_config: cache.invalidate_bot(server_id, bot_config["name"])
+        )
+
+    with get_cursor() as (conn, cur):
+        try:
+            # Deleted bot configs are returned
+            execute(cur, queries.DELETE_OWNER_SERVER_BOTS, (owner_id, server_id, limit))
+            bot_configs = cur.fetchall()
+            conn.commit()
+            for bot_config in bot_configs:
+                cache.invalidate_bot(server_id, bot_config["name"])
+            return bot_configs
+        except psycopg2.Error as e:
+            conn.rollback()
+            raise HTTPException(status_code=400, detail=str(e))
 
 @app.delete("/bot-config/owner/{owner_id}")
-async def delete_owner_bots(owner_id: str):
-    conn = psycopg2.connect(**DB_CONFIG)
-    cur = conn.cursor(cursor_factory=RealDictCursor)
+def delete_owner_bots(owner_id: str):
     try:
-        cur.execute("DELETE FROM bots WHERE owner_id = %s", (owner_id,))
-        conn.commit()
+        for deleted_bot in delete_in_batches(queries.DELETE_OWNER_BOTS, (owner_id,)):
+            cache.invalidate_bot(deleted_bot["server_id"], deleted_bot["name"])
         return {"message": "Owner bots deleted successfully"}
     except psycopg2.Error as e:
-        conn.rollback()
         raise HTTPException(status_code=400, detail=str(e))
-    finally:
-        cur.close()
-        conn.close()
 
 @app.delete("/bot-config/server/{server_id}")
-async def delete_server_bots(server_id: str):
-    conn = psycopg2.connect(**DB_CONFIG)
-    cur = conn.cursor(cursor_factory=RealDictCursor)
-    try:
-        # Get list of bot configs to return
-        cur.execute("SELECT * FROM bots WHERE server_id = %s", (server_id,))
-        bot_configs = cur.fetchall()
-        cur.execute("DELETE FROM bots WHERE server_id = %s", (server_id,))
-        conn.commit()
-        return bot_configs
-    except psycopg2.Error as e:
-        conn.rollback()
-        raise HTTPException(status_code=400, detail=str(e))
-    finally:
-        cur.close()
-        conn.close()
+def delete_server_bots(server_id: str, limit: Optional[int] = None, stream: bool = False):
+    if stream:
+        return ndjson_response(
+            delete_in_batches(queries.DELETE_SERVER_BOTS, (server_id,)),
+            lambda bot_config: cache.invalidate_bot(server_id, bot_config["name"])
+        )
+
+    with get_cursor() as (conn, cur):
+        try:
+            # Deleted bot configs are returned
+            execute(cur, queries.DELETE_SERVER_BOTS, (server_id, limit))
+            bot_configs = cur.fetchall()
+            conn.commit()
+            cache.invalidate_server(server_id)
+            return bot_configs
+        except psycopg2.Error as e:
+            conn.rollback()
+            raise HTTPException(status_code=400, detail=str(e))
+
+# Registered after the /owner and /server deletes so those paths aren't captured as {server_id}/{name}
+@app.delete("/bot-config/{server_id}/{name}")
+def delete_bot(server_id: str, name: str):
+    with get_cursor() as (conn, cur):
+        try:
+            execute(cur, queries.DELETE_BOT, (server_id, name))
+            conn.commit()
+            cache.invalidate_bot(server_id, name)
+            return {"message": "Bot config deleted successfully"}
+        except psycopg2.Error as e:
+            conn.rollback()
+            raise HTTPException(status_code=400, detail=str(e))
 
 @app.post("/webhook-config")
-async def create_webhook_config(webhook_config: WebhookConfig):
-    conn = psycopg2.connect(**DB_CONFIG)
-    cur = conn.cursor(cursor_factory=RealDictCursor)
-    try:
-        cur.execute("""
-            INSERT INTO webhooks (server_id, channel_id, webhook_id, webhook_url)
-            VALUES (%s, %s, %s, %s)
-            RETURNING *
-        """, (webhook_config.server_id, webhook_config.channel_id, webhook_config.webhook_id, webhook_config.webhook_url))
+def create_webhook_config(webhook_config: WebhookConfig):
+    with get_cursor() as (conn, cur):
+        execute(cur, queries.CREATE_WEBHOOK, (webhook_config.server_id, webhook_config.channel_id, webhook_config.webhook_id, webhook_config.webhook_url))
         new_webhook_config = cur.fetchone()
         conn.commit()
         return new_webhook_config
-    finally:
-        cur.close()
-        conn.close()
 
 @app.put("/webhook-config/update")
-async def update_webhook_config(webhook_config: WebhookConfig):
-    conn = psycopg2.connect(**DB_CONFIG)
-    cur = conn.cursor(cursor_factory=RealDictCursor)
-    try:
-        cur.execute("""
-            UPDATE webhooks
-            SET webhook_id = %s, webhook_url = %s
-            WHERE server_id = %s AND channel_id = %s
-            RETURNING *
-        """, (webhook_config.webhook_id, webhook_config.webhook_url, webhook_config.server_id, webhook_config.channel_id))
+def update_webhook_config(webhook_config: WebhookConfig):
+    with get_cursor() as (conn, cur):
+        execute(cur, queries.UPDATE_WEBHOOK, (webhook_config.webhook_id, webhook_config.webhook_url, webhook_config.server_id, webhook_config.channel_id))
         updated_webhook_config = cur.fetchone()
         if updated_webhook_config is None:
             raise HTTPException(status_code=404, detail="Webhook config not found")
         conn.commit()
+        cache.invalidate_channel(webhook_config.server_id, webhook_config.channel_id)
         return updated_webhook_config
-    finally:
-        cur.close()
-        conn.close()
 
+@app.get("/webhook-config/server/{server_id}")
+def get_server_webhook_configs(server_id: str, after_id: int = 0, limit: Optional[int] = None, stream: bool = False):
+    # Keyset pagination: pass the last id of a page as after_id to get the next one
+    params = (server_id, after_id, limit)
+    if stream:
+        return ndjson_response(stream_rows(queries.GET_SERVER_WEBHOOKS, params))
+
+    with get_cursor() as (conn, cur):
+        execute(cur, queries.GET_SERVER_WEBHOOKS, params)
+        webhook_configs = cur.fetchall()
+        return webhook_configs
+
+# Registered after /server/{server_id} so that path isn't captured as {server_id}/{channel_id}
 @app.get("/webhook-config/{server_id}/{channel_id}")
-async def get_webhook_config(server_id: str, channel_id: str):
-    conn = psycopg2.connect(**DB_CONFIG)
-    cur = conn.cursor(cursor_factory=RealDictCursor)
-    try:
-        cur.execute("SELECT * FROM webhooks WHERE server_id = %s AND channel_id = %s", (server_id, channel_id))
+def get_webhook_config(server_id: str, channel_id: str):
+    with get_cursor() as (conn, cur):
+        execute(cur, queries.GET_WEBHOOK, (server_id, channel_id))
         webhook_config = cur.fetchone()
         if webhook_config is None:
             raise HTTPException(status_code=404, detail="Webhook config not found")
         return webhook_config
-    finally:
-        cur.close()
-        conn.close()
-
-@app.get("/webhook-config/server/{server_id}")
-async def get_server_webhook_configs(server_id: str):
-    conn = psycopg2.connect(**DB_CONFIG)
-    cur = conn.cursor(cursor_factory=RealDictCursor)
-    try:
-        cur.execute("SELECT * FROM webhooks WHERE server_id = %s", (server_id,))
-        webhook_configs = cur.fetchall()
-        return webhook_configs
-    finally:
-        cur.close()
-        conn.close()
 
 @app.delete("/webhook-config/prune/{server_id}/{channel_id}")
-async def prune_webhook(server_id: str, channel_id: str):
-    conn = psycopg2.connect(**DB_CONFIG)
-    cur = conn.cursor(cursor_factory=RealDictCursor)
-    try:
-        # Get webhook
-        cur.execute("SELECT * FROM webhooks WHERE server_id = %s AND channel_id = %s", (server_id, channel_id))
+def prune_webhook(server_id: str, channel_id: str):
+    with get_cursor() as (conn, cur):
+        # Delete the webhook only if no bot links to it
+        execute(cur, queries.PRUNE_WEBHOOK, (server_id, channel_id))
         webhook = cur.fetchone()
+        conn.commit()
 
         if webhook is None:
             return {"deleted": False, "webhook_id": None}
 
-        # Get all links to webhook
-        cur.execute("SELECT * FROM bots_webhooks WHERE webhook_id = %s", (webhook['id'],))
-        webhook_links = cur.fetchall()
-        
-        if webhook_links is not None and len(webhook_links) > 0:
-            # Webhook is still referenced, don't delete
-            return {"deleted": False, "webhook_id": None}
-        
-        # Delete the webhook
-        cur.execute("DELETE FROM webhooks WHERE id = %s", (webhook['id'],))
-        conn.commit()
-        
+        cache.invalidate_channel(server_id, channel_id)
+
         # Return webhook id from the webhooks table
         return {"deleted": True, "webhook_id": webhook['webhook_id']}
-        
-    finally:
-        cur.close()
-        conn.close()
 
 @app.delete("/webhook-config/prune-server/{server_id}")
-async def prune_server_webhook_configs(server_id: str):
-    # Delete if not referenced in bots_webhooks table
+def prune_server_webhook_configs(server_id: str):
+    # Delete the server's webhooks that are not referenced in bots_webhooks table
     # Return list of webhook ids
-    conn = psycopg2.connect(**DB_CONFIG)
-    cur = conn.cursor(cursor_factory=RealDictCursor)
-    try:
-        # Get webhooks for server
-        cur.execute("SELECT * FROM webhooks WHERE server_id = %s", (server_id,))
+    with get_cursor() as (conn, cur):
+        execute(cur, queries.PRUNE_SERVER_WEBHOOKS, (server_id,))
         webhooks = cur.fetchall()
-        
-        if webhooks is None:
-            return {"deleted": False, "webhook_ids": []}
-        
-        webhook_ids = [webhook['id'] for webhook in webhooks]
-        
-        # Get all links to webhooks
-        cur.execute("SELECT * FROM bots_webhooks WHERE webhook_id = ANY(%s)", (webhook_ids,))
-        webhook_links = cur.fetchall()
-        
-        if webhook_links is not None and len(webhook_links) > 0:
-            # Webhook is still referenced, don't delete
-            return {"deleted": False, "webhook_ids": []}
-        
-        # Delete webhooks not referenced in bots_webhooks table
-        cur.execute("DELETE FROM webhooks WHERE id = ANY(%s)", (webhook_ids,))
         conn.commit()
-        
+
+        for webhook in webhooks:
+            cache.invalidate_channel(server_id, webhook['channel_id'])
+
         # Return webhook_ids from the webhooks table
-        return {"deleted": True, "webhook_ids": [webhook['webhook_id'] for webhook in webhooks]}
-        
-    finally:
-        cur.close()
-        conn.close()
+        return {"deleted": len(webhooks) > 0, "webhook_ids": [webhook['webhook_id'] for webhook in webhooks]}
 
 @app.delete("/webhook-config/{server_id}/{channel_id}")
-async def delete_webhook_config(server_id: str, channel_id: str):
-    conn = psycopg2.connect(**DB_CONFIG)
-    cur = conn.cursor(cursor_factory=RealDictCursor)
-    try:
-        cur.execute("DELETE FROM webhooks WHERE server_id = %s AND channel_id = %s", (server_id, channel_id))
+def delete_webhook_config(server_id: str, channel_id: str):
+    with get_cursor() as (conn, cur):
+        execute(cur, queries.DELETE_WEBHOOK, (server_id, channel_id))
         conn.commit()
+        cache.invalidate_channel(server_id, channel_id)
         return {"message": "Webhook config deleted successfully"}
-    finally:
-        cur.close()
-        conn.close()
 
 @app.delete("/webhook-config/{server_id}")
-async def delete_server_webhook_configs(server_id: str):
-    conn = psycopg2.connect(**DB_CONFIG)
-    cur = conn.cursor(cursor_factory=RealDictCursor)
-    try:
-        cur.execute("DELETE FROM webhooks WHERE server_id = %s", (server_id))
+def delete_server_webhook_configs(server_id: str):
+    with get_cursor() as (conn, cur):
+        execute(cur, queries.DELETE_SERVER_WEBHOOKS, (server_id,))
         conn.commit()
+        cache.invalidate_server(server_id)
         return {"message": "Server webhook configs deleted successfully"}
-    finally:
-        cur.close()
-        conn.close()
+
+@app.delete("/server/{server_id}/teardown")
+def teardown_server(server_id: str):
+    # Remove every bot, webhook and history message for a server in one transaction
+    # Return what the bot still has to clean up on Discord and ElevenLabs
+    with get_cursor() as (conn, cur):
+        try:
+            execute(cur, queries.TEARDOWN_SERVER, (server_id, server_id, server_id))
+            teardown = cur.fetchone()
+            conn.commit()
+        except psycopg2.Error as e:
+            conn.rollback()
+            raise HTTPException(status_code=400, detail=str(e))
+
+    cache.invalidate_server(server_id)
+    return {
+        "bots": teardown["bots"],
+        "webhook_ids": [webhook["webhook_id"] for webhook in teardown["webhooks"]]
+    }
+
+@app.post("/history/{server_id}/{channel_id}")
+def append_history(server_id: str, channel_id: str, message: HistoryMessage):
+    # Append a message and trim the channel back to HISTORY_MAX_MESSAGES in one statement
+    with get_cursor() as (conn, cur):
+        execute(cur, queries.APPEND_HISTORY, (
+            server_id, channel_id, message.role, message.name, message.content[:HISTORY_MAX_CONTENT_LENGTH],
+            server_id, channel_id, server_id, channel_id, HISTORY_MAX_MESSAGES - 1
+        ))
+        conn.commit()
+        return {"message": "History message appended successfully"}
+
+@app.get("/history/{server_id}/{channel_id}")
+def get_history(server_id: str, channel_id: str, limit: int = 8):
+    # Last `limit` messages, oldest first, in the shape language-model's /generate/ expects
+    limit = max(1, min(limit, HISTORY_MAX_MESSAGES))
+    with get_cursor() as (conn, cur):
+        execute(cur, queries.GET_HISTORY, (server_id, channel_id, limit))
+        return cur.fetchall()
 
 @app.post("/bot-webhook")
-async def create_bot_webhook(bot_webhook: BotWebhook):
-    conn = psycopg2.connect(**DB_CONFIG)
-    cur = conn.cursor(cursor_factory=RealDictCursor)
-    try:
-        cur.execute("""
-            INSERT INTO bots_webhooks (bot_id, webhook_id)
-            VALUES (%s, %s)
-            RETURNING *
-        """, (bot_webhook.bot_id, bot_webhook.webhook_id))
+def create_bot_webhook(bot_webhook: BotWebhook):
+    with get_cursor() as (conn, cur):
+        execute(cur, queries.CREATE_BOT_WEBHOOK, (bot_webhook.bot_id, bot_webhook.webhook_id))
         new_bot_webhook = cur.fetchone()
         conn.commit()
+        cache.invalidate_channel(new_bot_webhook.pop("server_id"), new_bot_webhook.pop("channel_id"))
         return new_bot_webhook
-    finally:
-        cur.close()
-        conn.close()
 
 @app.delete("/bot-webhook/{bot_id}/{webhook_id}")
-async def delete_bot_webhook(bot_id: str, webhook_id: str):
-    conn = psycopg2.connect(**DB_CONFIG)
-    cur = conn.cursor(cursor_factory=RealDictCursor)
-    try:
-        cur.execute("DELETE FROM bots_webhooks WHERE bot_id = %s AND webhook_id = %s", (bot_id, webhook_id))
+def delete_bot_webhook(bot_id: str, webhook_id: str):
+    with get_cursor() as (conn, cur):
+        execute(cur, queries.DELETE_BOT_WEBHOOK, (bot_id, webhook_id))
+        deleted_link = cur.fetchone()
         conn.commit()
+        if deleted_link is not None:
+            cache.invalidate_channel(deleted_link["server_id"], deleted_link["channel_id"])
         return {"message": "Bot webhook deleted successfully"}
-    finally:
-        cur.close()
-        conn.close()
 
 @app.post("/user")
-async def create_user(user: User):
-    conn = psycopg2.connect(**DB_CONFIG)
-    cur = conn.cursor(cursor_factory=RealDictCursor)
-    try:
-        cur.execute("""
-            INSERT INTO users (user_id)
-            VALUES (%s, %s)
-            RETURNING *
-        """, (user.user_id))
+def create_user(user: User):
+    with get_cursor() as (conn, cur):
+        execute(cur, queries.CREATE_USER, (user.user_id,))
         new_user = cur.fetchone()
         conn.commit()
         return new_user
-    finally:
-        cur.close()
-        conn.close()
 
 @app.get("/user/{user_id}")
-async def get_user(user_id: str):
-    conn = psycopg2.connect(**DB_CONFIG)
-    cur = conn.cursor(cursor_factory=RealDictCursor)
-    try:
-        cur.execute("SELECT * FROM users WHERE user_id = %s", (user_id,))
+def get_user(user_id: str):
+    with get_cursor() as (conn, cur):
+        execute(cur, queries.GET_USER, (user_id,))
         user = cur.fetchone()
         if user is None:
             raise HTTPException(status_code=404, detail="User not found")
         return user
-    finally:
-        cur.close()
-        conn.close()
 
 @app.get("/user/{user_id}/bot-count")
-async def get_user_bot_count(user_id: str):
-    conn = psycopg2.connect(**DB_CONFIG)
-    cur = conn.cursor(cursor_factory=RealDictCursor)
-    try:
-        cur.execute("""
-            SELECT users.user_id, COUNT(bots.id) AS bot_count
-            FROM users
-            LEFT JOIN bots ON users.id = bots.owner_id
-            WHERE users.user_id = %s
-            GROUP BY users.user_id
-        """, (user_id,))
+def get_user_bot_count(user_id: str):
+    with get_cursor() as (conn, cur):
+        execute(cur, queries.GET_USER_BOT_COUNT, (user_id,))
         user = cur.fetchone()
         if user is None:
             raise HTTPException(status_code=404, detail="User not found")
         return user
-    finally:
-        cur.close()
-        conn.close()
 
 @app.put("/bot-voice")
-async def update_bot_voice(voice_update: VoiceUpdate):
+def update_bot_voice(voice_update: VoiceUpdate):
     # Check if voice exists and create if not, then assign to bot and prune old voices
-    conn = psycopg2.connect(**DB_CONFIG)
-    cur = conn.cursor(cursor_factory=RealDictCursor)
-    try:
+    with get_cursor() as (conn, cur):
         # Check for existing voice
         # cur.execute("SELECT * FROM voices WHERE eleven_voice_id = %s", (voice_update.eleven_voice_id,))
         # voice = cur.fetchone()
@@ -502,12 +422,9 @@ async def update_bot_voice(voice_update: VoiceUpdate):
         # old_voice_id = bot["voice_id"]
 
         # Update voice id
-        cur.execute("""
-            UPDATE bots
-            SET custom_voice = %s, eleven_voice_id = %s
-            WHERE server_id = %s AND name = %s""",
-            (voice_update.custom_voice, voice_update.eleven_voice_id, voice_update.server_id, voice_update.name))
+        execute(cur, queries.UPDATE_BOT_VOICE, (voice_update.custom_voice, voice_update.eleven_voice_id, voice_update.server_id, voice_update.name))
         conn.commit()
+        cache.invalidate_bot(voice_update.server_id, voice_update.name)
 
         # Check if voice is referenced in bots table, if not delete it
         # cur.execute("SELECT * FROM bots WHERE voice_id = %s", (old_voice_id,))
@@ -515,6 +432,11 @@ async def update_bot_voice(voice_update: VoiceUpdate):
         # if bot is None:
         #     cur.execute("DELETE FROM voices WHERE id = %s", (old_voice_id,))
         # return voice
-    finally:
-        cur.close()
-        conn.close()
\ No newline at end of file
+
+@app.get("/cache/stats")
+def get_cache_stats():
+    return cache.stats()
+
+@app.get("/metrics")
+def get_metrics():
+    return Response(content=generate_latest(), media_type=CONTENT_TYPE_LATEST)
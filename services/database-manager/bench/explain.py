@@ -0,0 +1,134 @@
+"""Captures EXPLAIN ANALYZE plans for every statement in queries.py.
+
+Seed first (python -m bench.seed), then run from services/database-manager:
+    POSTGRES_HOST=localhost python -m bench.explain --output plans.json
+Every statement runs in its own transaction that is rolled back, so writes are not kept.
+"""
+import argparse
+import json
+import psycopg2
+from psycopg2.extras import RealDictCursor
+import queries
+from config import DB_CONFIG
+
+# Parameters for each statement, built from a sample of the seeded data
+PARAMS = {
+    "CREATE_BOT": lambda s: (s["user_id"], s["server_id"], "explain-bot", None, None, False, None, None),
+    "GET_BOT": lambda s: (s["server_id"], s["name"]),
+    "GET_BOTS": lambda s: (s["user_id"], s["server_id"], 0, None),
+    "GET_BOTS_BY_CHANNEL": lambda s: (s["server_id"], s["channel_id"]),
+    "UPDATE_BOT": lambda s: (s["name"], None, None, None, s["server_id"], s["name"]),
+    "DELETE_BOT": lambda s: (s["server_id"], s["name"]),
+    "DELETE_OWNER_SERVER_BOTS": lambda s: (s["user_id"], s["server_id"], None),
+    "DELETE_OWNER_BOTS": lambda s: (s["user_id"], 500),
+    "DELETE_SERVER_BOTS": lambda s: (s["server_id"], None),
+    "CREATE_WEBHOOK": lambda s: (s["server_id"], "explain-channel", "explain-webhook", None),
+    "UPDATE_WEBHOOK": lambda s: (s["webhook_id"], None, s["server_id"], s["channel_id"]),
+    "GET_WEBHOOK": lambda s: (s["server_id"], s["channel_id"]),
+    "GET_SERVER_WEBHOOKS": lambda s: (s["server_id"], 0, None),
+    "PRUNE_WEBHOOK": lambda s: (s["server_id"], s["channel_id"]),
+    "PRUNE_SERVER_WEBHOOKS": lambda s: (s["server_id"],),
+    "DELETE_WEBHOOK": lambda s: (s["server_id"], s["channel_id"]),
+    "DELETE_SERVER_WEBHOOKS": lambda s: (s["server_id"],),
+    "TEARDOWN_SERVER": lambda s: (s["server_id"], s["server_id"], s["server_id"]),
+    "APPEND_HISTORY": lambda s: (
+        s["server_id"], s["channel_id"], "user", "explain-user", "Hello there",
+        s["server_id"], s["channel_id"], s["server_id"], s["channel_id"], 49
+    ),
+    "GET_HISTORY": lambda s: (s["server_id"], s["channel_id"], 8),
+    "CREATE_BOT_WEBHOOK": lambda s: (s["bot_id"], s["unlinked_webhook_pk"]),
+    "DELETE_BOT_WEBHOOK": lambda s: (s["bot_id"], s["webhook_pk"]),
+    "CREATE_USER": lambda s: ("explain-user",),
+    "GET_USER": lambda s: (s["user_id"],),
+    "GET_USER_BOT_COUNT": lambda s: (s["user_id"],),
+    "UPDATE_BOT_VOICE": lambda s: (False, "explain-voice", s["server_id"], s["name"]),
+}
+
+def load_sample(cur, server_id):
+    """Picks a linked bot/webhook pair in server_id plus a webhook that bot is not linked to."""
+    cur.execute("""
+        SELECT b.id AS bot_id, b.owner_id, b.server_id, b.name, u.user_id,
+               w.id AS webhook_pk, w.webhook_id, w.channel_id
+        FROM bots b
+        JOIN users u ON b.owner_id = u.id
+        JOIN bots_webhooks bw ON b.id = bw.bot_id
+        JOIN webhooks w ON bw.webhook_id = w.id
+        WHERE b.server_id = %s
+        LIMIT 1
+    """, (server_id,))
+    sample = cur.fetchone()
+    if sample is None:
+        raise SystemExit(f"No linked bots found in {server_id}, run python -m bench.seed first")
+
+    cur.execute("""
+        SELECT w.id
+        FROM webhooks w
+        WHERE w.server_id = %s
+          AND NOT EXISTS (SELECT 1 FROM bots_webhooks bw WHERE bw.webhook_id = w.id AND bw.bot_id = %s)
+        LIMIT 1
+    """, (server_id, sample["bot_id"]))
+    unlinked = cur.fetchone()
+    sample["unlinked_webhook_pk"] = unlinked["id"] if unlinked else sample["webhook_pk"]
+    return sample
+
+def find_seq_scans(plan):
+    """Returns the relations read by a sequential scan anywhere in the plan tree."""
+    scans = []
+    if plan.get("Node Type") == "Seq Scan":
+        scans.append(plan.get("Relation Name"))
+    for child in plan.get("Plans", []):
+        scans.extend(find_seq_scans(child))
+    return scans
+
+def explain(conn, name, sql, params):
+    cur = conn.cursor()
+    try:
+        cur.execute("EXPLAIN (ANALYZE, BUFFERS, FORMAT JSON) " + sql, params)
+        result = cur.fetchone()[0][0]
+        return {
+            "query": name,
+            "execution_ms": result["Execution Time"],
+            "planning_ms": result["Planning Time"],
+            "seq_scans": find_seq_scans(result["Plan"]),
+            "plan": result["Plan"],
+        }
+    except psycopg2.Error as e:
+        return {"query": name, "error": str(e).strip()}
+    finally:
+        cur.close()
+        conn.rollback()
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--server-id", default="bench-guild-1", help="Seeded guild to sample parameters from")
+    parser.add_argument("--output", default="explain_plans.json")
+    args = parser.parse_args()
+
+    statements = {name: sql for name, sql in vars(queries).items() if name.isupper() and isinstance(sql, str)}
+    missing = sorted(set(statements) - set(PARAMS))
+    if missing:
+        raise SystemExit(f"No sample parameters for: {', '.join(missing)}")
+
+    conn = psycopg2.connect(**DB_CONFIG)
+    try:
+        with conn.cursor(cursor_factory=RealDictCursor) as cur:
+            sample = load_sample(cur, args.server_id)
+        conn.rollback()
+
+        results = [explain(conn, name, sql, PARAMS[name](sample)) for name, sql in statements.items()]
+    finally:
+        conn.close()
+
+    with open(args.output, "w") as f:
+        json.dump(results, f, indent=2)
+
+    for result in results:
+        if "error" in result:
+            print(f"{result['query']:<28} ERROR {result['error']}")
+        else:
+            seq = ", ".join(result["seq_scans"]) or "-"
+            print(f"{result['query']:<28} {result['execution_ms']:>9.3f} ms  seq scans: {seq}")
+    print(f"Wrote {len(results)} plans to {args.output}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,220 @@
+"""Drives database-manager's hot endpoints at controlled concurrency and writes a JSON report.
+
+Seed the database first (or pass --seed), start the service, then run from services/database-manager:
+    POSTGRES_HOST=localhost python -m bench.loadtest --url http://localhost:5002 --concurrency 1 8 32
+Pass --compare with an earlier report to print per-endpoint deltas. Start the service with
+CACHE_TTL_SECONDS=0 to measure the database path instead of the bot config cache.
+"""
+import argparse
+import json
+import platform
+import random
+import subprocess
+import sys
+import threading
+import time
+import uuid
+from datetime import datetime, timezone
+from http.client import HTTPConnection
+from urllib.parse import urlparse, quote
+
+# Relative weight of each endpoint in the request mix
+MIX = {
+    "get_bots_by_channel": 70,
+    "get_bot": 15,
+    "get_user_bot_count": 10,
+    "create_bot": 5,
+}
+
+def build_request(endpoint, args, rng):
+    """Returns (method, path, body) for a random key in the seeded dataset."""
+    guild = rng.randint(1, args.guilds)
+    if endpoint == "get_bots_by_channel":
+        channel = rng.randint(1, args.channels_per_guild)
+        return "GET", f"/bot-config/channel/bench-guild-{guild}/bench-channel-{guild}-{channel}", None
+    if endpoint == "get_bot":
+        bot = rng.randint(1, args.bots_per_guild)
+        return "GET", f"/bot-config/bench-guild-{guild}/bench-bot-{bot}", None
+    if endpoint == "get_user_bot_count":
+        return "GET", f"/user/bench-user-{rng.randint(1, args.users)}/bot-count", None
+    if endpoint == "create_bot":
+        body = {
+            "owner_id": f"bench-user-{rng.randint(1, args.users)}",
+            "server_id": f"bench-guild-{guild}",
+            "name": f"loadtest-{uuid.uuid4().hex[:12]}",
+            "character_description": "Created by the load test.",
+            "example_speech": "Hello.",
+            "eleven_voice_id": "EXAVITQu4vr4xnSDxMaL",
+        }
+        return "POST", "/bot-config", json.dumps(body)
+    raise ValueError(endpoint)
+
+def worker(args, deadline, record_after, samples, lock, seed):
+    """Closed-loop client: one keep-alive connection, one request in flight at a time."""
+    rng = random.Random(seed)
+    url = urlparse(args.url)
+    conn = HTTPConnection(url.hostname, url.port or 80, timeout=30)
+    endpoints, weights = zip(*MIX.items())
+    local = []
+
+    while time.perf_counter() < deadline:
+        endpoint = rng.choices(endpoints, weights)[0]
+        method, path, body = build_request(endpoint, args, rng)
+        headers = {"Content-Type": "application/json"} if body else {}
+        start = time.perf_counter()
+        try:
+            conn.request(method, quote(path), body=body, headers=headers)
+            response = conn.getresponse()
+            response.read()
+            ok = response.status < 500
+        except OSError:
+            conn.close()
+            conn = HTTPConnection(url.hostname, url.port or 80, timeout=30)
+            ok = False
+        end = time.perf_counter()
+        if start >= record_after:
+            local.append((endpoint, end - start, ok))
+
+    conn.close()
+    with lock:
+        samples.extend(local)
+
+def percentile(sorted_values, p):
+    if not sorted_values:
+        return None
+    index = max(0, min(len(sorted_values) - 1, round(p / 100 * len(sorted_values)) - 1))
+    return sorted_values[index]
+
+def summarize(samples, duration):
+    results = {}
+    for endpoint in list(MIX) + ["all"]:
+        selected = [s for s in samples if endpoint == "all" or s[0] == endpoint]
+        latencies = sorted(s[1] * 1000 for s in selected if s[2])
+        results[endpoint] = {
+            "requests": len(selected),
+            "errors": sum(1 for s in selected if not s[2]),
+            "throughput_rps": round(len(selected) / duration, 1),
+            "p50_ms": percentile(latencies, 50),
+            "p90_ms": percentile(latencies, 90),
+            "p99_ms": percentile(latencies, 99),
+            "max_ms": latencies[-1] if latencies else None,
+        }
+    return results
+
+def run_level(args, concurrency):
+    samples = []
+    lock = threading.Lock()
+    start = time.perf_counter()
+    record_after = start + args.warmup
+    deadline = record_after + args.duration
+    threads = [
+        threading.Thread(target=worker, args=(args, deadline, record_after, samples, lock, args.random_seed + i))
+        for i in range(concurrency)
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return summarize(samples, args.duration)
+
+def git_revision():
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], text=True).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def compare(report, baseline):
+    """Prints p50/p99/throughput changes against an earlier report."""
+    print(f"\nCompared with {baseline.get('git_revision')} ({baseline.get('started_at')})")
+    for level, results in report["levels"].items():
+        previous_level = baseline.get("levels", {}).get(level)
+        if previous_level is None:
+            continue
+        for endpoint, current in results.items():
+            previous = previous_level.get(endpoint)
+            if previous is None or not previous["p99_ms"] or not current["p99_ms"]:
+                continue
+            print(
+                f"c={level:<4} {endpoint:<22} "
+                f"p50 {previous['p50_ms']:.1f} -> {current['p50_ms']:.1f} ms  "
+                f"p99 {previous['p99_ms']:.1f} -> {current['p99_ms']:.1f} ms  "
+                f"rps {previous['throughput_rps']} -> {current['throughput_rps']}"
+            )
+
+def cleanup():
+    """Removes bots created by create_bot requests."""
+    import psycopg2
+    from config import DB_CONFIG
+    conn = psycopg2.connect(**DB_CONFIG)
+    try:
+        with conn.cursor() as cur:
+            cur.execute("DELETE FROM bots WHERE name LIKE 'loadtest-%'")
+            print(f"Removed {cur.rowcount} load test bots")
+        conn.commit()
+    finally:
+        conn.close()
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--url", default="http://localhost:5002")
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 8, 32])
+    parser.add_argument("--duration", type=float, default=30, help="Measured seconds per concurrency level")
+    parser.add_argument("--warmup", type=float, default=5, help="Unmeasured seconds before each level")
+    parser.add_argument("--random-seed", type=int, default=1)
+    parser.add_argument("--output", default="loadtest_report.json")
+    parser.add_argument("--compare", help="Earlier report to compare against")
+    parser.add_argument("--seed", action="store_true", help="Reseed the database before running")
+    parser.add_argument("--no-cleanup", action="store_true", help="Keep bots created during the run")
+    # Must match the dataset created by bench.seed
+    parser.add_argument("--guilds", type=int, default=5000)
+    parser.add_argument("--users", type=int, default=10000)
+    parser.add_argument("--bots-per-guild", type=int, default=5)
+    parser.add_argument("--channels-per-guild", type=int, default=20)
+    args = parser.parse_args()
+
+    if args.seed:
+        subprocess.check_call([
+            sys.executable, "-m", "bench.seed",
+            "--guilds", str(args.guilds), "--users", str(args.users),
+            "--bots-per-guild", str(args.bots_per_guild), "--channels-per-guild", str(args.channels_per_guild)
+        ])
+
+    report = {
+        "started_at": datetime.now(timezone.utc).isoformat(),
+        "git_revision": git_revision(),
+        "host": platform.node(),
+        "url": args.url,
+        "duration_s": args.duration,
+        "mix": MIX,
+        "dataset": {
+            "guilds": args.guilds,
+            "users": args.users,
+            "bots_per_guild": args.bots_per_guild,
+            "channels_per_guild": args.channels_per_guild,
+        },
+        "levels": {},
+    }
+
+    try:
+        for concurrency in args.concurrency:
+            results = run_level(args, concurrency)
+            report["levels"][str(concurrency)] = results
+            overall = results["all"]
+            print(
+                f"c={concurrency:<4} {overall['throughput_rps']:>8} rps  "
+                f"p50 {overall['p50_ms'] or 0:.1f} ms  p99 {overall['p99_ms'] or 0:.1f} ms  errors {overall['errors']}"
+            )
+    finally:
+        if not args.no_cleanup:
+            cleanup()
+
+    with open(args.output, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"Wrote {args.output}")
+
+    if args.compare:
+        with open(args.compare) as f:
+            compare(report, json.load(f))
+
+if __name__ == "__main__":
+    main()
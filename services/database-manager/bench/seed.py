@@ -0,0 +1,93 @@
+"""Seeds a synthetic dataset for benchmarking.
+
+Run from services/database-manager against a local database, e.g.
+    POSTGRES_HOST=localhost python -m bench.seed --guilds 5000
+"""
+import argparse
+import time
+import psycopg2
+from config import DB_CONFIG
+
+def reset(cur):
+    """Removes rows created by a previous seed. Bots and links cascade from users and webhooks."""
+    cur.execute("DELETE FROM users WHERE user_id LIKE 'bench-user-%'")
+    cur.execute("DELETE FROM webhooks WHERE server_id LIKE 'bench-guild-%'")
+    cur.execute("DELETE FROM channel_messages WHERE server_id LIKE 'bench-guild-%'")
+
+def seed(cur, guilds, users, bots_per_guild, channels_per_guild, link_every, history_per_channel):
+    cur.execute("""
+        INSERT INTO users (user_id)
+        SELECT 'bench-user-' || u
+        FROM generate_series(1, %s) u
+    """, (users,))
+
+    cur.execute("""
+        INSERT INTO bots (owner_id, server_id, name, character_description, example_speech, custom_voice, eleven_voice_id, profile_picture_url)
+        SELECT u.id, 'bench-guild-' || g, 'bench-bot-' || b,
+               'A synthetic character used for benchmarking.', 'Hello there, this is how I talk.',
+               false, 'EXAVITQu4vr4xnSDxMaL', NULL
+        FROM generate_series(1, %s) g
+        CROSS JOIN generate_series(1, %s) b
+        JOIN users u ON u.user_id = 'bench-user-' || (1 + (g * %s + b) %% %s)
+    """, (guilds, bots_per_guild, bots_per_guild, users))
+
+    cur.execute("""
+        INSERT INTO webhooks (server_id, channel_id, webhook_id, webhook_url)
+        SELECT 'bench-guild-' || g, 'bench-channel-' || g || '-' || c, 'bench-webhook-' || g || '-' || c,
+               'https://discord.com/api/webhooks/bench-webhook-' || g || '-' || c || '/token'
+        FROM generate_series(1, %s) g
+        CROSS JOIN generate_series(1, %s) c
+    """, (guilds, channels_per_guild))
+
+    # Each bot is linked to every link_every-th channel of its guild, offset by its number
+    cur.execute("""
+        INSERT INTO bots_webhooks (bot_id, webhook_id)
+        SELECT b.id, w.id
+        FROM bots b
+        JOIN webhooks w ON w.server_id = b.server_id
+        WHERE b.server_id LIKE 'bench-guild-%%'
+          AND (split_part(b.name, '-', 3)::int + split_part(w.channel_id, '-', 4)::int) %% %s = 0
+    """, (link_every,))
+
+    cur.execute("""
+        INSERT INTO channel_messages (server_id, channel_id, role, name, content)
+        SELECT 'bench-guild-' || g, 'bench-channel-' || g || '-' || c,
+               CASE WHEN m %% 2 = 0 THEN 'assistant' ELSE 'user' END,
+               CASE WHEN m %% 2 = 0 THEN 'bench-bot-1' ELSE 'bench-user-' || m END,
+               'Synthetic message number ' || m
+        FROM generate_series(1, %s) g
+        CROSS JOIN generate_series(1, %s) c
+        CROSS JOIN generate_series(1, %s) m
+    """, (guilds, channels_per_guild, history_per_channel))
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--guilds", type=int, default=5000)
+    parser.add_argument("--users", type=int, default=10000)
+    parser.add_argument("--bots-per-guild", type=int, default=5)
+    parser.add_argument("--channels-per-guild", type=int, default=20)
+    parser.add_argument("--link-every", type=int, default=4)
+    parser.add_argument("--history-per-channel", type=int, default=10)
+    args = parser.parse_args()
+
+    conn = psycopg2.connect(**DB_CONFIG)
+    cur = conn.cursor()
+    try:
+        start = time.perf_counter()
+        reset(cur)
+        seed(cur, args.guilds, args.users, args.bots_per_guild, args.channels_per_guild, args.link_every, args.history_per_channel)
+        conn.commit()
+
+        conn.autocommit = True
+        cur.execute("ANALYZE users, bots, webhooks, bots_webhooks, channel_messages")
+
+        for table in ("users", "bots", "webhooks", "bots_webhooks", "channel_messages"):
+            cur.execute(f"SELECT COUNT(*) FROM {table}")
+            print(f"{table}: {cur.fetchone()[0]} rows")
+        print(f"Seeded in {time.perf_counter() - start:.1f}s")
+    finally:
+        cur.close()
+        conn.close()
+
+if __name__ == "__main__":
+    main()
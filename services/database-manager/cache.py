@@ -0,0 +1,154 @@
+import json
+import select
+import threading
+import time
+from collections import OrderedDict
+import psycopg2
+from config import DB_CONFIG, CACHE_TTL_SECONDS, CACHE_MAX_ENTRIES
+
+# Must match the channel used by the triggers in migrations/0001_cache_invalidation_triggers.sql
+NOTIFY_CHANNEL = "bot_config_changed"
+
+MISSING = object()
+
+class TTLCache:
+    """Thread-safe LRU cache whose entries expire after a fixed TTL."""
+
+    def __init__(self, max_entries, ttl):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._version = 0
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        """Returns the cached value for key, or MISSING."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[0] < time.monotonic():
+                if entry is not None:
+                    del self._entries[key]
+                self.misses += 1
+                return MISSING
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+    def version(self):
+        """Token to pass to set() so a load that raced an invalidation is discarded."""
+        with self._lock:
+            return self._version
+
+    def set(self, key, value, version):
+        with self._lock:
+            if version != self._version:
+                return
+            self._entries[key] = (time.monotonic() + self.ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, key):
+        with self._lock:
+            self._version += 1
+            self._entries.pop(key, None)
+
+    def invalidate_where(self, predicate):
+        """Drops every entry for which predicate(key, value) is true."""
+        with self._lock:
+            self._version += 1
+            for key in [key for key, (_, value) in self._entries.items() if predicate(key, value)]:
+                del self._entries[key]
+
+    def clear(self):
+        with self._lock:
+            self._version += 1
+            self._entries.clear()
+
+    def stats(self):
+        with self._lock:
+            return {"hits": self.hits, "misses": self.misses, "size": len(self._entries)}
+
+# (server_id, name) -> bot row
+bot_cache = TTLCache(CACHE_MAX_ENTRIES, CACHE_TTL_SECONDS)
+
+# (server_id, channel_id) -> list of bot rows linked to the channel's webhook
+channel_cache = TTLCache(CACHE_MAX_ENTRIES, CACHE_TTL_SECONDS)
+
+def invalidate_bot(server_id, name):
+    bot_cache.invalidate((server_id, name))
+    channel_cache.invalidate_where(
+        lambda key, bots: key[0] == server_id and any(bot["name"] == name for bot in bots)
+    )
+
+def invalidate_channel(server_id, channel_id):
+    channel_cache.invalidate((server_id, channel_id))
+
+def invalidate_server(server_id):
+    bot_cache.invalidate_where(lambda key, _: key[0] == server_id)
+    channel_cache.invalidate_where(lambda key, _: key[0] == server_id)
+
+def clear():
+    bot_cache.clear()
+    channel_cache.clear()
+
+def stats():
+    return {"bot": bot_cache.stats(), "channel": channel_cache.stats()}
+
+def handle_notification(payload):
+    """Applies an invalidation sent by the database triggers."""
+    try:
+        change = json.loads(payload)
+    except ValueError:
+        clear()
+        return
+
+    if change.get("name") is not None:
+        invalidate_bot(change["server_id"], change["name"])
+    elif change.get("channel_id") is not None:
+        invalidate_channel(change["server_id"], change["channel_id"])
+    else:
+        invalidate_server(change.get("server_id"))
+
+# LISTEN/NOTIFY keeps replicas consistent with writes made through other instances
+_stop = threading.Event()
+_listener = None
+
+def start_listener():
+    global _listener
+    _stop.clear()
+    _listener = threading.Thread(target=_listen, name="cache-invalidation", daemon=True)
+    _listener.start()
+
+def stop_listener():
+    _stop.set()
+    if _listener is not None:
+        _listener.join(timeout=5)
+
+def _listen():
+    while not _stop.is_set():
+        conn = None
+        try:
+            conn = psycopg2.connect(**DB_CONFIG)
+            conn.autocommit = True
+            with conn.cursor() as cur:
+                cur.execute(f"LISTEN {NOTIFY_CHANNEL}")
+
+            # Anything cached while we weren't listening may already be stale
+            clear()
+
+            while not _stop.is_set():
+                if select.select([conn], [], [], 1.0) == ([], [], []):
+                    continue
+                conn.poll()
+                while conn.notifies:
+                    handle_notification(conn.notifies.pop(0).payload)
+        except Exception as e:
+            print(f"Error in cache invalidation listener: {e}")
+            clear()
+            _stop.wait(5)
+        finally:
+            if conn is not None:
+                conn.close()
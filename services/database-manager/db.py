@@ -0,0 +1,126 @@
+import threading
+import time
+from contextlib import contextmanager
+import psycopg2
+from psycopg2.extensions import TRANSACTION_STATUS_IDLE
+from psycopg2.extras import RealDictCursor
+from psycopg2.pool import ThreadedConnectionPool
+from fastapi import HTTPException
+from config import (
+    DB_CONFIG, DB_POOL_MIN_SIZE, DB_POOL_MAX_SIZE, DB_POOL_TIMEOUT, DB_STATEMENT_TIMEOUT_MS,
+    DB_STREAM_BATCH_SIZE, DB_SLOW_QUERY_MS
+)
+from metrics import QUERY_LATENCY, QUERY_ROWS, QUERY_ERRORS, POOL_WAIT
+import queries
+
+pool = None
+
+# ThreadedConnectionPool fails immediately when empty, so waiters queue here instead
+_slots = threading.BoundedSemaphore(DB_POOL_MAX_SIZE)
+
+# Metrics are labelled with the constant name a statement has in queries.py
+QUERY_NAMES = {sql: name for name, sql in vars(queries).items() if name.isupper() and isinstance(sql, str)}
+
+def open_pool():
+    """Creates the shared connection pool. Called once at app startup."""
+    global pool
+    pool = ThreadedConnectionPool(
+        DB_POOL_MIN_SIZE,
+        DB_POOL_MAX_SIZE,
+        options=f"-c statement_timeout={DB_STATEMENT_TIMEOUT_MS}",
+        **DB_CONFIG
+    )
+
+def close_pool():
+    """Closes every pooled connection. Called once at app shutdown."""
+    global pool
+    if pool is not None:
+        pool.closeall()
+        pool = None
+
+@contextmanager
+def get_cursor(name=None):
+    """Borrows a pooled connection and yields (conn, cur) with a RealDictCursor.
+
+    Passing a name opens a server-side cursor that fetches DB_STREAM_BATCH_SIZE rows at a time.
+    """
+    start = time.perf_counter()
+    if not _slots.acquire(timeout=DB_POOL_TIMEOUT):
+        POOL_WAIT.observe(time.perf_counter() - start)
+        raise HTTPException(status_code=503, detail="Timed out waiting for a database connection")
+
+    try:
+        conn = pool.getconn()
+    except Exception:
+        _slots.release()
+        raise
+    POOL_WAIT.observe(time.perf_counter() - start)
+
+    try:
+        cur = conn.cursor(name, cursor_factory=RealDictCursor)
+        if name is not None:
+            cur.itersize = DB_STREAM_BATCH_SIZE
+        try:
+            yield conn, cur
+        finally:
+            cur.close()
+    finally:
+        # Never hand a connection with an open transaction back to the pool
+        broken = bool(conn.closed)
+        if not broken and conn.get_transaction_status() != TRANSACTION_STATUS_IDLE:
+            try:
+                conn.rollback()
+            except psycopg2.Error:
+                broken = True
+        pool.putconn(conn, close=broken)
+        _slots.release()
+
+def execute(cur, sql, params=None):
+    """Runs a statement from queries.py, recording its latency, rows and errors."""
+    name = QUERY_NAMES.get(sql, "unnamed")
+    start = time.perf_counter()
+    try:
+        cur.execute(sql, params)
+    except psycopg2.Error:
+        QUERY_ERRORS.labels(name).inc()
+        raise
+    finally:
+        elapsed = time.perf_counter() - start
+        QUERY_LATENCY.labels(name).observe(elapsed)
+        if elapsed * 1000 >= DB_SLOW_QUERY_MS:
+            print(f"Slow query {name}: {elapsed * 1000:.1f} ms, params={redact(params)}")
+
+    if cur.rowcount > 0:
+        QUERY_ROWS.labels(name).inc(cur.rowcount)
+
+def redact(params):
+    """Describes query parameters by type only, so slow query logs never contain user data."""
+    if params is None:
+        return []
+    return [type(param).__name__ for param in params]
+
+def stream_rows(sql, params):
+    """Yields the rows of a SELECT through a server-side cursor, keeping memory flat."""
+    with get_cursor(name="stream_rows") as (conn, cur):
+        execute(cur, sql, params)
+        count = 0
+        try:
+            for row in cur:
+                count += 1
+                yield row
+        finally:
+            QUERY_ROWS.labels(QUERY_NAMES.get(sql, "unnamed")).inc(count)
+
+def delete_in_batches(sql, params):
+    """Yields rows removed by a DELETE ... LIMIT %s RETURNING statement, committing each batch.
+
+    sql takes params followed by the batch size, and runs until a batch comes back short.
+    """
+    while True:
+        with get_cursor() as (conn, cur):
+            execute(cur, sql, params + (DB_STREAM_BATCH_SIZE,))
+            rows = cur.fetchall()
+            conn.commit()
+        yield from rows
+        if len(rows) < DB_STREAM_BATCH_SIZE:
+            return
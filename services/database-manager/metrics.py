@@ -0,0 +1,31 @@
+from prometheus_client import Counter, Histogram, REGISTRY
+from prometheus_client.core import CounterMetricFamily
+import cache
+
+QUERY_LATENCY = Histogram(
+    "db_query_duration_seconds",
+    "Time spent executing each named query",
+    ["query"],
+    buckets=(0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5)
+)
+QUERY_ROWS = Counter("db_query_rows_total", "Rows returned or affected by each named query", ["query"])
+QUERY_ERRORS = Counter("db_query_errors_total", "Failed executions of each named query", ["query"])
+POOL_WAIT = Histogram(
+    "db_pool_wait_seconds",
+    "Time spent waiting for a pooled connection",
+    buckets=(0.0001, 0.0005, 0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1, 5)
+)
+
+class CacheCollector:
+    """Exports the bot config cache counters kept in cache.py."""
+
+    def collect(self):
+        hits = CounterMetricFamily("cache_hits", "Bot config cache hits", labels=["cache"])
+        misses = CounterMetricFamily("cache_misses", "Bot config cache misses", labels=["cache"])
+        for name, stats in cache.stats().items():
+            hits.add_metric([name], stats["hits"])
+            misses.add_metric([name], stats["misses"])
+        yield hits
+        yield misses
+
+REGISTRY.register(CacheCollector())
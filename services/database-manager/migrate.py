@@ -0,0 +1,89 @@
+import os
+import re
+import psycopg2
+from psycopg2 import sql as pgsql
+from config import DB_CONFIG
+
+MIGRATIONS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "migrations")
+
+# Advisory lock key so replicas starting together don't apply the same migration twice
+MIGRATION_LOCK_ID = 5002
+
+# First line of a migration that must run outside a transaction (e.g. CREATE INDEX CONCURRENTLY).
+# Its statements run one at a time, so the file has to be safe to re-run; an index a failed
+# CREATE INDEX CONCURRENTLY left INVALID is dropped before the statement runs again.
+NO_TRANSACTION = "-- migrate: no-transaction"
+
+def load_migrations():
+    """Returns [(version, name, sql)] for every file in migrations/, oldest first."""
+    migrations = []
+    for filename in sorted(os.listdir(MIGRATIONS_DIR)):
+        match = re.match(r"^(\d+)_(\w+)\.sql$", filename)
+        if match is None:
+            continue
+        with open(os.path.join(MIGRATIONS_DIR, filename)) as f:
+            migrations.append((int(match.group(1)), match.group(2), f.read()))
+    return migrations
+
+def split_statements(sql):
+    """Splits a no-transaction migration into statements. Only plain statements are supported."""
+    lines = [line for line in sql.splitlines() if not line.strip().startswith("--")]
+    return [statement.strip() for statement in "\n".join(lines).split(";") if statement.strip()]
+
+def drop_invalid_index(cur, statement):
+    """Drops the index a CREATE INDEX CONCURRENTLY IF NOT EXISTS statement makes if an earlier attempt left it INVALID.
+
+    A concurrent build that fails part way leaves the index behind marked invalid, and IF NOT EXISTS
+    would then skip it, so the migration would be recorded without a usable index.
+    """
+    match = re.match(r"CREATE\s+(?:UNIQUE\s+)?INDEX\s+CONCURRENTLY\s+IF\s+NOT\s+EXISTS\s+(\w+)", statement, re.IGNORECASE)
+    if match is None:
+        return
+    cur.execute("SELECT indisvalid FROM pg_index WHERE indexrelid = to_regclass(%s)", (match.group(1),))
+    row = cur.fetchone()
+    if row is not None and not row[0]:
+        print(f"Dropping invalid index {match.group(1)}")
+        cur.execute(pgsql.SQL("DROP INDEX CONCURRENTLY {}").format(pgsql.Identifier(match.group(1))))
+
+def run_migrations():
+    """Applies every migration not yet recorded in schema_migrations."""
+    conn = psycopg2.connect(**DB_CONFIG)
+    conn.autocommit = True
+    cur = conn.cursor()
+    try:
+        cur.execute("SELECT pg_advisory_lock(%s)", (MIGRATION_LOCK_ID,))
+        cur.execute("""
+            CREATE TABLE IF NOT EXISTS schema_migrations (
+                version INTEGER PRIMARY KEY,
+                name VARCHAR(255) NOT NULL,
+                applied_at TIMESTAMPTZ NOT NULL DEFAULT now()
+            )
+        """)
+        cur.execute("SELECT version FROM schema_migrations")
+        applied = {row[0] for row in cur.fetchall()}
+
+        for version, name, sql in load_migrations():
+            if version in applied:
+                continue
+
+            print(f"Applying migration {version:04d}_{name}")
+            if sql.startswith(NO_TRANSACTION):
+                for statement in split_statements(sql):
+                    drop_invalid_index(cur, statement)
+                    cur.execute(statement)
+                cur.execute("INSERT INTO schema_migrations (version, name) VALUES (%s, %s)", (version, name))
+            else:
+                cur.execute("BEGIN")
+                try:
+                    cur.execute(sql)
+                    cur.execute("INSERT INTO schema_migrations (version, name) VALUES (%s, %s)", (version, name))
+                    cur.execute("COMMIT")
+                except Exception:
+                    cur.execute("ROLLBACK")
+                    raise
+    finally:
+        cur.close()
+        conn.close()
+
+if __name__ == "__main__":
+    run_migrations()
@@ -0,0 +1,41 @@
+-- Publish bot/webhook changes so every database-manager replica can drop stale cache entries (see cache.py)
+CREATE OR REPLACE FUNCTION notify_bot_config_changed() RETURNS trigger AS $$
+BEGIN
+  IF TG_TABLE_NAME = 'bots' THEN
+    IF TG_OP <> 'INSERT' THEN
+      PERFORM pg_notify('bot_config_changed', json_build_object('server_id', OLD.server_id, 'name', OLD.name)::text);
+    END IF;
+    IF TG_OP <> 'DELETE' THEN
+      PERFORM pg_notify('bot_config_changed', json_build_object('server_id', NEW.server_id, 'name', NEW.name)::text);
+    END IF;
+  ELSIF TG_TABLE_NAME = 'webhooks' THEN
+    IF TG_OP <> 'INSERT' THEN
+      PERFORM pg_notify('bot_config_changed', json_build_object('server_id', OLD.server_id, 'channel_id', OLD.channel_id)::text);
+    END IF;
+    IF TG_OP <> 'DELETE' THEN
+      PERFORM pg_notify('bot_config_changed', json_build_object('server_id', NEW.server_id, 'channel_id', NEW.channel_id)::text);
+    END IF;
+  ELSE
+    -- bots_webhooks: rows removed by a webhook cascade are covered by the webhooks trigger
+    PERFORM pg_notify('bot_config_changed', json_build_object('server_id', w.server_id, 'channel_id', w.channel_id)::text)
+    FROM webhooks w
+    WHERE w.id = COALESCE(NEW.webhook_id, OLD.webhook_id);
+  END IF;
+  RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS bots_notify_changed ON bots;
+CREATE TRIGGER bots_notify_changed
+AFTER INSERT OR UPDATE OR DELETE ON bots
+FOR EACH ROW EXECUTE FUNCTION notify_bot_config_changed();
+
+DROP TRIGGER IF EXISTS webhooks_notify_changed ON webhooks;
+CREATE TRIGGER webhooks_notify_changed
+AFTER INSERT OR UPDATE OR DELETE ON webhooks
+FOR EACH ROW EXECUTE FUNCTION notify_bot_config_changed();
+
+DROP TRIGGER IF EXISTS bots_webhooks_notify_changed ON bots_webhooks;
+CREATE TRIGGER bots_webhooks_notify_changed
+AFTER INSERT OR UPDATE OR DELETE ON bots_webhooks
+FOR EACH ROW EXECUTE FUNCTION notify_bot_config_changed();
@@ -0,0 +1,9 @@
+-- migrate: no-transaction
+-- CREATE INDEX CONCURRENTLY cannot run inside a transaction block, so each statement runs on its own.
+-- webhooks.server_id lookups are already served by the UNIQUE (server_id, channel_id) index.
+
+-- get_bots, get_user_bot_count and the owner-scoped deletes
+CREATE INDEX CONCURRENTLY IF NOT EXISTS bots_owner_id_server_id_idx ON bots (owner_id, server_id);
+
+-- Prune endpoints and the webhook side of the channel join (the PK leads with bot_id)
+CREATE INDEX CONCURRENTLY IF NOT EXISTS bots_webhooks_webhook_id_idx ON bots_webhooks (webhook_id);
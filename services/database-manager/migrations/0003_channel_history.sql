@@ -0,0 +1,12 @@
+-- Rolling per-channel conversation history served to language-model (see GET /history)
+CREATE TABLE IF NOT EXISTS channel_messages (
+  id BIGSERIAL PRIMARY KEY,
+  server_id VARCHAR(255) NOT NULL,
+  channel_id VARCHAR(255) NOT NULL,
+  role VARCHAR(16) NOT NULL,
+  name VARCHAR(255) NOT NULL,
+  content TEXT NOT NULL,
+  created_at TIMESTAMPTZ NOT NULL DEFAULT now()
+);
+
+CREATE INDEX IF NOT EXISTS channel_messages_channel_idx ON channel_messages (server_id, channel_id, id);
@@ -0,0 +1,222 @@
+# SQL used by app.py, kept in one place so bench/explain.py can plan every statement
+
+# Writes nothing when the bot already exists; the owner is only inserted when it is missing
+CREATE_BOT = """
+    WITH new_bot AS (
+        SELECT %s::varchar AS user_id, %s::varchar AS server_id, %s::varchar AS name
+    ),
+    candidate AS (
+        SELECT new_bot.*, u.id AS owner_id
+        FROM new_bot
+        LEFT JOIN users u ON u.user_id = new_bot.user_id
+        WHERE NOT EXISTS (
+            SELECT 1 FROM bots b WHERE b.server_id = new_bot.server_id AND b.name = new_bot.name
+        )
+    ),
+    new_owner AS (
+        INSERT INTO users (user_id)
+        SELECT user_id FROM candidate WHERE owner_id IS NULL
+        ON CONFLICT (user_id) DO UPDATE SET user_id = EXCLUDED.user_id
+        RETURNING id
+    )
+    INSERT INTO bots (owner_id, server_id, name, character_description, example_speech, custom_voice, eleven_voice_id, profile_picture_url)
+    SELECT COALESCE(candidate.owner_id, (SELECT id FROM new_owner)), candidate.server_id, candidate.name, %s, %s, %s, %s, %s
+    FROM candidate
+    ON CONFLICT (server_id, name) DO NOTHING
+    RETURNING *
+"""
+
+GET_BOT = """
+    SELECT b.*, u.user_id
+    FROM bots b
+    JOIN users u ON b.owner_id = u.id
+    WHERE b.server_id = %s AND b.name = %s
+"""
+
+# Paged statements take (..., after_id, limit); LIMIT NULL returns every remaining row
+GET_BOTS = """
+    SELECT b.*
+    FROM bots b
+    WHERE b.owner_id = (SELECT id FROM users WHERE user_id = %s) AND b.server_id = %s
+      AND b.id > %s
+    ORDER BY b.id
+    LIMIT %s
+"""
+
+GET_BOTS_BY_CHANNEL = """
+    SELECT b.*, u.user_id, wc.webhook_id, wc.webhook_url
+    FROM bots b
+    JOIN bots_webhooks bw ON b.id = bw.bot_id
+    JOIN webhooks wc ON bw.webhook_id = wc.id
+    JOIN users u ON b.owner_id = u.id
+    WHERE wc.server_id = %s AND wc.channel_id = %s
+"""
+
+UPDATE_BOT = """
+    UPDATE bots
+    SET name = %s, character_description = %s, example_speech = %s, profile_picture_url = %s
+    WHERE server_id = %s AND name = %s
+    RETURNING *
+"""
+
+DELETE_BOT = "DELETE FROM bots WHERE server_id = %s AND name = %s"
+
+# Bulk deletes take a trailing batch size; LIMIT NULL deletes every matching row
+DELETE_OWNER_SERVER_BOTS = """
+    DELETE FROM bots
+    WHERE id IN (
+        SELECT id FROM bots
+        WHERE owner_id = (SELECT id FROM users WHERE user_id = %s) AND server_id = %s
+        ORDER BY id
+        LIMIT %s
+    )
+    RETURNING *
+"""
+
+DELETE_OWNER_BOTS = """
+    DELETE FROM bots
+    WHERE id IN (
+        SELECT id FROM bots
+        WHERE owner_id = (SELECT id FROM users WHERE user_id = %s)
+        ORDER BY id
+        LIMIT %s
+    )
+    RETURNING server_id, name
+"""
+
+DELETE_SERVER_BOTS = """
+    DELETE FROM bots
+    WHERE id IN (
+        SELECT id FROM bots
+        WHERE server_id = %s
+        ORDER BY id
+        LIMIT %s
+    )
+    RETURNING *
+"""
+
+CREATE_WEBHOOK = """
+    INSERT INTO webhooks (server_id, channel_id, webhook_id, webhook_url)
+    VALUES (%s, %s, %s, %s)
+    RETURNING *
+"""
+
+UPDATE_WEBHOOK = """
+    UPDATE webhooks
+    SET webhook_id = %s, webhook_url = %s
+    WHERE server_id = %s AND channel_id = %s
+    RETURNING *
+"""
+
+GET_WEBHOOK = "SELECT * FROM webhooks WHERE server_id = %s AND channel_id = %s"
+
+GET_SERVER_WEBHOOKS = """
+    SELECT *
+    FROM webhooks
+    WHERE server_id = %s AND id > %s
+    ORDER BY id
+    LIMIT %s
+"""
+
+PRUNE_WEBHOOK = """
+    DELETE FROM webhooks w
+    WHERE w.server_id = %s AND w.channel_id = %s
+      AND NOT EXISTS (SELECT 1 FROM bots_webhooks bw WHERE bw.webhook_id = w.id)
+    RETURNING w.webhook_id
+"""
+
+PRUNE_SERVER_WEBHOOKS = """
+    DELETE FROM webhooks w
+    WHERE w.server_id = %s
+      AND NOT EXISTS (SELECT 1 FROM bots_webhooks bw WHERE bw.webhook_id = w.id)
+    RETURNING w.webhook_id, w.channel_id
+"""
+
+DELETE_WEBHOOK = "DELETE FROM webhooks WHERE server_id = %s AND channel_id = %s"
+
+DELETE_SERVER_WEBHOOKS = "DELETE FROM webhooks WHERE server_id = %s"
+
+TEARDOWN_SERVER = """
+    WITH deleted_bots AS (
+        DELETE FROM bots WHERE server_id = %s RETURNING *
+    ), deleted_webhooks AS (
+        DELETE FROM webhooks WHERE server_id = %s RETURNING webhook_id
+    ), deleted_history AS (
+        DELETE FROM channel_messages WHERE server_id = %s
+    )
+    SELECT
+        (SELECT COALESCE(json_agg(deleted_bots), '[]') FROM deleted_bots) AS bots,
+        (SELECT COALESCE(json_agg(deleted_webhooks), '[]') FROM deleted_webhooks) AS webhooks
+"""
+
+# The insert isn't visible to the trim's subquery, so the offset keeps one fewer existing row
+APPEND_HISTORY = """
+    WITH appended AS (
+        INSERT INTO channel_messages (server_id, channel_id, role, name, content)
+        VALUES (%s, %s, %s, %s, %s)
+    )
+    DELETE FROM channel_messages
+    WHERE server_id = %s AND channel_id = %s
+      AND id <= (
+          SELECT id FROM channel_messages
+          WHERE server_id = %s AND channel_id = %s
+          ORDER BY id DESC
+          OFFSET %s LIMIT 1
+      )
+"""
+
+GET_HISTORY = """
+    SELECT role, name, content
+    FROM (
+        SELECT id, role, name, content
+        FROM channel_messages
+        WHERE server_id = %s AND channel_id = %s
+        ORDER BY id DESC
+        LIMIT %s
+    ) recent
+    ORDER BY id
+"""
+
+CREATE_BOT_WEBHOOK = """
+    WITH link AS (
+        INSERT INTO bots_webhooks (bot_id, webhook_id)
+        VALUES (%s, %s)
+        RETURNING *
+    )
+    SELECT link.*, w.server_id, w.channel_id
+    FROM link
+    JOIN webhooks w ON link.webhook_id = w.id
+"""
+
+DELETE_BOT_WEBHOOK = """
+    WITH link AS (
+        DELETE FROM bots_webhooks
+        WHERE bot_id = %s AND webhook_id = %s
+        RETURNING webhook_id
+    )
+    SELECT w.server_id, w.channel_id
+    FROM link
+    JOIN webhooks w ON link.webhook_id = w.id
+"""
+
+CREATE_USER = """
+    INSERT INTO users (user_id)
+    VALUES (%s)
+    RETURNING *
+"""
+
+GET_USER = "SELECT * FROM users WHERE user_id = %s"
+
+GET_USER_BOT_COUNT = """
+    SELECT users.user_id, COUNT(bots.id) AS bot_count
+    FROM users
+    LEFT JOIN bots ON users.id = bots.owner_id
+    WHERE users.user_id = %s
+    GROUP BY users.user_id
+"""
+
+UPDATE_BOT_VOICE = """
+    UPDATE bots
+    SET custom_voice = %s, eleven_voice_id = %s
+    WHERE server_id = %s AND name = %s
+"""
@@ -1,42 +1,104 @@
 from fastapi import FastAPI
+from fastapi.responses import StreamingResponse
+from typing import Literal, Optional
 from pydantic import BaseModel
-from model import generate_response
+from model import generate_response, open_backend, close_backend, MAX_TOKENS
+from scheduler import scheduler
+from tokens import estimate_request_tokens
+from budget import fit_history, summary_cache
+from streaming import reply_events, cached_reply_events
+from cache import response_cache, messages_key, MISSING
+import cache
 
 app = FastAPI()
 
+@app.on_event("startup")
+def startup():
+    open_backend()
+
+@app.on_event("shutdown")
+async def shutdown():
+    await close_backend()
+
 class RequestModel(BaseModel):
     messages: list
     botName: str
     characterDescription: str
     exampleSpeech: str
+    channelId: Optional[str] = None
+    # Voice turns are scheduled ahead of text replies
+    priority: Literal["voice", "text"] = "text"
 
-@app.post("/generate/")
-async def generate_text(request: RequestModel):
-    # Character prompt
-    system_prompt = f"""You are acting a character in an online Discord chatroom. Your response should be 1-2 sentences long.
+def normalize_field(text):
+    return "\n".join(line.rstrip() for line in text.replace("\r\n", "\n").strip().split("\n"))
 
-Character Name: {request.botName}
+def build_system_prompt(bot_name, character_description, example_speech):
+    """Character prompt. Depends only on the bot's fields so the prefix is byte-identical across requests."""
+    return f"""You are acting a character in an online Discord chatroom. Your response should be 1-2 sentences long.
+
+Character Name: {normalize_field(bot_name)}
 
 Character Description:
-{request.characterDescription}
+{normalize_field(character_description)}
 
 Example Speech:
-{request.exampleSpeech}
+{normalize_field(example_speech)}
 """
 
+def build_messages(request):
+    """Builds the chat messages for a character reply."""
+    system_prompt = build_system_prompt(request.botName, request.characterDescription, request.exampleSpeech)
+
     # Format messages
     messages = [{"role": "system", "content": system_prompt}]
 
-    # Name: content
-    history_text = "\n".join([f"{message['name']}: {message['content']}" for message in request.messages])
+    # Name: content, trimmed to the token budget
+    lines = [f"{message['name']}: {message['content']}" for message in request.messages]
+    summary, lines = fit_history(system_prompt, lines, request.channelId)
+    history_text = "\n".join(lines)
+    if summary:
+        history_text = f"Earlier in the conversation: {summary}\n\n{history_text}"
     messages.append({"role": "user", "content": history_text})
+    return messages
 
-    # Handle request
-    response = await generate_response(messages)
-    response_object = response.parsed
+@app.post("/generate/")
+async def generate_text(request: RequestModel):
+    messages = build_messages(request)
 
-    response_text = response_object.message
+    # Handle request; identical concurrent requests share one upstream call
+    async def load():
+        response = await generate_response(messages, request.priority)
+        if response is None or response.parsed is None:
+            return None
+        return response.parsed.message or None
+
+    response_text = await response_cache.get_or_load(messages_key(messages), load)
     if not response_text:
         return {"error": f"Failed to generate response, {response_text}"}
     
     return {"reply": response_text}
+
+@app.post("/generate/stream")
+async def generate_text_stream(request: RequestModel):
+    """Streams the reply as NDJSON: `delta` text chunks, `sentence` events as each sentence completes, then `done` or `error`."""
+    messages = build_messages(request)
+    key = messages_key(messages)
+    reply = response_cache.get(key)
+    if reply is not MISSING:
+        return StreamingResponse(cached_reply_events(reply), media_type="application/x-ndjson")
+
+    # Refuse with a 429 before the stream starts if the request would be shed anyway
+    scheduler.admit(request.priority, estimate_request_tokens(messages, MAX_TOKENS))
+
+    def on_done(reply):
+        response_cache.set(key, reply)
+
+    return StreamingResponse(reply_events(messages, on_done, request.priority), media_type="application/x-ndjson")
+
+@app.get("/cache/stats")
+def cache_stats():
+    return {**cache.stats(), "summaries": summary_cache.stats()}
+
+@app.get("/scheduler/stats")
+def scheduler_stats():
+    return scheduler.stats()
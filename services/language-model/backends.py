@@ -0,0 +1,81 @@
+import httpx
+from openai import AsyncOpenAI
+from cache import prefix_key, prompt_cache
+from scheduler import observe_response
+from config import (
+    LLM_BACKEND, LLM_MODEL, LOCAL_BACKEND_URL, OPENAI_API_KEY, OPENAI_BASE_URL, OPENAI_TIMEOUT,
+    OPENAI_CONNECT_TIMEOUT, OPENAI_MAX_RETRIES, OPENAI_MAX_CONNECTIONS, OPENAI_MAX_KEEPALIVE_CONNECTIONS,
+    OPENAI_KEEPALIVE_EXPIRY
+)
+
+class OpenAIBackend:
+    """Chat completions over one pooled AsyncOpenAI client.
+
+    parse returns the completion message with .parsed set; stream yields the accumulated content
+    after each chunk; complete returns plain text. Any OpenAI-compatible server can sit behind it.
+    """
+
+    def __init__(self, api_key, base_url=None, model=LLM_MODEL):
+        self.model = model
+        self.client = AsyncOpenAI(
+            api_key=api_key,
+            base_url=base_url,
+            max_retries=OPENAI_MAX_RETRIES,
+            http_client=httpx.AsyncClient(
+                event_hooks={"response": [observe_response]},
+                timeout=httpx.Timeout(OPENAI_TIMEOUT, connect=OPENAI_CONNECT_TIMEOUT),
+                limits=httpx.Limits(
+                    max_connections=OPENAI_MAX_CONNECTIONS,
+                    max_keepalive_connections=OPENAI_MAX_KEEPALIVE_CONNECTIONS,
+                    keepalive_expiry=OPENAI_KEEPALIVE_EXPIRY
+                )
+            )
+        )
+
+    async def parse(self, messages, response_format, max_tokens, temperature):
+        response = await self.client.beta.chat.completions.parse(
+            model=self.model,
+            messages=messages,
+            temperature=temperature,
+            max_tokens=max_tokens,
+            response_format=response_format,
+            prompt_cache_key=prefix_key(messages)
+        )
+        prompt_cache.record(response.usage)
+        return response.choices[0].message
+
+    async def stream(self, messages, response_format, max_tokens, temperature):
+        async with self.client.beta.chat.completions.stream(
+            model=self.model,
+            messages=messages,
+            temperature=temperature,
+            max_tokens=max_tokens,
+            response_format=response_format,
+            prompt_cache_key=prefix_key(messages),
+            stream_options={"include_usage": True}
+        ) as stream:
+            async for event in stream:
+                if event.type == "content.delta":
+                    yield event.snapshot
+            completion = await stream.get_final_completion()
+            prompt_cache.record(completion.usage)
+
+    async def complete(self, messages, max_tokens, temperature):
+        response = await self.client.chat.completions.create(
+            model=self.model,
+            messages=messages,
+            temperature=temperature,
+            max_tokens=max_tokens
+        )
+        return response.choices[0].message.content
+
+    async def close(self):
+        await self.client.close()
+
+def create_backend(name=LLM_BACKEND):
+    """Picks the server to talk to. openai: the real provider. local: the stand-in in bench/stub_server.py."""
+    if name == "openai":
+        return OpenAIBackend(OPENAI_API_KEY, OPENAI_BASE_URL)
+    if name == "local":
+        return OpenAIBackend("local", LOCAL_BACKEND_URL)
+    raise ValueError(f"Unknown LLM_BACKEND {name}")
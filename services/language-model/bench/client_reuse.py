@@ -0,0 +1,79 @@
+"""Compares a fresh AsyncOpenAI client per call with the shared, pooled client.
+
+Start the stub server (see bench/stub_server.py), then run from services/language-model:
+    python -m bench.client_reuse --base-url http://localhost:8765/v1 --requests 200 --concurrency 8
+The stub is plain HTTP, so the measured saving covers connection setup but not TLS handshakes.
+"""
+import argparse
+import asyncio
+import json
+import statistics
+import time
+from openai import AsyncOpenAI
+import model
+from backends import OpenAIBackend
+
+MESSAGES = [
+    {"role": "system", "content": "You are acting a character in an online Discord chatroom."},
+    {"role": "user", "content": "someone: hello there"},
+]
+
+async def call(client):
+    start = time.perf_counter()
+    await client.beta.chat.completions.parse(
+        model="gpt-4o-mini",
+        messages=MESSAGES,
+        max_tokens=150,
+        response_format=model.Response
+    )
+    return time.perf_counter() - start
+
+async def per_call(args):
+    # What get_client() used to do: a new client (and connection pool) for every generation
+    client = AsyncOpenAI(api_key="stub", base_url=args.base_url)
+    try:
+        return await call(client)
+    finally:
+        await client.close()
+
+async def run(args, shared):
+    semaphore = asyncio.Semaphore(args.concurrency)
+
+    async def one():
+        async with semaphore:
+            return await call(shared) if shared else await per_call(args)
+
+    start = time.perf_counter()
+    latencies = sorted(await asyncio.gather(*(one() for _ in range(args.requests))))
+    elapsed = time.perf_counter() - start
+    return {
+        "requests": args.requests,
+        "throughput_rps": round(args.requests / elapsed, 1),
+        "mean_ms": round(statistics.mean(latencies) * 1000, 2),
+        "p50_ms": round(latencies[len(latencies) // 2] * 1000, 2),
+        "p99_ms": round(latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))] * 1000, 2),
+    }
+
+async def main(args):
+    shared = OpenAIBackend("stub", args.base_url).client
+    try:
+        await call(shared)  # warm the pool
+        report = {
+            "per_call_client": await run(args, None),
+            "shared_client": await run(args, shared),
+        }
+    finally:
+        await shared.close()
+
+    print(json.dumps(report, indent=2))
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--base-url", default="http://localhost:8765/v1")
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--output")
+    asyncio.run(main(parser.parse_args()))
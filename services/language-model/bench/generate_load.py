@@ -0,0 +1,168 @@
+"""Measures /generate/ throughput and latency, and time-to-first-token on /generate/stream, across concurrency levels.
+
+Run from services/language-model. With --spawn it starts the stub server and the service itself on this machine:
+    STUB_LATENCY_MS=300 STUB_LATENCY_DIST=lognormal STUB_LATENCY_SPREAD=0.4 \\
+        python -m bench.generate_load --spawn --concurrency 1 8 32 64 --output before.json
+Without --spawn, point --url at a running service. STUB_* variables are passed through to the stub
+(see bench/stub_server.py), and SCHEDULER_* and RATE_LIMIT_* variables to the service.
+Every request carries a unique message so the response cache never answers it.
+"""
+import argparse
+import asyncio
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+import uuid
+from datetime import datetime, timezone
+import httpx
+
+def percentile(values, fraction):
+    if not values:
+        return None
+    values = sorted(values)
+    return round(values[min(len(values) - 1, int(len(values) * fraction))] * 1000, 2)
+
+def request_body():
+    return {
+        "messages": [{"name": "bench", "content": f"hello {uuid.uuid4().hex}"}],
+        "botName": "Bench",
+        "characterDescription": "A character used by the load test.",
+        "exampleSpeech": "Hello there.",
+    }
+
+async def generate(client):
+    """Returns (status, total seconds, None)."""
+    start = time.perf_counter()
+    response = await client.post("/generate/", json=request_body())
+    elapsed = time.perf_counter() - start
+    if response.status_code != 200:
+        return response.status_code, elapsed, None
+    return (200 if "reply" in response.json() else "error"), elapsed, None
+
+async def stream(client):
+    """Returns (status, total seconds, seconds to the first delta event)."""
+    start = time.perf_counter()
+    first = None
+    status = "error"
+    async with client.stream("POST", "/generate/stream", json=request_body()) as response:
+        if response.status_code != 200:
+            await response.aread()
+            return response.status_code, time.perf_counter() - start, None
+        async for line in response.aiter_lines():
+            if not line:
+                continue
+            event = json.loads(line)
+            if event["event"] == "delta" and first is None:
+                first = time.perf_counter() - start
+            elif event["event"] == "done":
+                status = 200
+    return status, time.perf_counter() - start, first
+
+async def run_level(args, call, concurrency):
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    async with httpx.AsyncClient(base_url=args.url, limits=limits, timeout=args.timeout) as client:
+        # Warm connections so setup is not counted
+        await asyncio.gather(*(call(client) for _ in range(min(concurrency, 4))))
+
+        samples = []
+        deadline = time.perf_counter() + args.duration
+
+        async def worker():
+            while time.perf_counter() < deadline:
+                try:
+                    samples.append(await call(client))
+                except httpx.HTTPError as e:
+                    samples.append((type(e).__name__, args.timeout, None))
+
+        start = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+        elapsed = time.perf_counter() - start
+
+    ok = [sample for sample in samples if sample[0] == 200]
+    statuses = {}
+    for status, _, _ in samples:
+        statuses[str(status)] = statuses.get(str(status), 0) + 1
+    return {
+        "concurrency": concurrency,
+        "requests": len(samples),
+        "statuses": statuses,
+        "throughput_rps": round(len(ok) / elapsed, 2),
+        "p50_ms": percentile([latency for _, latency, _ in ok], 0.5),
+        "p99_ms": percentile([latency for _, latency, _ in ok], 0.99),
+        "ttft_p50_ms": percentile([first for _, _, first in ok if first is not None], 0.5),
+        "ttft_p99_ms": percentile([first for _, _, first in ok if first is not None], 0.99),
+    }
+
+def wait_for(url, timeout=20):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        try:
+            httpx.get(url, timeout=1)
+            return
+        except httpx.HTTPError:
+            time.sleep(0.2)
+    raise RuntimeError(f"{url} did not come up")
+
+def spawn(args):
+    """Starts the stub and the service as uvicorn subprocesses; returns them for cleanup."""
+    stub_url = f"http://127.0.0.1:{args.stub_port}"
+    env = {
+        **os.environ,
+        "LLM_BACKEND": "local",
+        "LOCAL_BACKEND_URL": f"{stub_url}/v1",
+        "SUMMARY_ENABLED": "false",
+    }
+    stub = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "bench.stub_server:app", "--port", str(args.stub_port), "--log-level", "warning"],
+        env=env
+    )
+    service = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "app:app", "--port", str(args.port), "--log-level", "warning"],
+        env=env
+    )
+    args.url = f"http://127.0.0.1:{args.port}"
+    wait_for(f"{stub_url}/docs")
+    wait_for(f"{args.url}/docs")
+    return [stub, service]
+
+async def main(args):
+    processes = spawn(args) if args.spawn else []
+    try:
+        report = {
+            "started_at": datetime.now(timezone.utc).isoformat(),
+            "machine": {"platform": platform.platform(), "cpus": os.cpu_count()},
+            "settings": {name: value for name, value in os.environ.items() if name.startswith(("STUB_", "SCHEDULER_", "RATE_LIMIT_"))},
+            "duration_s": args.duration,
+            "generate": [],
+            "stream": [],
+        }
+        for concurrency in args.concurrency:
+            for name, call in (("generate", generate), ("stream", stream)):
+                result = await run_level(args, call, concurrency)
+                report[name].append(result)
+                print(f"{name:8} c={concurrency:<4} {result['throughput_rps']:>8} rps  "
+                      f"p50 {result['p50_ms']} ms  p99 {result['p99_ms']} ms  "
+                      f"ttft p50 {result['ttft_p50_ms']} ms  {result['statuses']}")
+    finally:
+        for process in processes:
+            process.terminate()
+            process.wait()
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--url", default="http://localhost:5000")
+    parser.add_argument("--spawn", action="store_true", help="start the stub and the service locally")
+    parser.add_argument("--port", type=int, default=5055)
+    parser.add_argument("--stub-port", type=int, default=8765)
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 8, 32])
+    parser.add_argument("--duration", type=float, default=10, help="seconds per level and endpoint")
+    parser.add_argument("--timeout", type=float, default=60)
+    parser.add_argument("--output")
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,190 @@
+"""Local stand-in for the OpenAI chat completions API, used by the benchmarks and LLM_BACKEND=local.
+
+Run from services/language-model:
+    STUB_LATENCY_MS=300 STUB_TOKENS_PER_SECOND=60 uvicorn bench.stub_server:app --port 8765
+and point the service at it with LLM_BACKEND=local (or OPENAI_BASE_URL=http://localhost:8765/v1).
+
+Knobs, all environment variables:
+    STUB_LATENCY_MS          median time to first token
+    STUB_LATENCY_DIST        fixed, uniform (+-STUB_LATENCY_SPREAD ms), normal (stddev STUB_LATENCY_SPREAD ms)
+                             or lognormal (sigma STUB_LATENCY_SPREAD, a long right tail like real providers)
+    STUB_TOKENS_PER_SECOND   generation speed after the first token; 0 sends the reply at once
+    STUB_ERROR_RATE          fraction of requests answered with a 500
+    STUB_RATE_LIMIT_RATE     fraction answered with a 429 and Retry-After
+    STUB_HANG_RATE           fraction that stall for STUB_HANG_SECONDS before a 504
+    STUB_ABORT_RATE          fraction of streams cut off halfway through
+    STUB_RPM_LIMIT           if set, enforce a requests-per-minute bucket and send x-ratelimit-* headers
+    STUB_SEED                seed for reproducible runs
+"""
+import asyncio
+import json
+import os
+import random
+import time
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, StreamingResponse
+
+STUB_LATENCY_MS = float(os.getenv("STUB_LATENCY_MS", "300"))
+STUB_LATENCY_DIST = os.getenv("STUB_LATENCY_DIST", "fixed")
+STUB_LATENCY_SPREAD = float(os.getenv("STUB_LATENCY_SPREAD", "0"))
+STUB_TOKENS_PER_SECOND = float(os.getenv("STUB_TOKENS_PER_SECOND", "50"))
+STUB_ERROR_RATE = float(os.getenv("STUB_ERROR_RATE", "0"))
+STUB_RATE_LIMIT_RATE = float(os.getenv("STUB_RATE_LIMIT_RATE", "0"))
+STUB_HANG_RATE = float(os.getenv("STUB_HANG_RATE", "0"))
+STUB_HANG_SECONDS = float(os.getenv("STUB_HANG_SECONDS", "30"))
+STUB_ABORT_RATE = float(os.getenv("STUB_ABORT_RATE", "0"))
+STUB_RPM_LIMIT = float(os.getenv("STUB_RPM_LIMIT", "0"))
+
+# Roughly how many characters make one token
+CHARS_PER_TOKEN = 4
+STUB_MESSAGE = "This is a canned reply from the stub server. It streams in small chunks!"
+
+rng = random.Random(os.getenv("STUB_SEED"))
+app = FastAPI()
+
+class RequestBucket:
+    """Per-minute request limit reported the way OpenAI does."""
+
+    def __init__(self, per_minute):
+        self.capacity = per_minute
+        self.level = per_minute
+        self.updated = time.monotonic()
+
+    def take(self):
+        now = time.monotonic()
+        self.level = min(self.capacity, self.level + (now - self.updated) * self.capacity / 60)
+        self.updated = now
+        if self.level < 1:
+            return False
+        self.level -= 1
+        return True
+
+    def headers(self):
+        reset = (self.capacity - self.level) * 60 / self.capacity
+        return {
+            "x-ratelimit-limit-requests": str(int(self.capacity)),
+            "x-ratelimit-remaining-requests": str(int(self.level)),
+            "x-ratelimit-reset-requests": f"{reset:.3f}s",
+        }
+
+bucket = RequestBucket(STUB_RPM_LIMIT) if STUB_RPM_LIMIT > 0 else None
+
+def first_token_delay():
+    median = STUB_LATENCY_MS / 1000
+    spread = STUB_LATENCY_SPREAD
+    if STUB_LATENCY_DIST == "uniform":
+        delay = median + rng.uniform(-spread, spread) / 1000
+    elif STUB_LATENCY_DIST == "normal":
+        delay = rng.gauss(median, spread / 1000)
+    elif STUB_LATENCY_DIST == "lognormal":
+        delay = median * rng.lognormvariate(0, spread)
+    else:
+        delay = median
+    return max(delay, 0.0)
+
+def token_delay():
+    return 1 / STUB_TOKENS_PER_SECOND if STUB_TOKENS_PER_SECOND > 0 else 0.0
+
+def split_tokens(content):
+    return [content[i:i + CHARS_PER_TOKEN] for i in range(0, len(content), CHARS_PER_TOKEN)]
+
+def usage_body(body, content):
+    prompt = sum(len(str(message.get("content", ""))) for message in body.get("messages", []))
+    prompt_tokens = prompt // CHARS_PER_TOKEN
+    completion_tokens = len(split_tokens(content))
+    return {
+        "prompt_tokens": prompt_tokens,
+        "completion_tokens": completion_tokens,
+        "total_tokens": prompt_tokens + completion_tokens,
+        "prompt_tokens_details": {"cached_tokens": 0},
+    }
+
+def completion_body(model, content, usage):
+    return {
+        "id": "chatcmpl-stub",
+        "object": "chat.completion",
+        "created": int(time.time()),
+        "model": model,
+        "choices": [{
+            "index": 0,
+            "message": {"role": "assistant", "content": content},
+            "finish_reason": "stop",
+        }],
+        "usage": usage,
+    }
+
+def chunk_body(model, delta, finish_reason=None):
+    return {
+        "id": "chatcmpl-stub",
+        "object": "chat.completion.chunk",
+        "created": int(time.time()),
+        "model": model,
+        "choices": [{"index": 0, "delta": delta, "finish_reason": finish_reason}],
+    }
+
+def sse(data):
+    return f"data: {json.dumps(data)}\n\n"
+
+async def stream_chunks(model, content, usage, include_usage, abort):
+    await asyncio.sleep(first_token_delay())
+    yield sse(chunk_body(model, {"role": "assistant", "content": ""}))
+    tokens = split_tokens(content)
+    for i, token in enumerate(tokens):
+        if abort and i == len(tokens) // 2:
+            # Drop the connection mid-stream without a finish chunk
+            raise ConnectionError("stub aborted the stream")
+        yield sse(chunk_body(model, {"content": token}))
+        await asyncio.sleep(token_delay())
+    yield sse(chunk_body(model, {}, "stop"))
+    if include_usage:
+        usage_chunk = chunk_body(model, {})
+        usage_chunk["choices"] = []
+        usage_chunk["usage"] = usage
+        yield sse(usage_chunk)
+    yield "data: [DONE]\n\n"
+
+def error_response(status, message, headers=None):
+    return JSONResponse({"error": {"message": message, "type": "stub_error"}}, status_code=status, headers=headers)
+
+@app.post("/v1/chat/completions")
+async def chat_completions(request: Request):
+    body = await request.json()
+    model = body.get("model", "stub")
+    headers = {}
+
+    if bucket is not None:
+        allowed = bucket.take()
+        headers = bucket.headers()
+        if not allowed:
+            return error_response(429, "Rate limit reached for requests", {**headers, "retry-after": "1"})
+
+    # Failure injection
+    roll = rng.random()
+    if roll < STUB_ERROR_RATE:
+        return error_response(500, "Injected server error", headers)
+    roll -= STUB_ERROR_RATE
+    if roll < STUB_RATE_LIMIT_RATE:
+        return error_response(429, "Injected rate limit", {**headers, "retry-after": "1"})
+    roll -= STUB_RATE_LIMIT_RATE
+    if roll < STUB_HANG_RATE:
+        await asyncio.sleep(STUB_HANG_SECONDS)
+        return error_response(504, "Injected timeout", headers)
+
+    # Structured output matching model.Response when a schema is requested, plain text otherwise
+    if body.get("response_format"):
+        content = json.dumps({"name": "Stub", "message": STUB_MESSAGE})
+    else:
+        content = STUB_MESSAGE
+    usage = usage_body(body, content)
+
+    if body.get("stream"):
+        include_usage = (body.get("stream_options") or {}).get("include_usage")
+        abort = rng.random() < STUB_ABORT_RATE
+        return StreamingResponse(
+            stream_chunks(model, content, usage, include_usage, abort),
+            media_type="text/event-stream",
+            headers=headers
+        )
+
+    await asyncio.sleep(first_token_delay() + len(split_tokens(content)) * token_delay())
+    return JSONResponse(completion_body(model, content, usage), headers=headers)
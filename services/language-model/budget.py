@@ -0,0 +1,83 @@
+import asyncio
+import hashlib
+from cache import ResponseCache, MISSING
+from config import (
+    CONTEXT_TOKEN_BUDGET, SUMMARY_ENABLED, SUMMARY_MAX_TOKENS,
+    SUMMARY_CACHE_TTL_SECONDS, SUMMARY_CACHE_MAX_ENTRIES
+)
+from model import summarize
+from tokens import count_tokens, truncate_tokens, MESSAGE_OVERHEAD_TOKENS
+
+# Number of trailing summarized lines remembered to find where a summary left off
+SUMMARY_TAIL_LINES = 3
+
+def fit_lines(lines, available):
+    """Returns the index of the oldest line such that lines[index:] fits in available tokens."""
+    start = len(lines)
+    for line in reversed(lines):
+        cost = count_tokens(line) + 1
+        if cost > available:
+            break
+        available -= cost
+        start -= 1
+    return start
+
+def line_hash(line):
+    return hashlib.sha256(line.encode()).hexdigest()[:16]
+
+# channel_id -> (hashes of the last summarized lines, summary text)
+summary_cache = ResponseCache(SUMMARY_CACHE_MAX_ENTRIES, SUMMARY_CACHE_TTL_SECONDS)
+
+# channel_id -> in-flight refresh task
+_refreshing = {}
+
+def new_lines(dropped, tail):
+    """Lines in dropped that come after the summarized tail; all of them if the tail is not found."""
+    size = len(tail)
+    hashes = [line_hash(line) for line in dropped]
+    for end in range(len(hashes), size - 1, -1):
+        if hashes[end - size:end] == tail:
+            return dropped[end:]
+    return dropped
+
+async def refresh_summary(channel_id, summary, lines):
+    try:
+        updated = await summarize(summary, lines)
+        if updated:
+            tail = [line_hash(line) for line in lines[-SUMMARY_TAIL_LINES:]]
+            summary_cache.set(channel_id, (tail, truncate_tokens(updated, SUMMARY_MAX_TOKENS)))
+    finally:
+        _refreshing.pop(channel_id, None)
+
+def schedule_refresh(channel_id, summary, dropped, tail):
+    """Folds newly dropped lines into the channel's summary in the background."""
+    if channel_id in _refreshing:
+        return
+    lines = new_lines(dropped, tail) if tail else dropped
+    if not lines:
+        return
+    _refreshing[channel_id] = asyncio.ensure_future(refresh_summary(channel_id, summary, lines))
+
+def fit_history(system_prompt, lines, channel_id=None):
+    """Fits the system prompt plus history into CONTEXT_TOKEN_BUDGET.
+
+    Oldest lines are dropped first. With a channel_id, dropped lines are replaced by
+    that channel's running summary, which is brought up to date in the background so
+    a request never waits on a summarization call. Returns (summary or None, kept lines).
+    """
+    available = CONTEXT_TOKEN_BUDGET - count_tokens(system_prompt) - 2 * MESSAGE_OVERHEAD_TOKENS
+    start = fit_lines(lines, available)
+    if start == 0:
+        return None, lines
+    if start == len(lines):
+        # Not even the newest line fits; keep what we can of it
+        return None, [truncate_tokens(lines[-1], available)]
+
+    summary = None
+    if SUMMARY_ENABLED and channel_id:
+        cached = summary_cache.get(channel_id)
+        tail, summary = cached if cached is not MISSING else ([], None)
+        if summary:
+            start = max(start, fit_lines(lines, available - count_tokens(summary) - 1))
+        schedule_refresh(channel_id, summary, lines[:start], tail)
+    return summary, lines[start:]
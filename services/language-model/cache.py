@@ -0,0 +1,117 @@
+import asyncio
+import hashlib
+import json
+import time
+from collections import OrderedDict
+from config import RESPONSE_CACHE_TTL_SECONDS, RESPONSE_CACHE_MAX_ENTRIES
+
+MISSING = object()
+
+def messages_key(messages):
+    """Canonical hash of a messages list; key order and whitespace in the JSON do not matter."""
+    canonical = json.dumps(messages, sort_keys=True, separators=(",", ":"), ensure_ascii=False)
+    return hashlib.sha256(canonical.encode()).hexdigest()
+
+def prefix_key(messages):
+    """Hash of the system prompt, sent as prompt_cache_key so one bot's requests share a provider cache."""
+    return hashlib.sha256(messages[0]["content"].encode()).hexdigest()[:32]
+
+class ResponseCache:
+    """LRU cache of replies with a TTL; concurrent misses for one key share a single load."""
+
+    def __init__(self, max_entries, ttl):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+        self._entries = OrderedDict()
+        self._pending = {}
+
+    def get(self, key):
+        """Returns the cached value for key, or MISSING."""
+        entry = self._entries.get(key)
+        if entry is None or entry[0] < time.monotonic():
+            if entry is not None:
+                del self._entries[key]
+            self.misses += 1
+            return MISSING
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return entry[1]
+
+    def set(self, key, value):
+        self._entries[key] = (time.monotonic() + self.ttl, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    async def get_or_load(self, key, loader):
+        """Returns the cached value, joining an in-flight load for the same key if there is one.
+
+        None results are returned but not cached.
+        """
+        value = self.get(key)
+        if value is not MISSING:
+            return value
+
+        task = self._pending.get(key)
+        if task is not None:
+            self.coalesced += 1
+        else:
+            task = asyncio.ensure_future(loader())
+            self._pending[key] = task
+            task.add_done_callback(lambda done: self._finish(key, done))
+        # Shielded so one caller disconnecting does not cancel the load for the others
+        return await asyncio.shield(task)
+
+    def _finish(self, key, task):
+        self._pending.pop(key, None)
+        if task.cancelled() or task.exception() is not None:
+            return
+        if task.result() is not None:
+            self.set(key, task.result())
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "coalesced": self.coalesced,
+            # Share of lookups answered without a call of their own
+            "hit_rate": (self.hits + self.coalesced) / lookups if lookups else 0.0,
+            "size": len(self._entries),
+            "in_flight": len(self._pending),
+        }
+
+class PromptCacheStats:
+    """Tracks how many prompt tokens the provider served from its prompt cache."""
+
+    def __init__(self):
+        self.requests = 0
+        self.prompt_tokens = 0
+        self.cached_tokens = 0
+
+    def record(self, usage):
+        if usage is None:
+            return
+        details = usage.prompt_tokens_details
+        self.requests += 1
+        self.prompt_tokens += usage.prompt_tokens or 0
+        self.cached_tokens += (details.cached_tokens or 0) if details else 0
+
+    def stats(self):
+        return {
+            "requests": self.requests,
+            "prompt_tokens": self.prompt_tokens,
+            "cached_tokens": self.cached_tokens,
+            "hit_rate": self.cached_tokens / self.prompt_tokens if self.prompt_tokens else 0.0,
+        }
+
+# messages_key(messages) -> reply text
+response_cache = ResponseCache(RESPONSE_CACHE_MAX_ENTRIES, RESPONSE_CACHE_TTL_SECONDS)
+
+prompt_cache = PromptCacheStats()
+
+def stats():
+    return {"responses": response_cache.stats(), "prompt": prompt_cache.stats()}
@@ -1,28 +1,61 @@
-import os
 from pydantic import BaseModel
-from openai import AsyncOpenAI
-from config import OPENAI_API_KEY
+from backends import create_backend
+from scheduler import scheduler
+from tokens import estimate_request_tokens
+from config import SUMMARY_MAX_TOKENS
 
 # Define response format
 class Response(BaseModel):
     name: str
     message: str
 
-async def generate_response(messages):
-    """Generates a response using OpenAI's GPT model."""
+MAX_TOKENS = 150
+
+# One backend per process so generations reuse pooled keep-alive connections
+backend = None
+
+async def generate_response(messages, priority="text"):
+    """Generates a character response. Raises a 429 HTTPException if the scheduler sheds it."""
+    async with scheduler.slot(priority, estimate_request_tokens(messages, MAX_TOKENS)):
+        try:
+            return await get_backend().parse(messages, Response, MAX_TOKENS, 0.7)
+        except Exception as e:
+            print(f"Error generating response: {e}")
+            return None
+
+async def stream_response(messages, priority="text"):
+    """Streams a response, yielding the accumulated JSON content after each chunk."""
+    async with scheduler.slot(priority, estimate_request_tokens(messages, MAX_TOKENS)):
+        async for snapshot in get_backend().stream(messages, Response, MAX_TOKENS, 0.7):
+            yield snapshot
+
+async def summarize(summary, lines):
+    """Folds new chat lines into a running summary of the conversation."""
+    previous = f"Summary so far:\n{summary}\n\n" if summary else ""
+    messages = [
+        {"role": "system", "content": "Summarize this Discord chat in a few sentences, keeping who said what and any open topics."},
+        {"role": "user", "content": previous + "New messages:\n" + "\n".join(lines)}
+    ]
     try:
-        client = get_client()
-        response = await client.beta.chat.completions.parse(
-            model="gpt-4o-mini",
-            messages=messages,
-            temperature=0.7,
-            max_tokens=150,
-            response_format=Response
-        )
-        return response.choices[0].message
+        async with scheduler.slot("background", estimate_request_tokens(messages, SUMMARY_MAX_TOKENS)):
+            return await get_backend().complete(messages, SUMMARY_MAX_TOKENS, 0.2)
     except Exception as e:
-        print(f"Error generating response: {e}")
+        print(f"Error summarizing history: {e}")
         return None
-    
-def get_client():
-    return AsyncOpenAI(api_key=OPENAI_API_KEY)
+
+def open_backend():
+    """Creates the shared backend. Called once at app startup."""
+    global backend
+    backend = create_backend()
+
+async def close_backend():
+    """Closes the shared backend's connection pool. Called once at app shutdown."""
+    global backend
+    if backend is not None:
+        await backend.close()
+        backend = None
+
+def get_backend():
+    if backend is None:
+        open_backend()
+    return backend
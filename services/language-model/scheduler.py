@@ -0,0 +1,208 @@
+import asyncio
+import heapq
+import itertools
+import re
+import time
+from contextlib import asynccontextmanager
+from fastapi import HTTPException
+from config import (
+    SCHEDULER_MAX_IN_FLIGHT, SCHEDULER_MAX_QUEUED, SCHEDULER_QUEUE_TIMEOUT,
+    RATE_LIMIT_REQUESTS_PER_MINUTE, RATE_LIMIT_TOKENS_PER_MINUTE
+)
+
+# Lower runs first
+PRIORITIES = {"voice": 0, "text": 1, "background": 2}
+
+DURATION_PART = re.compile(r"(\d+(?:\.\d+)?)(ms|h|m|s)")
+DURATION_UNITS = {"ms": 0.001, "s": 1, "m": 60, "h": 3600}
+
+def parse_duration(value):
+    """Parses rate-limit reset values such as "20ms", "1s" or "6m0s" into seconds."""
+    if not value:
+        return None
+    parts = DURATION_PART.findall(value)
+    if not parts:
+        try:
+            return float(value)
+        except ValueError:
+            return None
+    return sum(float(amount) * DURATION_UNITS[unit] for amount, unit in parts)
+
+class TokenBucket:
+    """Refills continuously up to capacity over one minute, like the provider's limits."""
+
+    def __init__(self, per_minute):
+        self.capacity = per_minute
+        self.level = per_minute
+        self.updated = time.monotonic()
+
+    def refill(self):
+        now = time.monotonic()
+        self.level = min(self.capacity, self.level + (now - self.updated) * self.capacity / 60)
+        self.updated = now
+
+    def wait_time(self, amount):
+        """Seconds until amount can be taken; requests larger than capacity wait for a full bucket."""
+        self.refill()
+        amount = min(amount, self.capacity)
+        if self.level >= amount:
+            return 0.0
+        return (amount - self.level) * 60 / self.capacity
+
+    def take(self, amount):
+        self.refill()
+        self.level -= min(amount, self.capacity)
+
+    def observe(self, limit, remaining):
+        """Adopts the provider's view: its limit becomes our capacity, and we never hold more than it says remains."""
+        self.refill()
+        if limit:
+            self.capacity = limit
+        if remaining is not None:
+            self.level = min(self.level, remaining)
+
+class Scheduler:
+    """Admits upstream calls by priority, within an in-flight bound and the provider's rate limits.
+
+    Requests that would only time out in the queue are refused up front with a 429.
+    """
+
+    def __init__(self, max_in_flight, max_queued, queue_timeout, requests_per_minute, tokens_per_minute):
+        self.max_in_flight = max_in_flight
+        self.max_queued = max_queued
+        self.queue_timeout = queue_timeout
+        self.requests = TokenBucket(requests_per_minute)
+        self.tokens = TokenBucket(tokens_per_minute)
+        self.in_flight = 0
+        self.paused_until = 0.0
+        self.admitted = {name: 0 for name in PRIORITIES}
+        self.rejected = {name: 0 for name in PRIORITIES}
+        self.upstream_429s = 0
+        self._queue = []
+        self._queued = {name: 0 for name in PRIORITIES}
+        self._seq = itertools.count()
+        self._timer = None
+
+    def rate_wait(self, tokens):
+        return max(self.paused_until - time.monotonic(), self.requests.wait_time(1), self.tokens.wait_time(tokens), 0.0)
+
+    def reject(self, priority, retry_after):
+        self.rejected[priority] += 1
+        raise HTTPException(
+            status_code=429,
+            detail="Language model is overloaded, try again shortly",
+            headers={"Retry-After": str(max(1, round(retry_after)))}
+        )
+
+    def admit(self, priority, tokens):
+        """Raises a 429 now if a request of this priority could not start within the queue timeout."""
+        if priority not in PRIORITIES:
+            raise HTTPException(status_code=400, detail=f"Unknown priority {priority}")
+        if self._queued[priority] >= self.max_queued:
+            self.reject(priority, self.queue_timeout)
+        wait = self.rate_wait(tokens)
+        if wait > self.queue_timeout:
+            self.reject(priority, wait)
+
+    async def acquire(self, priority, tokens):
+        self.admit(priority, tokens)
+        future = asyncio.get_running_loop().create_future()
+        entry = [PRIORITIES[priority], next(self._seq), priority, tokens, future]
+        heapq.heappush(self._queue, entry)
+        self._queued[priority] += 1
+        self._dispatch()
+        try:
+            await asyncio.wait_for(asyncio.shield(future), self.queue_timeout)
+        except (asyncio.TimeoutError, asyncio.CancelledError) as e:
+            if future.done() and not future.cancelled():
+                # Admitted just as we gave up; hand the slot back
+                self.release()
+            else:
+                future.cancel()
+                self._remove(entry)
+            if isinstance(e, asyncio.TimeoutError):
+                self.reject(priority, self.queue_timeout)
+            raise
+
+    def release(self):
+        self.in_flight -= 1
+        self._dispatch()
+
+    @asynccontextmanager
+    async def slot(self, priority, tokens):
+        await self.acquire(priority, tokens)
+        try:
+            yield
+        finally:
+            self.release()
+
+    def _remove(self, entry):
+        if entry in self._queue:
+            self._queue.remove(entry)
+            heapq.heapify(self._queue)
+            self._queued[entry[2]] -= 1
+
+    def _dispatch(self):
+        while self._queue and self.in_flight < self.max_in_flight:
+            _, _, priority, tokens, future = self._queue[0]
+            if future.done():
+                self._remove(self._queue[0])
+                continue
+            wait = self.rate_wait(tokens)
+            if wait > 0:
+                self._schedule(wait)
+                return
+            heapq.heappop(self._queue)
+            self._queued[priority] -= 1
+            self.requests.take(1)
+            self.tokens.take(tokens)
+            self.in_flight += 1
+            self.admitted[priority] += 1
+            future.set_result(None)
+
+    def _schedule(self, wait):
+        if self._timer is not None and not self._timer.cancelled():
+            self._timer.cancel()
+        self._timer = asyncio.get_running_loop().call_later(wait, self._dispatch)
+
+    def observe_headers(self, status_code, headers):
+        """Adapts the buckets to the provider's x-ratelimit-* headers, and pauses on a 429."""
+        def number(name):
+            try:
+                return float(headers[name])
+            except (KeyError, ValueError):
+                return None
+
+        self.requests.observe(number("x-ratelimit-limit-requests"), number("x-ratelimit-remaining-requests"))
+        self.tokens.observe(number("x-ratelimit-limit-tokens"), number("x-ratelimit-remaining-tokens"))
+        if status_code == 429:
+            self.upstream_429s += 1
+            pause = parse_duration(headers.get("retry-after")) or max(
+                parse_duration(headers.get("x-ratelimit-reset-requests")) or 0,
+                parse_duration(headers.get("x-ratelimit-reset-tokens")) or 0,
+                1.0
+            )
+            self.paused_until = max(self.paused_until, time.monotonic() + pause)
+
+    def stats(self):
+        self.requests.refill()
+        self.tokens.refill()
+        return {
+            "in_flight": self.in_flight,
+            "queued": dict(self._queued),
+            "admitted": dict(self.admitted),
+            "rejected": dict(self.rejected),
+            "upstream_429s": self.upstream_429s,
+            "paused_for": max(self.paused_until - time.monotonic(), 0.0),
+            "requests_available": self.requests.level,
+            "tokens_available": self.tokens.level,
+        }
+
+scheduler = Scheduler(
+    SCHEDULER_MAX_IN_FLIGHT, SCHEDULER_MAX_QUEUED, SCHEDULER_QUEUE_TIMEOUT,
+    RATE_LIMIT_REQUESTS_PER_MINUTE, RATE_LIMIT_TOKENS_PER_MINUTE
+)
+
+async def observe_response(response):
+    """httpx response hook for the shared OpenAI client."""
+    scheduler.observe_headers(response.status_code, response.headers)
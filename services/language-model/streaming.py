@@ -0,0 +1,99 @@
+import json
+import re
+from fastapi import HTTPException
+from jiter import from_json
+from model import stream_response
+
+# End of a sentence: terminal punctuation, optional closing quotes/brackets, then whitespace
+SENTENCE_END = re.compile(r"[.!?…]+[\"'”’)\]]*(?=\s)")
+
+class MessageExtractor:
+    """Pulls the growing `message` field out of a partial Response JSON snapshot."""
+
+    def __init__(self):
+        self.message = ""
+
+    def feed(self, snapshot):
+        """Returns the text added to `message` since the last call."""
+        try:
+            parsed = from_json(snapshot.encode(), partial_mode="trailing-strings")
+        except ValueError:
+            # Snapshot ends mid-escape; wait for the next chunk
+            return ""
+        message = parsed.get("message") if isinstance(parsed, dict) else None
+        if not isinstance(message, str) or not message.startswith(self.message):
+            return ""
+        delta = message[len(self.message):]
+        self.message = message
+        return delta
+
+class SentenceSplitter:
+    """Buffers streamed text and hands back each sentence once its boundary is seen."""
+
+    def __init__(self):
+        self.buffer = ""
+
+    def feed(self, text):
+        self.buffer += text
+        sentences = []
+        start = 0
+        for match in SENTENCE_END.finditer(self.buffer):
+            sentence = self.buffer[start:match.end()].strip()
+            if sentence:
+                sentences.append(sentence)
+            start = match.end()
+        self.buffer = self.buffer[start:]
+        return sentences
+
+    def flush(self):
+        sentence, self.buffer = self.buffer.strip(), ""
+        return sentence
+
+def event(kind, **fields):
+    return json.dumps({"event": kind, **fields}) + "\n"
+
+async def reply_events(messages, on_done=None, priority="text"):
+    """Yields NDJSON events for a streamed reply: delta, sentence, then done or error.
+
+    on_done(reply) is called with the full reply text once it completes.
+    """
+    extractor = MessageExtractor()
+    splitter = SentenceSplitter()
+    try:
+        async for snapshot in stream_response(messages, priority):
+            delta = extractor.feed(snapshot)
+            if not delta:
+                continue
+            yield event("delta", text=delta)
+            for sentence in splitter.feed(delta):
+                yield event("sentence", text=sentence)
+    except HTTPException as e:
+        # Shed by the scheduler after the response started
+        yield event("error", error=e.detail)
+        return
+    except Exception as e:
+        print(f"Error streaming response: {e}")
+        yield event("error", error="Failed to generate response")
+        return
+
+    sentence = splitter.flush()
+    if sentence:
+        yield event("sentence", text=sentence)
+
+    if not extractor.message:
+        yield event("error", error="Failed to generate response")
+        return
+    if on_done is not None:
+        on_done(extractor.message)
+    yield event("done", reply=extractor.message)
+
+async def cached_reply_events(reply):
+    """Replays an already generated reply as the same event sequence."""
+    splitter = SentenceSplitter()
+    yield event("delta", text=reply)
+    for sentence in splitter.feed(reply):
+        yield event("sentence", text=sentence)
+    sentence = splitter.flush()
+    if sentence:
+        yield event("sentence", text=sentence)
+    yield event("done", reply=reply)
@@ -0,0 +1,42 @@
+import math
+from functools import lru_cache
+import tiktoken
+from config import TOKENIZER_ENCODING
+
+# Per-message framing the chat format adds on top of the content
+MESSAGE_OVERHEAD_TOKENS = 4
+
+_encoding = None
+_encoding_failed = False
+
+def get_encoding():
+    """Loads the tokenizer once; returns None if it is unavailable (e.g. no network to fetch it)."""
+    global _encoding, _encoding_failed
+    if _encoding is None and not _encoding_failed:
+        try:
+            _encoding = tiktoken.get_encoding(TOKENIZER_ENCODING)
+        except Exception as e:
+            print(f"Error loading tokenizer {TOKENIZER_ENCODING}, estimating token counts: {e}")
+            _encoding_failed = True
+    return _encoding
+
+@lru_cache(maxsize=4096)
+def count_tokens(text):
+    encoding = get_encoding()
+    if encoding is None:
+        return math.ceil(len(text.encode()) / 4)
+    return len(encoding.encode(text))
+
+def truncate_tokens(text, max_tokens):
+    """Cuts text to at most max_tokens, keeping the start."""
+    if max_tokens <= 0:
+        return ""
+    encoding = get_encoding()
+    if encoding is None:
+        return text.encode()[:max_tokens * 4].decode(errors="ignore")
+    return encoding.decode(encoding.encode(text)[:max_tokens])
+
+def estimate_request_tokens(messages, max_tokens):
+    """Upper estimate of the tokens a chat request counts against the provider's rate limit."""
+    prompt = sum(count_tokens(message["content"]) + MESSAGE_OVERHEAD_TOKENS for message in messages)
+    return prompt + max_tokens